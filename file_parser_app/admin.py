@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import UploadedFile, ParsedContent
+from .models import UploadedFile, UploadBatch, UploadSession, ParsedContent, ParsedTable, ParsedPage, ParseJob, ContentBlob, MetricCounter, PipelineSpan
 
 
 @admin.register(UploadedFile)
@@ -15,8 +15,59 @@ class UploadedFileAdmin(admin.ModelAdmin):
         return self.readonly_fields
 
 
+@admin.register(UploadBatch)
+class UploadBatchAdmin(admin.ModelAdmin):
+    list_display = ['id', 'status', 'total_files', 'created_at']
+    list_filter = ['status', 'created_at']
+    readonly_fields = ['id', 'created_at', 'updated_at']
+
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = ['file', 'status', 'received_bytes', 'total_size', 'expires_at', 'created_at']
+    list_filter = ['status', 'created_at']
+    readonly_fields = ['id', 'created_at', 'updated_at']
+
+
 @admin.register(ParsedContent)
 class ParsedContentAdmin(admin.ModelAdmin):
-    list_display = ['file', 'content_type', 'row_count', 'created_at']
+    list_display = ['id', 'blob', 'content_type', 'row_count', 'created_at']
     list_filter = ['content_type', 'created_at']
-    readonly_fields = ['created_at']
\ No newline at end of file
+    readonly_fields = ['created_at']
+
+@admin.register(ParsedTable)
+class ParsedTableAdmin(admin.ModelAdmin):
+    list_display = ['parsed_content', 'name', 'format', 'row_count', 'size_bytes', 'created_at']
+    list_filter = ['format', 'created_at']
+    readonly_fields = ['created_at']
+
+
+@admin.register(ParsedPage)
+class ParsedPageAdmin(admin.ModelAdmin):
+    list_display = ['parsed_content', 'number', 'engine']
+    list_filter = ['engine']
+
+
+@admin.register(ParseJob)
+class ParseJobAdmin(admin.ModelAdmin):
+    list_display = ['file', 'batch', 'status', 'priority', 'client', 'attempts', 'leased_by', 'lease_expires_at', 'created_at']
+    list_filter = ['status', 'priority', 'created_at']
+    readonly_fields = ['created_at', 'updated_at']
+
+
+@admin.register(ContentBlob)
+class ContentBlobAdmin(admin.ModelAdmin):
+    list_display = ['sha256', 'size', 'ref_count', 'created_at']
+    search_fields = ['sha256']
+    readonly_fields = ['created_at']
+
+
+@admin.register(MetricCounter)
+class MetricCounterAdmin(admin.ModelAdmin):
+    list_display = ['name', 'value']
+
+
+@admin.register(PipelineSpan)
+class PipelineSpanAdmin(admin.ModelAdmin):
+    list_display = ['file', 'stage', 'started_at', 'duration', 'bytes', 'rows']
+    list_filter = ['stage', 'started_at']
@@ -0,0 +1,228 @@
+import hashlib
+import logging
+import os
+import uuid
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .async_processor import AsyncFileProcessor
+from .dedup import cached_parse_result, release_blob, stage_upload
+from .file_parser import FileParser
+from .models import ContentBlob, ParsedContent, ParsedTable, UploadedFile
+from .progress_tracker import progress_tracker
+from .search_index import index_appended_rows
+from .storage import get_storage
+from .table_query import invalidate_query_cache
+from .table_store import TABLE_SUFFIXES, delete_table
+from .tracing import SpanRecorder
+
+logger = logging.getLogger(__name__)
+
+# Files can be given new content once they are no longer being parsed
+REPLACEABLE_STATUSES = ('ready', 'failed')
+
+
+class ReplaceConflict(ValueError):
+    """The file is not in a state that allows replacing its content."""
+
+
+class PrefixDigest:
+    """Pass chunks through while hashing the first `length` bytes.
+
+    The previous version of a file is known by its size and SHA-256 (its
+    content blob), so hashing that many bytes of the new version tells
+    whether it starts with the previous one, without reading the previous
+    version back. The last byte of the prefix and the two bytes after it
+    are kept to find where the rows added after it begin.
+    """
+
+    def __init__(self, chunks: Iterable[bytes], length: int):
+        self._chunks = chunks
+        self._length = length
+        self._digest = hashlib.sha256()
+        self._hashed = 0
+        self._last = b''
+        self._following = b''
+
+    def __iter__(self) -> Iterator[bytes]:
+        for chunk in self._chunks:
+            rest = chunk
+            if self._hashed < self._length:
+                head = chunk[:self._length - self._hashed]
+                self._digest.update(head)
+                self._hashed += len(head)
+                if head:
+                    self._last = head[-1:]
+                rest = chunk[len(head):]
+            if self._hashed == self._length and len(self._following) < 2:
+                self._following += rest[:2 - len(self._following)]
+            yield chunk
+
+    def append_offset(self, sha256: str) -> Optional[int]:
+        """Where rows added after a previous version with this digest start, or None.
+
+        None means the new bytes do not start with the previous version, or
+        that its unterminated last line was continued rather than ended.
+        """
+        if not self._length or self._hashed < self._length or self._digest.hexdigest() != sha256:
+            return None
+        if self._last == b'\n':
+            return self._length
+        # The previous version ended without a newline: its last row is
+        # unchanged only if the new version ends that line
+        if self._following.startswith(b'\r\n'):
+            return self._length + 2
+        if self._following.startswith(b'\n'):
+            return self._length + 1
+        return None
+
+
+def _appendable_table(uploaded_file: UploadedFile) -> Optional[ParsedTable]:
+    """The table new rows can be appended to, if the file's parse result allows it.
+
+    That takes a streamed CSV parse result stored as one table, whose bytes
+    no other file shares: the parse result can then move to the new version
+    instead of being copied.
+    """
+    parsed_content = uploaded_file.parsed_content
+    blob = uploaded_file.blob
+    if (uploaded_file.status != 'ready' or parsed_content is None or blob is None
+            or parsed_content.blob_id != blob.id or parsed_content.content_type != 'csv'
+            or not parsed_content.content.get('streamed') or blob.ref_count != 1):
+        return None
+    tables = list(parsed_content.tables.all())
+    return tables[0] if len(tables) == 1 else None
+
+
+def _append_rows(uploaded_file: UploadedFile, table: ParsedTable, blob: ContentBlob, offset: int,
+                 spans: SpanRecorder) -> int:
+    """Parse the rows after `offset` of the new version and append them to `table`.
+
+    The rows go to a new part of the table, and the file's parse result
+    moves from the previous blob to the new one, keeping its tables and
+    search entries. Raises ValueError (or IntegrityError) if the rows
+    cannot be appended; nothing is changed then.
+    """
+    parsed_content = uploaded_file.parsed_content
+    content = parsed_content.content
+    part_path = os.path.join(
+        os.path.dirname(table.path), f"{table.position}-{uuid.uuid4().hex[:8]}{TABLE_SUFFIXES[table.format]}"
+    )
+
+    with spans.span('parse', bytes=blob.size - offset) as parse_span:
+        with get_storage().local_path(blob.storage_key) as path:
+            appended = FileParser.parse_csv_tail(
+                path, offset, content['headers'], content['delimiter'], table.path, part_path, table.format
+            )
+        parse_span.rows = appended
+
+    try:
+        with spans.span('persist', rows=appended), transaction.atomic():
+            # Only while the previous bytes are still this file's alone
+            moved = ParsedContent.objects.filter(
+                id=parsed_content.id, blob_id=uploaded_file.blob_id, blob__ref_count=1
+            ).update(
+                blob=blob,
+                content={**content, 'total_rows': content.get('total_rows', 0) + appended},
+                row_count=F('row_count') + appended
+            )
+            if not moved:
+                raise ValueError('The previous version is shared with another file')
+            if appended:
+                ParsedTable.objects.filter(id=table.id).update(
+                    parts=table.parts + [part_path],
+                    row_count=F('row_count') + appended,
+                    size_bytes=F('size_bytes') + os.path.getsize(part_path)
+                )
+            UploadedFile.objects.filter(id=uploaded_file.id).update(
+                blob=blob,
+                storage_key=blob.storage_key,
+                file_size=blob.size,
+                status='ready',
+                progress=100,
+                error_message=None,
+                updated_at=timezone.now()
+            )
+    except BaseException:
+        if appended:
+            delete_table(part_path)
+        raise
+
+    # Nothing refers to the previous bytes any more
+    release_blob(uploaded_file.blob_id)
+    invalidate_query_cache(uploaded_file.id)
+    progress_tracker.set_progress(str(uploaded_file.id), 100, 'ready')
+    if appended:
+        index_appended_rows(parsed_content.id, part_path, table.format, table.row_count)
+    return appended
+
+
+def replace_upload(uploaded_file: UploadedFile, name: str, chunks: Iterable[bytes],
+                   content_type: Optional[str] = None) -> Dict[str, Any]:
+    """Give a file a new version of its bytes.
+
+    When the new version is the previous CSV with rows added at the end,
+    only those rows are parsed and appended to the stored table, so the work
+    grows with the new rows rather than the file. Any other change queues a
+    full parse of the new version. Returns the `mode` used ('append',
+    'reparse' or 'unchanged') and the number of appended rows.
+    """
+    if not UploadedFile.objects.filter(id=uploaded_file.id, status__in=REPLACEABLE_STATUSES).update(
+        status='processing', updated_at=timezone.now()
+    ):
+        current = UploadedFile.objects.filter(id=uploaded_file.id).values_list('status', flat=True).first()
+        raise ReplaceConflict(f'File is {current}; replace its content once it is parsed')
+
+    def restore():
+        UploadedFile.objects.filter(id=uploaded_file.id).update(status=uploaded_file.status, updated_at=timezone.now())
+
+    spans = SpanRecorder('csv')
+    previous_blob = uploaded_file.blob
+    table = _appendable_table(uploaded_file)
+    try:
+        reader = PrefixDigest(chunks, previous_blob.size if table is not None else 0)
+        with spans.span('upload_read') as read_span:
+            blob = stage_upload(name, reader, content_type or uploaded_file.file_type)['blob']
+            read_span.bytes = blob.size
+    except BaseException:
+        restore()
+        raise
+
+    if previous_blob is not None and blob.id == previous_blob.id:
+        release_blob(blob.id)
+        restore()
+        return {'mode': 'unchanged', 'appended_rows': 0}
+
+    offset = reader.append_offset(previous_blob.sha256) if table is not None else None
+    # Bytes parsed before are answered from the parse cache instead
+    if offset is not None and cached_parse_result(blob.id, 'csv') is None:
+        try:
+            appended = _append_rows(uploaded_file, table, blob, offset, spans)
+            spans.save(uploaded_file.id)
+            logger.info(f"Appended {appended} rows to file: {uploaded_file.original_filename}")
+            return {'mode': 'append', 'appended_rows': appended}
+        except (ValueError, IntegrityError) as e:
+            logger.info(f"Parsing {uploaded_file.original_filename} again in full: {str(e)}")
+
+    with transaction.atomic():
+        UploadedFile.objects.filter(id=uploaded_file.id).update(
+            blob=blob,
+            storage_key=blob.storage_key,
+            file_size=blob.size,
+            status='uploading',
+            progress=0,
+            error_message=None,
+            updated_at=timezone.now()
+        )
+    if previous_blob is not None:
+        release_blob(previous_blob.id)
+    elif uploaded_file.storage_key:
+        get_storage().delete(uploaded_file.storage_key)
+    spans.save(uploaded_file.id)
+    progress_tracker.set_progress(str(uploaded_file.id), 0, 'uploading')
+    AsyncFileProcessor.process_file_async(str(uploaded_file.id))
+    logger.info(f"Replaced content of file: {uploaded_file.original_filename}")
+    return {'mode': 'reparse', 'appended_rows': 0}
@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class FileParserAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'file_parser_app'
\ No newline at end of file
+    name = 'file_parser_app'
+
+    def ready(self):
+        from . import signals  # noqa: F401
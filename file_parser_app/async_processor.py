@@ -1,10 +1,25 @@
-import threading
-import time
+import os
+import shutil
 import logging
+from contextlib import contextmanager
+from typing import Optional
+from django.conf import settings
+from django.db import IntegrityError, transaction
 from django.utils import timezone
-from .models import UploadedFile, ParsedContent
+from . import metrics
+from .models import UploadedFile, UploadBatch, ParsedContent, ParsedTable, ParsedPage
 from .file_parser import FileParser
-from .progress_tracker import progress_tracker
+from .progress_tracker import progress_tracker, ProgressReporter
+from .job_queue import JobQueue, get_embedded_pool
+from .table_store import new_table_dir, default_table_format
+from .storage import get_storage
+from .dedup import cached_parse_result
+from .table_query import invalidate_query_cache
+from .renderers import dumps
+from .search_index import index_parsed_content
+from .preview import preview_upload
+from .scheduling import DEFAULT_PRIORITY, priority_value
+from .tracing import SpanRecorder
 
 logger = logging.getLogger(__name__)
 
@@ -13,66 +28,222 @@ class AsyncFileProcessor:
     """Asynchronous file processor with progress tracking."""
     
     @staticmethod
-    def process_file_async(file_id: str):
-        """Process a file asynchronously in a separate thread."""
-        thread = threading.Thread(
-            target=AsyncFileProcessor._process_file_worker,
-            args=(file_id,),
-            daemon=True
+    def process_file_async(file_id: str, profile: bool = False, delay: Optional[float] = None,
+                           priority: str = DEFAULT_PRIORITY):
+        """Queue a file for processing by the parser worker pool.
+        
+        With `profile`, the job runs under cProfile, skipping the parse
+        cache so the parser itself is captured (see `tracing.profiled`).
+        With `delay`, the job waits that many seconds before it can run.
+        `priority` is one of `scheduling.PRIORITIES`.
+        """
+        JobQueue.enqueue(file_id, profile=profile, delay=delay, priority=priority_value(priority))
+        
+        # Without dedicated `run_parser_workers` processes, jobs are drained
+        # by a bounded pool running inside this process.
+        pool = get_embedded_pool()
+        if pool is not None:
+            pool.wake()
+    
+    @staticmethod
+    def preview_file(uploaded_file: UploadedFile) -> bool:
+        """Store a preview of a new upload and defer its full parse.
+        
+        The file becomes 'previewed', and is parsed in full when its rows
+        are first requested (see `parse_on_demand`) or by a background job
+        FILE_PARSER_LAZY_PARSE_DELAY seconds later. Returns False, leaving
+        the file as it was, when it has no preview or its bytes were parsed
+        before: it is then better parsed right away.
+        """
+        kind = FileParser.detect_kind(uploaded_file.file_type, uploaded_file.original_filename)
+        if cached_parse_result(uploaded_file.blob_id, kind) is not None:
+            return False
+        
+        spans = SpanRecorder(kind)
+        try:
+            with spans.span('preview') as preview_span:
+                preview = preview_upload(uploaded_file)
+        except Exception as e:
+            logger.error(f"Error previewing file {uploaded_file.id}: {str(e)}")
+            return False
+        if preview is None:
+            return False
+        preview_span.rows = len(preview.get('rows', []))
+        
+        uploaded_file.preview = preview
+        uploaded_file.status = 'previewed'
+        uploaded_file.save(update_fields=['preview', 'status', 'updated_at'])
+        progress_tracker.set_progress(str(uploaded_file.id), 0, 'previewed')
+        spans.save(uploaded_file.id)
+        
+        delay = getattr(settings, 'FILE_PARSER_LAZY_PARSE_DELAY', 600)
+        if delay >= 0:
+            AsyncFileProcessor.process_file_async(str(uploaded_file.id), delay=delay, priority='bulk')
+        return True
+    
+    @staticmethod
+    def parse_on_demand(file_id: str) -> bool:
+        """Start the full parse of a previewed file now.
+        
+        The first caller moves the file back to 'uploading' and runs its
+        deferred background job early, or queues one, as an interactive
+        job: someone is waiting for the rows. Later callers find the file
+        no longer previewed and do nothing. Returns whether this call
+        started the parse.
+        """
+        if not UploadedFile.objects.filter(id=file_id, status='previewed').update(
+            status='uploading', updated_at=timezone.now()
+        ):
+            return False
+        progress_tracker.set_progress(str(file_id), 0, 'uploading')
+        if JobQueue.promote(file_id, priority=priority_value('interactive')):
+            pool = get_embedded_pool()
+            if pool is not None:
+                pool.wake()
+        else:
+            AsyncFileProcessor.process_file_async(str(file_id), priority='interactive')
+        return True
+    
+    @staticmethod
+    def process_batch_async(batch_id: str, priority: str = 'bulk'):
+        """Queue one parse job for every file of an upload batch."""
+        JobQueue.enqueue_batch(batch_id, priority=priority_value(priority))
+        
+        pool = get_embedded_pool()
+        if pool is not None:
+            pool.wake()
+    
+    @staticmethod
+    def process_batch(batch_id: str):
+        """Parse the unfinished files of a batch one after another.
+        
+        Files already ready or failed are skipped, so a batch job retried
+        after its lease expired picks up where the previous attempt stopped.
+        A file that fails to parse does not stop the rest of the batch.
+        """
+        UploadBatch.objects.filter(id=batch_id).update(status='processing', updated_at=timezone.now())
+        file_ids = list(
+            UploadedFile.objects
+            .filter(batch_id=batch_id)
+            .exclude(status__in=['ready', 'failed'])
+            .order_by('created_at', 'id')
+            .values_list('id', flat=True)
         )
-        thread.start()
+        for file_id in file_ids:
+            AsyncFileProcessor._process_file_worker(str(file_id))
+        UploadBatch.objects.filter(id=batch_id).update(status='done', updated_at=timezone.now())
+    
+    @staticmethod
+    def queue_is_full() -> bool:
+        """Whether the job queue has reached its configured backpressure limit."""
+        max_depth = getattr(settings, 'FILE_PARSER_MAX_QUEUE_DEPTH', 0)
+        return bool(max_depth) and JobQueue.depth() >= max_depth
     
     @staticmethod
-    def _process_file_worker(file_id: str):
-        """Worker function that processes the file."""
+    def _process_file_worker(file_id: str, spans: Optional[SpanRecorder] = None, use_cache: bool = True,
+                             raise_errors: bool = False):
+        """Worker function that processes the file.
+        
+        The parse, serialize and persist stages are timed into `spans`,
+        which are stored against the file when it is done.
+        
+        A file the parser rejects is marked failed. Any other error marks
+        it failed too, unless `raise_errors` is set: then it is raised and
+        left to the job queue to retry or fail (see `JobQueue.fail`).
+        """
+        spans = spans or SpanRecorder()
         try:
-            # Get file from database
-            uploaded_file = UploadedFile.objects.get(id=file_id)
+            # Get file from database (bytes live in blob storage, not the row)
+            uploaded_file = UploadedFile.objects.defer('file_content').get(id=file_id)
             
             # Update status to processing
             uploaded_file.status = 'processing'
             uploaded_file.progress = 0
-            uploaded_file.save()
+            uploaded_file.save(update_fields=['status', 'progress', 'updated_at'])
             progress_tracker.set_progress(file_id, 0, 'processing')
             
-            # Simulate processing time and progress updates
-            for progress in [10, 25, 50, 75, 90]:
-                time.sleep(0.5)  # Simulate processing time
-                uploaded_file.progress = progress
-                uploaded_file.save()
+            # Identical bytes parsed before as the same kind: reuse the result
+            kind = FileParser.detect_kind(uploaded_file.file_type, uploaded_file.original_filename)
+            spans.kind = kind
+            cached = cached_parse_result(uploaded_file.blob_id, kind) if use_cache else None
+            if cached is not None:
+                metrics.increment(metrics.PARSE_CACHE_HITS)
+                AsyncFileProcessor._mark_ready(uploaded_file, cached)
+                logger.info(f"Reused cached parse result for file: {uploaded_file.original_filename}")
+                return
+            
+            def publish_progress(progress: int):
                 progress_tracker.set_progress(file_id, progress, 'processing')
             
+            def save_progress(progress: int):
+                uploaded_file.progress = progress
+                uploaded_file.save(update_fields=['progress', 'updated_at'])
+            
+            min_delta = getattr(settings, 'FILE_PARSER_PROGRESS_MIN_DELTA', 1)
+            tracker_reporter = ProgressReporter(
+                publish_progress,
+                end=95,
+                min_interval=getattr(settings, 'FILE_PARSER_PROGRESS_MIN_INTERVAL', 0.5),
+                min_delta=min_delta,
+            )
+            # Readers get live progress from the tracker; the row only needs
+            # to stay roughly current, so its writes are coalesced further
+            db_reporter = ProgressReporter(
+                save_progress,
+                end=95,
+                min_interval=getattr(settings, 'FILE_PARSER_PROGRESS_DB_INTERVAL', 5.0),
+                min_delta=min_delta,
+            )
+            
+            def reporter(completed: int, total: int):
+                tracker_reporter(completed, total)
+                db_reporter(completed, total)
+            
             # Parse the file
             logger.info(f"Starting to parse file: {uploaded_file.original_filename}")
             
-            parse_result = FileParser.parse_file(
-                uploaded_file.file_content,
-                uploaded_file.file_type,
-                uploaded_file.original_filename
-            )
+            # CSV and Excel rows go to columnar table files rather than JSON
+            table_dir = None
+            table_format = default_table_format()
+            if table_format and AsyncFileProcessor._is_tabular(uploaded_file):
+                table_dir = new_table_dir()
+            
+            with spans.span('parse', bytes=uploaded_file.file_size) as parse_span:
+                with AsyncFileProcessor._open_source(uploaded_file) as source:
+                    parse_result = FileParser.parse_file(
+                        source,
+                        uploaded_file.file_type,
+                        uploaded_file.original_filename,
+                        progress_callback=reporter,
+                        table_dir=table_dir,
+                        table_format=table_format
+                    )
+                if parse_result['success']:
+                    parse_span.rows = AsyncFileProcessor._count_rows(parse_result['data'])
             
             if parse_result['success']:
-                # Save parsed content
-                ParsedContent.objects.create(
-                    file=uploaded_file,
-                    content=parse_result['data'],
-                    content_type=parse_result['content_type'],
-                    row_count=AsyncFileProcessor._count_rows(parse_result['data'])
-                )
-                
-                # Update file status to ready
-                uploaded_file.status = 'ready'
-                uploaded_file.progress = 100
-                uploaded_file.error_message = None
-                uploaded_file.save()
-                progress_tracker.set_progress(file_id, 100, 'ready')
-                
+                metrics.increment(metrics.PARSE_CACHE_MISSES)
+                try:
+                    parsed_content = AsyncFileProcessor._save_parse_result(uploaded_file, parse_result, table_dir, spans)
+                    AsyncFileProcessor._mark_ready(uploaded_file, parsed_content)
+                except Exception:
+                    # Tables of a result stored before the failure stay with it
+                    if table_dir and not ParsedTable.objects.filter(path__startswith=table_dir).exists():
+                        AsyncFileProcessor._discard_tables(table_dir)
+                    raise
                 logger.info(f"Successfully parsed file: {uploaded_file.original_filename}")
+                
+                # Indexed once the file is ready, so reading it never waits
+                # for search; its timings are stored first for the same reason
+                spans.save(file_id)
+                index_parsed_content(parsed_content)
             else:
+                AsyncFileProcessor._discard_tables(table_dir)
+                
                 # Update file status to failed
                 uploaded_file.status = 'failed'
                 uploaded_file.error_message = parse_result['error']
-                uploaded_file.save()
+                uploaded_file.save(update_fields=['status', 'error_message', 'updated_at'])
                 progress_tracker.set_status(file_id, 'failed')
                 
                 logger.error(f"Failed to parse file: {uploaded_file.original_filename}, Error: {parse_result['error']}")
@@ -81,23 +252,124 @@ class AsyncFileProcessor:
             logger.error(f"File with ID {file_id} not found")
         except Exception as e:
             logger.error(f"Unexpected error processing file {file_id}: {str(e)}")
+            if raise_errors:
+                raise
             try:
-                uploaded_file = UploadedFile.objects.get(id=file_id)
-                uploaded_file.status = 'failed'
-                uploaded_file.error_message = f"Processing error: {str(e)}"
-                uploaded_file.save()
+                UploadedFile.objects.filter(id=file_id).update(
+                    status='failed',
+                    error_message=f"Processing error: {str(e)}",
+                    updated_at=timezone.now()
+                )
                 progress_tracker.set_status(file_id, 'failed')
             except:
                 pass
+        finally:
+            spans.save(file_id)
+    
+    @staticmethod
+    def _save_parse_result(uploaded_file: UploadedFile, parse_result: dict, table_dir,
+                           spans: Optional[SpanRecorder] = None) -> ParsedContent:
+        """Store a successful parse result against the upload's content blob."""
+        spans = spans or SpanRecorder()
+        content = parse_result['data']
+        pages = parse_result.get('pages', [])
+        row_count = AsyncFileProcessor._count_rows(parse_result['data'])
+        with spans.span('serialize', rows=row_count) as serialize_span:
+            if pages:
+                # Page text lives in ParsedPage rows; the serializer rebuilds these
+                content = {key: value for key, value in content.items() if key not in ('pages', 'full_text')}
+            # The size of the JSON stored for the content; rows in tables are not part of it
+            serialize_span.bytes = len(dumps(content))
+        
+        try:
+            with spans.span('persist', rows=row_count), transaction.atomic():
+                parsed_content = ParsedContent.objects.create(
+                    blob_id=uploaded_file.blob_id,
+                    content=content,
+                    content_type=parse_result['content_type'],
+                    row_count=row_count
+                )
+                ParsedTable.objects.bulk_create([
+                    ParsedTable(
+                        parsed_content=parsed_content,
+                        name=table['name'],
+                        position=position,
+                        path=table['path'],
+                        format=table['format'],
+                        schema=table['schema'],
+                        row_count=table['row_count'],
+                        size_bytes=os.path.getsize(table['path'])
+                    )
+                    for position, table in enumerate(parse_result.get('tables', []))
+                ])
+                ParsedPage.objects.bulk_create([
+                    ParsedPage(
+                        parsed_content=parsed_content,
+                        number=page['page'],
+                        content=page['content'],
+                        engine=page['engine']
+                    )
+                    for page in pages
+                ], batch_size=500)
+            return parsed_content
+        except IntegrityError:
+            # An identical upload finished parsing first; share its result
+            existing = cached_parse_result(uploaded_file.blob_id, parse_result['content_type'])
+            if existing is None:
+                raise
+            AsyncFileProcessor._discard_tables(table_dir)
+            return existing
+    
+    @staticmethod
+    def _mark_ready(uploaded_file: UploadedFile, parsed_content: ParsedContent):
+        """Point the file at its parse result and mark it ready."""
+        previous_id = uploaded_file.parsed_content_id
+        uploaded_file.parsed_content = parsed_content
+        uploaded_file.status = 'ready'
+        uploaded_file.progress = 100
+        uploaded_file.error_message = None
+        uploaded_file.save(update_fields=['parsed_content', 'status', 'progress', 'error_message', 'updated_at'])
+        
+        # A re-parsed pre-deduplication upload owned its old result alone
+        if previous_id and previous_id != parsed_content.id:
+            ParsedContent.objects.filter(id=previous_id, blob__isnull=True).delete()
+        invalidate_query_cache(uploaded_file.id)
+        progress_tracker.set_progress(str(uploaded_file.id), 100, 'ready')
+    
+    @staticmethod
+    @contextmanager
+    def _open_source(uploaded_file: UploadedFile):
+        """Yield a path to the upload's bytes, or the bytes of a legacy DB-stored upload."""
+        if uploaded_file.storage_key:
+            with get_storage().local_path(uploaded_file.storage_key) as path:
+                yield path
+        else:
+            yield uploaded_file.file_content
+    
+    @staticmethod
+    def _discard_tables(table_dir):
+        """Remove table files left by a failed parse."""
+        if table_dir:
+            shutil.rmtree(table_dir, ignore_errors=True)
+    
+    @staticmethod
+    def _is_tabular(uploaded_file: UploadedFile) -> bool:
+        """Whether a file's rows can be stored as columnar tables."""
+        kind = FileParser.detect_kind(uploaded_file.file_type, uploaded_file.original_filename)
+        return kind in ('csv', 'excel')
     
     @staticmethod
     def _count_rows(parsed_data: dict) -> int:
         """Count rows in parsed data."""
         if 'rows' in parsed_data:
             return len(parsed_data['rows'])
+        elif parsed_data.get('encoding') == 'columns':
+            return parsed_data.get('total_rows', 0)
         elif 'sheets' in parsed_data:
             return parsed_data.get('total_rows', 0)
         elif 'pages' in parsed_data:
             return parsed_data.get('total_pages', 0)
+        elif 'total_rows' in parsed_data:
+            return parsed_data['total_rows']
         else:
             return 0
\ No newline at end of file
@@ -0,0 +1,12 @@
+from django.urls import path
+from . import async_views
+
+# Served ahead of `urls` under ASGI (see file_parser_project.asgi_urls)
+urlpatterns = [
+    path('files/upload/', async_views.upload_file, name='upload_file'),
+    path('files/progress/', async_views.get_files_progress, name='get_files_progress'),
+    path('files/progress/stream/', async_views.stream_files_progress, name='stream_files_progress'),
+    path('files/<uuid:file_id>/', async_views.get_file_content, name='get_file_content'),
+    path('files/<uuid:file_id>/progress/', async_views.get_file_progress, name='get_file_progress'),
+    path('files/<uuid:file_id>/progress/stream/', async_views.stream_file_progress, name='stream_file_progress'),
+]
@@ -0,0 +1,258 @@
+"""Async versions of the upload, progress and content views, served under ASGI.
+
+Under ASGI the request body is received on the event loop before the view
+runs, and these views await the database, stream their responses from
+async iterators and sleep on the event loop while long-polling, so no thread
+is blocked on a slow client while it sends or reads. Blocking work (storing
+the upload, reading stored tables) still runs in threads, one call at a time.
+
+The views answer exactly like their `views` counterparts; `asgi_urls` routes
+the same paths to them.
+"""
+import functools
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files import uploadedfile
+from django.http import HttpResponse, HttpResponseNotAllowed, StreamingHttpResponse
+from rest_framework import status
+
+from .async_processor import AsyncFileProcessor
+from .models import UploadedFile
+from .progress_stream import ProgressFeed, async_sse_events
+from .progress_tracker import progress_tracker
+from .renderers import aiter_json, contains_streamed_rows, dumps
+from .serializers import ParsedContentSerializer
+from .views import (
+    _accept_upload,
+    _client_id,
+    _event_stream_response,
+    _not_ready_data,
+    _parse_row_window,
+    _progress_file_ids,
+    _queue_full_response,
+    _upload_options,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _async_api_view(*methods):
+    """Allow only `methods`, and exempt the view from CSRF checks as `api_view` does.
+
+    Django 4.2's own view decorators only wrap synchronous views.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return HttpResponseNotAllowed(methods)
+            return await view(request, *args, **kwargs)
+        wrapper.csrf_exempt = True
+        return wrapper
+    return decorator
+
+
+def _json_response(data, code=status.HTTP_200_OK):
+    return HttpResponse(dumps(data), content_type='application/json', status=code)
+
+
+def _store_request_file(request, client, options):
+    """Store the file of an upload request; returns the response data and status.
+
+    The file is the multipart `file` part, as for `views.upload_file`, or
+    the request body itself, named by `?filename=`. A raw body is streamed
+    to storage as it is, without parsing or copying a multipart form.
+    """
+    if request.content_type == 'multipart/form-data':
+        file_obj = request.FILES.get('file')
+    elif request.GET.get('filename'):
+        if not request.META.get('CONTENT_LENGTH'):
+            return {'error': 'Content-Length is required'}, status.HTTP_411_LENGTH_REQUIRED
+        file_obj = uploadedfile.UploadedFile(
+            request, request.GET['filename'], request.content_type or None, int(request.META['CONTENT_LENGTH'])
+        )
+    else:
+        file_obj = None
+    if file_obj is None:
+        return {'error': 'No file provided'}, status.HTTP_400_BAD_REQUEST
+    max_size = getattr(settings, 'FILE_PARSER_MAX_UPLOAD_SIZE', 50 * 1024 * 1024)
+    if file_obj.size > max_size:
+        return {
+            'error': f'File too large. Maximum size is {max_size // (1024*1024)}MB'
+        }, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    return _accept_upload(file_obj, client, **options)
+
+
+@_async_api_view('POST')
+async def upload_file(request):
+    """Upload a file and start processing (see `views.upload_file`).
+
+    Besides a multipart form, the body may be the file itself:
+    `POST /api/files/upload/?filename=report.csv` with its Content-Type
+    and Content-Length.
+    """
+    try:
+        try:
+            options = _upload_options(request.GET)
+        except ValueError as e:
+            return _json_response({'error': str(e)}, status.HTTP_400_BAD_REQUEST)
+
+        if await sync_to_async(AsyncFileProcessor.queue_is_full)():
+            return _queue_full_response()
+
+        # Reading request.user may load the session
+        client = await sync_to_async(_client_id)(request)
+        data, code = await sync_to_async(_store_request_file)(request, client, options)
+        return _json_response(data, code)
+
+    except Exception as e:
+        logger.error(f"Error uploading file: {str(e)}")
+        return _json_response(
+            {'error': 'Internal server error during file upload'},
+            status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@_async_api_view('GET')
+async def get_file_progress(request, file_id):
+    """Get upload/processing progress for a file (see `views.get_file_progress`)."""
+    try:
+        progress_data = await sync_to_async(progress_tracker.get_progress, thread_sensitive=False)(file_id)
+        if progress_data and 'status' in progress_data and 'progress' in progress_data:
+            return _json_response({
+                'file_id': file_id,
+                'status': progress_data['status'],
+                'progress': progress_data['progress']
+            })
+
+        uploaded_file = await UploadedFile.objects.only('status', 'progress').filter(id=file_id).afirst()
+        if uploaded_file is None:
+            return _json_response({'error': 'File not found'}, status.HTTP_404_NOT_FOUND)
+        return _json_response({
+            'file_id': file_id,
+            'status': uploaded_file.status,
+            'progress': uploaded_file.progress
+        })
+
+    except Exception as e:
+        logger.error(f"Error getting progress for file {file_id}: {str(e)}")
+        return _json_response({'error': 'File not found'}, status.HTTP_404_NOT_FOUND)
+
+
+def _request_params(request):
+    """Query parameters of a GET, or the JSON object or form fields of a POST."""
+    if request.method == 'GET':
+        return request.GET
+    if request.content_type == 'application/json':
+        params = json.loads(request.body or b'{}')
+        if not isinstance(params, dict):
+            raise ValueError('Expected a JSON object')
+        return params
+    return request.POST
+
+
+@_async_api_view('GET', 'POST')
+async def get_files_progress(request):
+    """Progress of many files at once, optionally long-polling for changes (see `views.get_files_progress`)."""
+    try:
+        params = _request_params(request)
+        raw_ids = params.get('ids') or []
+        if isinstance(raw_ids, str):
+            raw_ids = [raw_id for raw_id in raw_ids.split(',') if raw_id.strip()]
+        file_ids = _progress_file_ids(raw_ids)
+        cursor = params.get('cursor')
+        wait = min(
+            float(params.get('wait', 0)),
+            getattr(settings, 'FILE_PARSER_PROGRESS_LONG_POLL_SECONDS', 30)
+        )
+        feed = await sync_to_async(ProgressFeed, thread_sensitive=False)(
+            file_ids, str(cursor) if cursor is not None else None
+        )
+    except (TypeError, ValueError) as e:
+        return _json_response({'error': str(e)}, status.HTTP_400_BAD_REQUEST)
+
+    try:
+        changes = await feed.apoll(max(0.0, wait))
+        return _json_response({
+            'files': changes,
+            'missing': feed.missing,
+            'cursor': feed.cursor
+        })
+    except Exception as e:
+        logger.error(f"Error getting progress for files: {str(e)}")
+        return _json_response({'error': 'Internal server error'}, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+async def _progress_stream_response(request, file_ids):
+    # Browsers resend the last event id when an EventSource reconnects
+    cursor = request.headers.get('Last-Event-ID') or request.GET.get('cursor')
+    try:
+        feed = await sync_to_async(ProgressFeed, thread_sensitive=False)(file_ids, cursor)
+    except ValueError as e:
+        return _json_response({'error': str(e)}, status.HTTP_400_BAD_REQUEST)
+    return _event_stream_response(
+        async_sse_events(feed, getattr(settings, 'FILE_PARSER_PROGRESS_STREAM_SECONDS', 300))
+    )
+
+
+@_async_api_view('GET')
+async def stream_file_progress(request, file_id):
+    """Server-Sent Events stream of one file's progress until it is ready or failed."""
+    return await _progress_stream_response(request, [file_id])
+
+
+@_async_api_view('GET')
+async def stream_files_progress(request):
+    """Server-Sent Events stream of the progress of the files in `ids`."""
+    try:
+        file_ids = _progress_file_ids(request.GET.get('ids', '').split(','))
+    except ValueError as e:
+        return _json_response({'error': str(e)}, status.HTTP_400_BAD_REQUEST)
+    return await _progress_stream_response(request, file_ids)
+
+
+def _serialized_content(parsed_content, window):
+    return ParsedContentSerializer(parsed_content, context={**window, 'stream_rows': True}).data
+
+
+@_async_api_view('GET')
+async def get_file_content(request, file_id):
+    """Get parsed file content (see `views.get_file_content`).
+
+    Rows stored as tables are sent as they are read, one stored batch at a
+    time, with the event loop free while the client reads each chunk.
+    """
+    try:
+        window = _parse_row_window(request.GET)
+    except ValueError as e:
+        return _json_response({'error': f'Invalid row window: {str(e)}'}, status.HTTP_400_BAD_REQUEST)
+
+    try:
+        uploaded_file = await (
+            UploadedFile.objects.defer('file_content').select_related('parsed_content').filter(id=file_id).afirst()
+        )
+        if uploaded_file is None:
+            return _json_response({'error': 'File not found'}, status.HTTP_404_NOT_FOUND)
+
+        if uploaded_file.status != 'ready':
+            return _json_response(await sync_to_async(_not_ready_data)(uploaded_file), status.HTTP_202_ACCEPTED)
+
+        parsed_content = uploaded_file.parsed_content
+        if parsed_content is None:
+            return _json_response({'error': 'Parsed content not found'}, status.HTTP_404_NOT_FOUND)
+        data = {
+            'file_id': file_id,
+            'filename': uploaded_file.original_filename,
+            'status': uploaded_file.status,
+            'parsed_content': await sync_to_async(_serialized_content)(parsed_content, window)
+        }
+        if contains_streamed_rows(data):
+            return StreamingHttpResponse(aiter_json(data), content_type='application/json')
+        return _json_response(data)
+
+    except Exception as e:
+        logger.error(f"Error getting file content for {file_id}: {str(e)}")
+        return _json_response({'error': 'File not found'}, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,113 @@
+import mimetypes
+import posixpath
+import zipfile
+from typing import BinaryIO, Iterable, Iterator, List, NamedTuple
+
+from django.conf import settings
+from django.db import transaction
+
+from .dedup import release_blob, stage_upload
+from .models import UploadBatch, UploadedFile
+
+ARCHIVE_READ_SIZE = 1024 * 1024
+
+
+class BatchUploadError(ValueError):
+    """A batch upload was rejected; nothing from it was kept."""
+
+
+class BatchMember(NamedTuple):
+    name: str
+    size: int
+    chunks: Iterable[bytes]
+    content_type: str
+
+
+def uploaded_members(files) -> Iterator[BatchMember]:
+    """Members of a multipart batch: one per uploaded file."""
+    for file_obj in files:
+        yield BatchMember(file_obj.name, file_obj.size, file_obj.chunks(), file_obj.content_type)
+
+
+def _read_member(archive: zipfile.ZipFile, info: zipfile.ZipInfo) -> Iterator[bytes]:
+    with archive.open(info) as member:
+        while True:
+            chunk = member.read(ARCHIVE_READ_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+def archive_members(archive_file: BinaryIO) -> Iterator[BatchMember]:
+    """Members of a zip archive, decompressed one chunk at a time as they are read.
+
+    Only the central directory is read up front; no member is extracted
+    to memory or disk as a whole. Directories and hidden or macOS resource
+    entries are skipped.
+    """
+    try:
+        archive = zipfile.ZipFile(archive_file)
+    except zipfile.BadZipFile:
+        raise BatchUploadError('Archive is not a valid zip file')
+
+    with archive:
+        for info in archive.infolist():
+            parts = info.filename.split('/')
+            if info.is_dir() or parts[0] == '__MACOSX' or any(part.startswith('.') for part in parts):
+                continue
+            if info.flag_bits & 0x1:
+                raise BatchUploadError(f'Encrypted archive member: {info.filename}')
+            content_type = mimetypes.guess_type(info.filename)[0] or 'application/octet-stream'
+            yield BatchMember(
+                posixpath.basename(info.filename)[:255],
+                info.file_size,
+                _read_member(archive, info),
+                content_type,
+            )
+
+
+def _limited(member: BatchMember, max_size: int, budget: List[int]) -> Iterator[bytes]:
+    # Archive headers can understate a member's size, so count what is read
+    size = 0
+    for chunk in member.chunks:
+        size += len(chunk)
+        budget[0] -= len(chunk)
+        if size > max_size:
+            raise BatchUploadError(f'{member.name} is larger than {max_size // (1024 * 1024)}MB')
+        if budget[0] < 0:
+            raise BatchUploadError('Batch is too large')
+        yield chunk
+
+
+def create_batch(members: Iterable[BatchMember], client: str = '') -> UploadBatch:
+    """Store every member and create the batch with its files.
+
+    Members are streamed to blob storage one at a time. The UploadedFile
+    rows are created with a single bulk insert once all bytes are stored.
+    If any member is rejected, the whole batch is: no rows are created and
+    the stored bytes are released. `client` is recorded on every file.
+    """
+    max_files = getattr(settings, 'FILE_PARSER_BATCH_MAX_FILES', 1000)
+    # Bytes left for the whole batch, after decompression
+    budget = [getattr(settings, 'FILE_PARSER_BATCH_MAX_BYTES', 1024 * 1024 * 1024)]
+    max_size = getattr(settings, 'FILE_PARSER_MAX_UPLOAD_SIZE', 50 * 1024 * 1024)
+
+    staged: List[dict] = []
+    try:
+        for member in members:
+            if len(staged) >= max_files:
+                raise BatchUploadError(f'Too many files. Maximum is {max_files} per batch')
+            if member.size > max_size:
+                raise BatchUploadError(f'{member.name} is larger than {max_size // (1024 * 1024)}MB')
+            staged.append(stage_upload(member.name, _limited(member, max_size, budget), member.content_type))
+        if not staged:
+            raise BatchUploadError('No files provided')
+
+        with transaction.atomic():
+            batch = UploadBatch.objects.create(total_files=len(staged))
+            UploadedFile.objects.bulk_create([UploadedFile(batch=batch, client=client, **fields) for fields in staged])
+        return batch
+    except BaseException:
+        for fields in staged:
+            release_blob(fields['blob'].id)
+        raise
@@ -0,0 +1,186 @@
+import re
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.ipc as ipc
+
+ROW_ENCODINGS = ('records', 'columns')
+# MIME type of the Arrow IPC streaming format
+ARROW_STREAM_CONTENT_TYPE = 'application/vnd.apache.arrow.stream'
+
+_TRUE_STRINGS = ('true', 'yes')
+_FALSE_STRINGS = ('false', 'no')
+# Leading shape of the ISO dates worth handing to the date parser
+_ISO_DATE_PATTERN = r'^\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?)?$'
+# Largest integer a float64 holds exactly; beyond it values stay floats
+_MAX_EXACT_FLOAT_INT = 2 ** 53
+
+
+def _infer_text(values: pd.Series, nulls: np.ndarray) -> Tuple[str, pd.Series]:
+    """Kind of a text column: boolean or date/datetime when every value parses, else string."""
+    present = values[~nulls]
+    if present.empty:
+        return 'string', values
+    # Most text columns are ruled out by their first value, without a full scan
+    first = str(present.iloc[0]).strip()
+    maybe_boolean = first.lower() in _TRUE_STRINGS or first.lower() in _FALSE_STRINGS
+    if not maybe_boolean and not re.match(_ISO_DATE_PATTERN, first):
+        return 'string', values
+    text = present.astype(str).str.strip()
+
+    if maybe_boolean:
+        lowered = text.str.lower()
+        is_true = lowered.isin(_TRUE_STRINGS)
+        if (is_true | lowered.isin(_FALSE_STRINGS)).all():
+            return 'boolean', is_true.reindex(values.index)
+        return 'string', values
+
+    # The regex check is cheap and rejects most text before the date parser runs
+    if text.str.match(_ISO_DATE_PATTERN).all():
+        parsed = pd.to_datetime(text, errors='coerce', format='ISO8601')
+        if parsed.notna().all() and getattr(parsed.dt, 'tz', None) is None:
+            return _date_kind(parsed), parsed.reindex(values.index)
+    return 'string', values
+
+
+def _date_kind(values: pd.Series) -> str:
+    present = values.dropna()
+    return 'date' if (present == present.dt.normalize()).all() else 'datetime'
+
+
+def infer_column(values: pd.Series) -> Tuple[str, pd.Series, np.ndarray]:
+    """Infer the kind of one column and return it with the typed values and a null mask.
+
+    Kinds are 'integer', 'float', 'boolean', 'date', 'datetime' and
+    'string'. Every check runs over whole columns: pandas already parses
+    numbers, so only float columns (integers with gaps are read as floats)
+    and text columns need a second look.
+    """
+    nulls = values.isna().to_numpy()
+    if nulls.all():
+        return 'string', values, nulls
+
+    if pd.api.types.is_bool_dtype(values):
+        return 'boolean', values, nulls
+    if pd.api.types.is_integer_dtype(values):
+        return 'integer', values, nulls
+    if pd.api.types.is_float_dtype(values):
+        finite = values.to_numpy(dtype='float64', na_value=np.nan)
+        nulls = nulls | ~np.isfinite(finite)
+        present = finite[~nulls]
+        if present.size and (np.abs(present) <= _MAX_EXACT_FLOAT_INT).all() and (np.floor(present) == present).all():
+            return 'integer', values, nulls
+        return 'float', values, nulls
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return _date_kind(values), values, nulls
+
+    kind, typed = _infer_text(values, nulls)
+    return kind, typed, nulls
+
+
+def typed_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Copy of `df` with each column converted to its inferred kind.
+
+    Integers with gaps become nullable integers rather than floats, and
+    boolean or ISO date text becomes booleans or timestamps, so tables
+    written from it carry the inferred types.
+    """
+    typed = {}
+    for name in df.columns:
+        kind, values, nulls = infer_column(df[name])
+        if nulls.all():
+            # Untyped, so a batch of gaps does not widen the column's type
+            values = pd.Series(None, index=df.index, dtype=object)
+        elif kind == 'integer' and not pd.api.types.is_integer_dtype(values):
+            values = values.where(~nulls).astype('Int64')
+        elif kind == 'float':
+            values = values.where(~nulls)
+        elif kind == 'boolean' and not pd.api.types.is_bool_dtype(values):
+            values = values.astype('boolean')
+        typed[name] = values
+    return pd.DataFrame(typed, index=df.index, columns=df.columns)
+
+
+def _values_list(kind: str, values: pd.Series, nulls: np.ndarray) -> List[Any]:
+    """Column values as a JSON-ready list, with None where the mask is set."""
+    if kind == 'integer':
+        array = values.to_numpy(dtype='float64', na_value=0) if nulls.any() else values.to_numpy()
+        array = np.where(nulls, 0, array).astype('int64')
+    elif kind == 'float':
+        array = np.where(nulls, 0.0, values.to_numpy(dtype='float64', na_value=0.0))
+    elif kind == 'boolean':
+        array = values.fillna(False).to_numpy(dtype=bool)
+    elif kind == 'date':
+        array = values.dt.strftime('%Y-%m-%d').to_numpy(dtype=object)
+    elif kind == 'datetime':
+        array = values.dt.strftime('%Y-%m-%dT%H:%M:%S').to_numpy(dtype=object)
+    else:
+        array = values.astype(str).to_numpy(dtype=object)
+
+    if not nulls.any():
+        # numpy converts to Python scalars in one C loop
+        return array.tolist()
+    boxed = array.astype(object)
+    boxed[nulls] = None
+    return boxed.tolist()
+
+
+def encode_columns(df: pd.DataFrame) -> Dict[str, Any]:
+    """Encode a DataFrame column by column.
+
+    Returns `schema` (name, kind and null count per column) and
+    `column_values` (one list per column, in schema order, with null for
+    missing values). Header keys are not repeated per row and every value
+    is a plain JSON scalar: no NaN, infinities or numpy types.
+    """
+    schema = []
+    column_values = []
+    for name in df.columns:
+        kind, typed, nulls = infer_column(df[name])
+        schema.append({'name': str(name), 'kind': kind, 'nulls': int(nulls.sum())})
+        column_values.append(_values_list(kind, typed, nulls))
+    return {'schema': schema, 'column_values': column_values}
+
+
+def columns_to_records(headers: List[str], column_values: List[List[Any]]) -> List[Dict[str, Any]]:
+    """Rows of a column-encoded table as dicts keyed by header."""
+    return [dict(zip(headers, row)) for row in zip(*column_values)]
+
+
+def encode_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Rows as dicts, with the same typed, JSON-safe values as `encode_columns`."""
+    encoded = encode_columns(df)
+    return columns_to_records([column['name'] for column in encoded['schema']], encoded['column_values'])
+
+
+def finite_floats(table: pa.Table) -> pa.Table:
+    """Replace NaN and infinite floats with nulls, which JSON can represent."""
+    for index, column in enumerate(table.columns):
+        if pa.types.is_floating(column.type):
+            finite = pc.fill_null(pc.is_finite(column), True)
+            if not pc.all(finite).as_py():
+                table = table.set_column(index, table.field(index), pc.if_else(finite, column, None))
+    return table
+
+
+def arrow_column_values(table: pa.Table) -> List[List[Any]]:
+    """JSON-safe values of each column of an Arrow table, in column order."""
+    column_values = []
+    for column in finite_floats(table).columns:
+        if column.null_count == 0 and (pa.types.is_integer(column.type) or pa.types.is_floating(column.type)
+                                       or pa.types.is_boolean(column.type)):
+            column_values.append(column.to_numpy().tolist())
+        else:
+            column_values.append(column.to_pylist())
+    return column_values
+
+
+def arrow_stream_bytes(table: pa.Table) -> bytes:
+    """Serialize a table in the Arrow IPC streaming format."""
+    sink = pa.BufferOutputStream()
+    with ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
@@ -0,0 +1,84 @@
+import hashlib
+import logging
+import os
+import uuid
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import F
+from django.utils.text import get_valid_filename
+
+from . import metrics
+from .models import ContentBlob, ParsedContent
+from .storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+
+def store_upload(storage_key: str, chunks: Iterable[bytes]) -> Tuple[ContentBlob, bool]:
+    """Stream an upload to blob storage and take a reference on its content blob.
+
+    The bytes are hashed with SHA-256 as they are written. If a blob with the
+    same digest already exists, the new copy is deleted and the existing blob
+    is shared. Returns the blob and whether it was already stored.
+    """
+    storage = get_storage()
+    digest = hashlib.sha256()
+
+    def hashed_chunks():
+        for chunk in chunks:
+            digest.update(chunk)
+            yield chunk
+
+    size = storage.save(storage_key, hashed_chunks())
+    sha256 = digest.hexdigest()
+
+    while True:
+        with transaction.atomic():
+            blob, created = ContentBlob.objects.get_or_create(
+                sha256=sha256, defaults={'storage_key': storage_key, 'size': size}
+            )
+            # Fails only if the last reference was released since the lookup
+            if ContentBlob.objects.filter(id=blob.id).update(ref_count=F('ref_count') + 1):
+                break
+
+    if not created:
+        storage.delete(storage_key)
+        metrics.increment_many({metrics.UPLOAD_DEDUP_HITS: 1, metrics.UPLOAD_DEDUP_BYTES: size})
+    return blob, not created
+
+
+def stage_upload(name: str, chunks: Iterable[bytes], content_type: Optional[str] = None) -> Dict[str, Any]:
+    """Store an upload's bytes and return the UploadedFile fields describing them.
+
+    The caller owns the blob reference taken here and must `release_blob`
+    it if the UploadedFile row is never created.
+    """
+    file_id = uuid.uuid4()
+    storage_key = f"{file_id}/{get_valid_filename(os.path.basename(name)) or 'upload'}"
+    blob, _ = store_upload(storage_key, chunks)
+    return {
+        'id': file_id,
+        'original_filename': name,
+        'filename': name,
+        'file_size': blob.size,
+        'file_type': content_type or 'application/octet-stream',
+        'storage_key': blob.storage_key,
+        'blob': blob,
+    }
+
+
+def release_blob(blob_id: int):
+    """Drop one reference to a blob, deleting it with its bytes and parse results at zero."""
+    with transaction.atomic():
+        ContentBlob.objects.filter(id=blob_id).update(ref_count=F('ref_count') - 1)
+        # Deleting cascades to ParsedContent/ParsedTable; signals remove the files
+        for blob in ContentBlob.objects.filter(id=blob_id, ref_count__lte=0):
+            blob.delete()
+
+
+def cached_parse_result(blob_id: Optional[int], kind: Optional[str]) -> Optional[ParsedContent]:
+    """Parse result already stored for the same bytes parsed as the same kind."""
+    if blob_id is None or kind is None:
+        return None
+    return ParsedContent.objects.filter(blob_id=blob_id, content_type=kind).first()
@@ -0,0 +1,229 @@
+import datetime
+import importlib.util
+import io
+import os
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Type, Union
+
+from django.conf import settings
+
+# Legacy .xls workbooks are OLE2 compound documents; .xlsx/.xlsm are zip archives
+OLE2_MAGIC = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+
+ExcelSource = Union[bytes, str, os.PathLike]
+
+
+def workbook_format(source: ExcelSource) -> str:
+    """Return 'xls' or 'xlsx' from the file's magic bytes rather than its name."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        head = bytes(source[:8])
+    else:
+        with open(source, 'rb') as f:
+            head = f.read(8)
+    return 'xls' if head.startswith(OLE2_MAGIC) else 'xlsx'
+
+
+def _clean_number(value: Any) -> Any:
+    # Excel stores every number as a float; report whole numbers as ints
+    # the way openpyxl does.
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+class ExcelEngine:
+    """Read a workbook sheet by sheet, yielding rows of cell values.
+
+    Subclasses wrap one reader library. Rows are produced lazily so callers
+    can write them out in chunks instead of materializing whole sheets.
+    """
+
+    name = None
+    module = None
+    formats = ()
+
+    @classmethod
+    def is_available(cls) -> bool:
+        return importlib.util.find_spec(cls.module) is not None
+
+    def __init__(self, source: ExcelSource):
+        raise NotImplementedError
+
+    @property
+    def sheet_names(self) -> List[str]:
+        raise NotImplementedError
+
+    def row_count(self, sheet_name: str) -> Optional[int]:
+        """Row count from the workbook metadata, or None if it is not recorded."""
+        raise NotImplementedError
+
+    def iter_rows(self, sheet_name: str) -> Iterator[Sequence[Any]]:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class OpenpyxlEngine(ExcelEngine):
+    """openpyxl in read-only mode: rows are parsed from the sheet XML as they are read."""
+
+    name = 'openpyxl'
+    module = 'openpyxl'
+    formats = ('xlsx',)
+
+    def __init__(self, source: ExcelSource):
+        from openpyxl import load_workbook
+
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            source = io.BytesIO(source)
+        self._workbook = load_workbook(source, read_only=True, data_only=True)
+
+    @property
+    def sheet_names(self) -> List[str]:
+        # Chartsheets have no cells
+        return [ws.title for ws in self._workbook.worksheets if hasattr(ws, 'iter_rows')]
+
+    def row_count(self, sheet_name: str) -> Optional[int]:
+        return self._workbook[sheet_name].max_row
+
+    def iter_rows(self, sheet_name: str) -> Iterator[Sequence[Any]]:
+        return self._workbook[sheet_name].iter_rows(values_only=True)
+
+    def close(self):
+        # Read-only workbooks keep the archive open until closed
+        self._workbook.close()
+
+
+class CalamineEngine(ExcelEngine):
+    """python-calamine (Rust): fast reader for .xlsx, .xlsm, .xlsb and .xls."""
+
+    name = 'calamine'
+    module = 'python_calamine'
+    formats = ('xlsx', 'xls')
+
+    def __init__(self, source: ExcelSource):
+        from python_calamine import CalamineWorkbook
+
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            self._workbook = CalamineWorkbook.from_filelike(io.BytesIO(source))
+        else:
+            self._workbook = CalamineWorkbook.from_path(os.fspath(source))
+
+    @property
+    def sheet_names(self) -> List[str]:
+        return list(self._workbook.sheet_names)
+
+    def row_count(self, sheet_name: str) -> Optional[int]:
+        return self._workbook.get_sheet_by_name(sheet_name).height
+
+    @staticmethod
+    def _value(value: Any) -> Any:
+        # calamine reports empty cells as '' and midnight datetimes as dates
+        if value == '':
+            return None
+        if type(value) is datetime.date:
+            return datetime.datetime.combine(value, datetime.time())
+        return _clean_number(value)
+
+    def iter_rows(self, sheet_name: str) -> Iterator[Sequence[Any]]:
+        sheet = self._workbook.get_sheet_by_name(sheet_name)
+        rows = sheet.iter_rows() if hasattr(sheet, 'iter_rows') else sheet.to_python()
+        for row in rows:
+            yield [self._value(value) for value in row]
+
+    def close(self):
+        if hasattr(self._workbook, 'close'):
+            self._workbook.close()
+
+
+class XlrdEngine(ExcelEngine):
+    """xlrd 2.x: reader for legacy .xls workbooks, loading one sheet at a time."""
+
+    name = 'xlrd'
+    module = 'xlrd'
+    formats = ('xls',)
+
+    def __init__(self, source: ExcelSource):
+        import xlrd
+
+        self._xlrd = xlrd
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            self._book = xlrd.open_workbook(file_contents=bytes(source), on_demand=True)
+        else:
+            self._book = xlrd.open_workbook(os.fspath(source), on_demand=True)
+
+    @property
+    def sheet_names(self) -> List[str]:
+        return self._book.sheet_names()
+
+    def row_count(self, sheet_name: str) -> Optional[int]:
+        return self._book.sheet_by_name(sheet_name).nrows
+
+    def _value(self, cell) -> Any:
+        xlrd = self._xlrd
+        if cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK, xlrd.XL_CELL_ERROR):
+            return None
+        if cell.ctype == xlrd.XL_CELL_DATE:
+            return xlrd.xldate.xldate_as_datetime(cell.value, self._book.datemode)
+        if cell.ctype == xlrd.XL_CELL_BOOLEAN:
+            return bool(cell.value)
+        return _clean_number(cell.value)
+
+    def iter_rows(self, sheet_name: str) -> Iterator[Sequence[Any]]:
+        sheet = self._book.sheet_by_name(sheet_name)
+        try:
+            for index in range(sheet.nrows):
+                yield [self._value(cell) for cell in sheet.row(index)]
+        finally:
+            self._book.unload_sheet(sheet_name)
+
+    def close(self):
+        self._book.release_resources()
+
+
+ENGINES: Dict[str, Type[ExcelEngine]] = {
+    'openpyxl': OpenpyxlEngine,
+    'calamine': CalamineEngine,
+    'xlrd': XlrdEngine,
+}
+
+# Engines tried in order when FILE_PARSER_EXCEL_ENGINE is 'auto'
+AUTO_ENGINES = {
+    'xlsx': ('calamine', 'openpyxl'),
+    'xls': ('calamine', 'xlrd'),
+}
+
+
+def engine_class(file_format: str, engine: Optional[str] = None) -> Type[ExcelEngine]:
+    """Pick the engine class for a workbook format.
+
+    `engine` defaults to FILE_PARSER_EXCEL_ENGINE; 'auto' takes the first
+    installed engine from AUTO_ENGINES.
+    """
+    engine = engine or getattr(settings, 'FILE_PARSER_EXCEL_ENGINE', 'auto')
+    if engine == 'auto':
+        for name in AUTO_ENGINES[file_format]:
+            if ENGINES[name].is_available():
+                return ENGINES[name]
+        raise ValueError(
+            f"No Excel engine installed for .{file_format} files; install one of: {', '.join(AUTO_ENGINES[file_format])}"
+        )
+
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown Excel engine: {engine}. Expected 'auto' or one of {', '.join(ENGINES)}")
+    cls = ENGINES[engine]
+    if file_format not in cls.formats:
+        raise ValueError(f"Excel engine {engine} cannot read .{file_format} files")
+    if not cls.is_available():
+        raise ValueError(f"Excel engine {engine} is not installed")
+    return cls
+
+
+def open_workbook(source: ExcelSource, engine: Optional[str] = None) -> ExcelEngine:
+    """Open a workbook with the engine configured for its format."""
+    return engine_class(workbook_format(source), engine)(source)
@@ -0,0 +1,150 @@
+import logging
+import multiprocessing
+import os
+import queue
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_from_path(path: str, file_type: str, filename: str, progress_queue=None, **options) -> Dict[str, Any]:
+    """Parse a file on disk (runs inside a pool process)."""
+    from .file_parser import FileParser
+
+    progress_callback = None
+    if progress_queue is not None:
+        def progress_callback(completed, total):
+            progress_queue.put((completed, total))
+
+    return FileParser.dispatch(path, file_type, filename, progress_callback, **options)
+
+
+class InlineBackend:
+    """Parse in the calling thread."""
+
+    name = 'inline'
+
+    def parse(self, source, file_type: str, filename: str,
+              progress_callback: Optional[Callable[[int, int], None]] = None, **options) -> Dict[str, Any]:
+        from .file_parser import FileParser
+        return FileParser.dispatch(source, file_type, filename, progress_callback, **options)
+
+
+class ProcessPoolBackend:
+    """Parse in a pool of worker processes so CPU-bound parses run in parallel.
+
+    Only a file path is sent to the child, so the payload is never pickled;
+    sources passed as bytes are first staged in a temporary file. The parse result crosses
+    the process boundary exactly once, as the return value of the task.
+    Progress reported by the child is relayed through a manager queue and
+    replayed to the caller's callback in the calling thread.
+    """
+
+    PROGRESS_POLL_SECONDS = 0.1
+
+    name = 'process'
+
+    def __init__(self, max_workers: Optional[int] = None, temp_dir: Optional[str] = None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.temp_dir = temp_dir
+        self._executor = None
+        self._manager = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # Spawned children start clean: forking a threaded web or
+                # worker process could copy held locks and open DB sockets.
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                )
+            return self._executor
+
+    def _get_manager(self):
+        with self._lock:
+            if self._manager is None:
+                self._manager = multiprocessing.get_context('spawn').Manager()
+            return self._manager
+
+    def _reset_executor(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def parse(self, source, file_type: str, filename: str,
+              progress_callback: Optional[Callable[[int, int], None]] = None, **options) -> Dict[str, Any]:
+        staged_path = None
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            fd, staged_path = tempfile.mkstemp(prefix='parse-', dir=self.temp_dir)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(source)
+        path = staged_path or os.fspath(source)
+
+        try:
+            progress_queue = self._get_manager().Queue() if progress_callback else None
+            future = self._get_executor().submit(
+                _parse_from_path, path, file_type, filename, progress_queue, **options
+            )
+            if progress_queue is None:
+                return future.result()
+
+            while True:
+                try:
+                    progress_callback(*progress_queue.get(timeout=self.PROGRESS_POLL_SECONDS))
+                except queue.Empty:
+                    if future.done():
+                        break
+            return future.result()
+        except BrokenProcessPool as e:
+            # A child died (e.g. OOM-killed); start a fresh pool next time.
+            logger.error(f"Parse process pool broke while parsing {filename}: {str(e)}")
+            self._reset_executor()
+            return {
+                'success': False,
+                'error': 'Parser process terminated unexpectedly',
+                'content_type': 'unknown'
+            }
+        finally:
+            if staged_path:
+                try:
+                    os.unlink(staged_path)
+                except OSError:
+                    pass
+
+    def shutdown(self):
+        self._reset_executor()
+        with self._lock:
+            if self._manager is not None:
+                self._manager.shutdown()
+                self._manager = None
+
+
+_default_backend = None
+_default_lock = threading.Lock()
+
+
+def get_parse_backend():
+    """Return the backend configured by FILE_PARSER_PARSE_BACKEND."""
+    global _default_backend
+
+    with _default_lock:
+        if _default_backend is None:
+            from django.conf import settings
+
+            backend_name = getattr(settings, 'FILE_PARSER_PARSE_BACKEND', 'inline')
+            if backend_name == 'process':
+                _default_backend = ProcessPoolBackend(
+                    max_workers=getattr(settings, 'FILE_PARSER_PARSE_PROCESSES', None),
+                )
+            elif backend_name == 'inline':
+                _default_backend = InlineBackend()
+            else:
+                raise ValueError(f"Unknown parse backend: {backend_name}. Expected 'inline' or 'process'")
+        return _default_backend
@@ -1,31 +1,116 @@
 import pandas as pd
-import PyPDF2
-import pdfplumber
+import csv
 import io
+import os
 import json
 import logging
-from typing import Dict, Any, List
-from openpyxl import load_workbook
+from typing import Dict, Any, List, Callable, Optional, Tuple, Union, BinaryIO
+from itertools import islice
+from django.conf import settings
+from .columnar import ROW_ENCODINGS, columns_to_records, encode_columns, typed_frame
+from .excel_engines import open_workbook
+from .execution import get_parse_backend
+from .pdf_extraction import extract_pages
+from .table_store import open_table_writer, table_path_in, delete_table, write_table_part
 
 logger = logging.getLogger(__name__)
 
+# Parsers accept the raw bytes or a path to the file on disk
+FileSource = Union[bytes, str, os.PathLike]
+
+# Called as progress_callback(completed, total); units depend on the parser
+# (bytes for CSV, rows for Excel, pages for PDF).
+ProgressCallback = Callable[[int, int], None]
+
+# Report Excel progress every this many rows rather than on every row
+EXCEL_PROGRESS_EVERY_ROWS = 500
+# Rows of a sheet held in memory before they are written to its table
+EXCEL_STREAM_CHUNK_ROWS = 10_000
+
+# Streaming CSV: rows per chunk and bytes sampled for delimiter/header sniffing
+CSV_STREAM_CHUNK_ROWS = 50_000
+CSV_SNIFF_BYTES = 64 * 1024
+
+
+class _ProgressReader(io.RawIOBase):
+    """Read-only stream that reports how many bytes were consumed."""
+    
+    def __init__(self, raw, total: int, progress_callback: ProgressCallback):
+        self._raw = raw
+        self._total = total
+        self._progress_callback = progress_callback
+    
+    def readable(self) -> bool:
+        return True
+    
+    def readinto(self, b) -> int:
+        count = self._raw.readinto(b)
+        self._progress_callback(self._raw.tell(), self._total)
+        return count
+    
+    def close(self):
+        self._raw.close()
+        super().close()
+
+
+def _open_binary(source: FileSource) -> Tuple[BinaryIO, int]:
+    """Open a file source for binary reading and return it with its size."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source), len(source)
+    return open(source, 'rb'), os.path.getsize(source)
+
+
+def _as_input(source: FileSource):
+    """Adapt a file source for libraries that take a path or file object."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    return os.fspath(source)
+
 
 class FileParser:
     """File parser for different file types."""
     
     @staticmethod
-    def parse_csv(file_content: bytes) -> Dict[str, Any]:
-        """Parse CSV file content."""
+    def parse_csv(source: FileSource, progress_callback: Optional[ProgressCallback] = None,
+                  encoding: Optional[str] = None) -> Dict[str, Any]:
+        """Parse CSV file content, reporting bytes consumed.
+        
+        Column kinds are inferred over whole columns. `encoding` (default
+        FILE_PARSER_INLINE_ROW_ENCODING) selects how rows are returned:
+        'records' gives `rows` as a list of dicts; 'columns' gives `schema`
+        and `column_values`, one list per column, which is far smaller and
+        faster to encode for wide numeric files.
+        """
+        encoding = encoding or getattr(settings, 'FILE_PARSER_INLINE_ROW_ENCODING', 'records')
+        if encoding not in ROW_ENCODINGS:
+            raise ValueError(f"Unknown row encoding: {encoding}. Expected one of {', '.join(ROW_ENCODINGS)}")
         try:
-            df = pd.read_csv(io.BytesIO(file_content))
+            raw, total = _open_binary(source)
+            with raw:
+                # Sniffed like parse_csv_stream, so both give a file the same columns
+                sample = raw.read(CSV_SNIFF_BYTES)
+                raw.seek(0)
+                dialect = FileParser._sniff_csv(sample)
+                
+                stream = raw
+                if progress_callback:
+                    stream = io.BufferedReader(_ProgressReader(raw, total, progress_callback))
+                df = pd.read_csv(stream, **FileParser._csv_read_options(sample, dialect))
             
-            # Convert DataFrame to dictionary
             data = {
-                'headers': df.columns.tolist(),
-                'rows': df.to_dict('records'),
+                'headers': [str(column) for column in df.columns],
+                'has_header': dialect['has_header'],
+                'delimiter': dialect['delimiter'],
                 'total_rows': len(df),
                 'columns': len(df.columns)
             }
+            encoded = encode_columns(df)
+            if encoding == 'columns':
+                data['encoding'] = 'columns'
+                data.update(encoded)
+            else:
+                data['schema'] = encoded['schema']
+                data['rows'] = columns_to_records(data['headers'], encoded['column_values'])
             
             return {
                 'success': True,
@@ -41,33 +126,236 @@ class FileParser:
             }
     
     @staticmethod
-    def parse_excel(file_content: bytes) -> Dict[str, Any]:
-        """Parse Excel file content."""
+    def _sniff_csv(sample: bytes) -> Dict[str, Any]:
+        """Detect the delimiter and whether the first row is a header."""
+        text = sample.decode('utf-8', errors='replace')
+        # Drop a trailing partial line so the sniffer only sees whole rows
+        if '\n' in text:
+            text = text[:text.rfind('\n')]
+        
+        sniffer = csv.Sniffer()
+        try:
+            delimiter = sniffer.sniff(text, delimiters=',;\t|').delimiter
+        except csv.Error:
+            delimiter = ','
+        
+        # Like pd.read_csv, assume a header unless the first row looks like
+        # data: the sniffer votes against a header and a field is numeric.
+        first_row = next(csv.reader(io.StringIO(text), delimiter=delimiter), [])
+        has_numeric_field = any(FileParser._is_number(field) for field in first_row)
+        try:
+            has_header = not has_numeric_field or sniffer.has_header(text)
+        except csv.Error:
+            has_header = True
+        return {'delimiter': delimiter, 'has_header': has_header}
+    
+    @staticmethod
+    def _csv_read_options(sample: bytes, dialect: Dict[str, Any]) -> Dict[str, Any]:
+        """pd.read_csv options for a sniffed dialect; files without a header get numbered columns."""
+        read_options = {'sep': dialect['delimiter']}
+        if not dialect['has_header']:
+            first_line = sample.split(b'\n', 1)[0].decode('utf-8', errors='replace')
+            column_count = len(next(csv.reader([first_line], delimiter=dialect['delimiter']), []))
+            read_options['header'] = None
+            read_options['names'] = [f'column_{i + 1}' for i in range(column_count)]
+        return read_options
+    
+    @staticmethod
+    def _is_number(value: str) -> bool:
         try:
-            workbook = load_workbook(io.BytesIO(file_content))
-            sheets_data = {}
-            total_rows = 0
+            float(value)
+            return True
+        except ValueError:
+            return False
+    
+    @staticmethod
+    def parse_csv_stream(source: FileSource, table_path: str, table_format: str = 'parquet',
+                         chunksize: int = CSV_STREAM_CHUNK_ROWS,
+                         progress_callback: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+        """Parse CSV in row chunks, writing rows to a table file as they are read.
+        
+        `source` is the raw bytes or a path to the file. Only one chunk of
+        rows is held in memory at a time; column kinds are inferred per chunk
+        (see `columnar.infer_column`) and merged, and the returned data holds
+        the header, schema and row count but not the rows themselves.
+        """
+        writer = None
+        try:
+            raw, total = _open_binary(source)
+            with raw:
+                sample = raw.read(CSV_SNIFF_BYTES)
+                raw.seek(0)
+                dialect = FileParser._sniff_csv(sample)
+                
+                stream = raw
+                if progress_callback:
+                    stream = io.BufferedReader(_ProgressReader(raw, total, progress_callback))
+                
+                read_options = {**FileParser._csv_read_options(sample, dialect), 'chunksize': chunksize}
+                
+                writer = open_table_writer(table_path, table_format)
+                headers = None
+                
+                for chunk in pd.read_csv(stream, **read_options):
+                    if headers is None:
+                        headers = [str(column) for column in chunk.columns]
+                    chunk.columns = headers
+                    writer.write_batch(typed_frame(chunk))
             
-            for sheet_name in workbook.sheetnames:
-                sheet = workbook[sheet_name]
+            writer.close()
+            headers = headers or []
+            schema = writer.describe()
+            
+            return {
+                'success': True,
+                'data': {
+                    'headers': headers,
+                    'dtypes': {column['name']: column['kind'] for column in schema},
+                    'has_header': dialect['has_header'],
+                    'delimiter': dialect['delimiter'],
+                    'total_rows': writer.rows_written,
+                    'columns': len(headers),
+                    'streamed': True
+                },
+                'content_type': 'csv',
+                'tables': [{
+                    'name': '',
+                    'path': table_path,
+                    'format': writer.format,
+                    'schema': schema,
+                    'row_count': writer.rows_written
+                }]
+            }
+        except Exception as e:
+            if writer is not None:
+                writer.abort()
+            logger.error(f"Error parsing CSV: {str(e)}")
+            return {
+                'success': False,
+                'error': f"Failed to parse CSV: {str(e)}",
+                'content_type': 'csv'
+            }
+    
+    @staticmethod
+    def parse_csv_tail(source: FileSource, offset: int, headers: List[str], delimiter: str,
+                       base_path: str, part_path: str, table_format: str = 'parquet',
+                       chunksize: int = CSV_STREAM_CHUNK_ROWS) -> int:
+        """Parse the rows after byte `offset` of a CSV into a part of an existing table.
+        
+        `offset` must fall on a line boundary; the rows there are read with
+        the header and delimiter found when the file was first parsed, and
+        written with the schema of the table at `base_path` (see
+        `table_store.write_table_part`). Returns the number of rows
+        appended; raises ValueError if they do not fit the table.
+        """
+        raw, _ = _open_binary(source)
+        with raw:
+            raw.seek(offset)
+            if not raw.read(1):
+                return 0
+            raw.seek(offset)
+            chunks = pd.read_csv(
+                raw, sep=delimiter, header=None, names=headers, index_col=False, chunksize=chunksize
+            )
+            return write_table_part(base_path, table_format, part_path, (typed_frame(chunk) for chunk in chunks))
+    
+    @staticmethod
+    def _column_names(headers: List[Any]) -> List[str]:
+        """Turn a header row into unique, non-empty column names."""
+        names = []
+        seen = set()
+        for index, header in enumerate(headers):
+            name = str(header) if header is not None and str(header).strip() else f'column_{index + 1}'
+            unique = name
+            suffix = 1
+            while unique in seen:
+                suffix += 1
+                unique = f'{name}_{suffix}'
+            seen.add(unique)
+            names.append(unique)
+        return names
+    
+    @staticmethod
+    def parse_excel(source: FileSource, progress_callback: Optional[ProgressCallback] = None,
+                    table_dir: Optional[str] = None, table_format: str = 'parquet',
+                    sheets: Optional[List[str]] = None, engine: Optional[str] = None) -> Dict[str, Any]:
+        """Parse Excel file content, reporting rows read across all sheets.
+        
+        Rows are streamed from the workbook by the engine picked in
+        `excel_engines` (`engine` overrides FILE_PARSER_EXCEL_ENGINE), and
+        `sheets` limits parsing to the named sheets. When `table_dir` is
+        given, each sheet's rows are written to a table file there in chunks
+        and only headers and row counts are returned.
+        """
+        tables = []
+        try:
+            with open_workbook(source, engine) as workbook:
+                sheet_names = workbook.sheet_names
+                if sheets is not None:
+                    missing = [name for name in sheets if name not in sheet_names]
+                    if missing:
+                        raise ValueError(f"Sheets not found: {', '.join(missing)}")
+                    sheet_names = [name for name in sheet_names if name in sheets]
+                
+                sheets_data = {}
+                total_rows = 0
+                # Dimensions may be missing from the workbook; then progress is unknown
+                rows_expected = sum(workbook.row_count(name) or 0 for name in sheet_names)
+                rows_read = 0
                 
-                # Convert sheet to list of lists
-                data = []
-                for row in sheet.iter_rows(values_only=True):
-                    data.append(list(row))
+                def tracked(rows):
+                    nonlocal rows_read
+                    for row in rows:
+                        rows_read += 1
+                        if progress_callback and rows_read % EXCEL_PROGRESS_EVERY_ROWS == 0:
+                            progress_callback(rows_read, rows_expected)
+                        yield row
                 
-                if data:
-                    headers = data[0] if data else []
-                    rows = data[1:] if len(data) > 1 else []
+                for sheet_name in sheet_names:
+                    rows = tracked(workbook.iter_rows(sheet_name))
+                    header_row = next(rows, None)
+                    if header_row is None:
+                        continue
                     
-                    sheets_data[sheet_name] = {
-                        'headers': headers,
-                        'rows': [dict(zip(headers, row)) for row in rows],
-                        'total_rows': len(rows)
-                    }
-                    total_rows += len(rows)
+                    if table_dir:
+                        headers = FileParser._column_names(list(header_row))
+                        table_path = table_path_in(table_dir, len(tables), table_format)
+                        writer = open_table_writer(table_path, table_format)
+                        tables.append({'name': sheet_name, 'path': table_path, 'format': writer.format})
+                        width = len(headers)
+                        while True:
+                            chunk = [
+                                tuple(row[:width]) + (None,) * (width - len(row))
+                                for row in islice(rows, EXCEL_STREAM_CHUNK_ROWS)
+                            ]
+                            if not chunk:
+                                break
+                            writer.write_batch(pd.DataFrame(chunk, columns=headers))
+                        if writer.rows_written == 0:
+                            writer.write_batch(pd.DataFrame([], columns=headers))
+                        writer.close()
+                        tables[-1].update(schema=writer.describe(), row_count=writer.rows_written)
+                        
+                        sheets_data[sheet_name] = {
+                            'headers': headers,
+                            'total_rows': writer.rows_written
+                        }
+                        total_rows += writer.rows_written
+                    else:
+                        headers = list(header_row)
+                        sheet_rows = [dict(zip(headers, row)) for row in rows]
+                        
+                        sheets_data[sheet_name] = {
+                            'headers': headers,
+                            'rows': sheet_rows,
+                            'total_rows': len(sheet_rows)
+                        }
+                        total_rows += len(sheet_rows)
+                
+                if progress_callback:
+                    progress_callback(rows_read, max(rows_expected, rows_read))
             
-            return {
+            result = {
                 'success': True,
                 'data': {
                     'sheets': sheets_data,
@@ -76,7 +364,12 @@ class FileParser:
                 },
                 'content_type': 'excel'
             }
+            if table_dir:
+                result['tables'] = tables
+            return result
         except Exception as e:
+            for table in tables:
+                delete_table(table['path'])
             logger.error(f"Error parsing Excel: {str(e)}")
             return {
                 'success': False,
@@ -85,40 +378,27 @@ class FileParser:
             }
     
     @staticmethod
-    def parse_pdf(file_content: bytes) -> Dict[str, Any]:
-        """Parse PDF file content."""
+    def parse_pdf(source: FileSource, progress_callback: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+        """Parse PDF file content, reporting pages extracted.
+        
+        Pages are extracted in parallel page ranges (see `pdf_extraction`).
+        `data['pages']` lists the pages with text; the top-level `pages` key
+        holds every page, including empty ones, with the engine that read it.
+        """
         try:
-            text_content = []
-            
-            # Try with pdfplumber first (better for text extraction)
-            with pdfplumber.open(io.BytesIO(file_content)) as pdf:
-                for page_num, page in enumerate(pdf.pages, 1):
-                    text = page.extract_text()
-                    if text:
-                        text_content.append({
-                            'page': page_num,
-                            'content': text.strip()
-                        })
-            
-            # Fallback to PyPDF2 if pdfplumber fails
-            if not text_content:
-                pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_content))
-                for page_num, page in enumerate(pdf_reader.pages, 1):
-                    text = page.extract_text()
-                    if text:
-                        text_content.append({
-                            'page': page_num,
-                            'content': text.strip()
-                        })
+            pages = extract_pages(source, progress_callback)
+            text_content = [{'page': page['page'], 'content': page['content']} for page in pages if page['content']]
             
             return {
                 'success': True,
                 'data': {
                     'pages': text_content,
                     'total_pages': len(text_content),
+                    'page_count': len(pages),
                     'full_text': '\n\n'.join([page['content'] for page in text_content])
                 },
-                'content_type': 'pdf'
+                'content_type': 'pdf',
+                'pages': pages
             }
         except Exception as e:
             logger.error(f"Error parsing PDF: {str(e)}")
@@ -129,16 +409,50 @@ class FileParser:
             }
     
     @classmethod
-    def parse_file(cls, file_content: bytes, file_type: str, filename: str) -> Dict[str, Any]:
-        """Parse file based on its type."""
+    def parse_file(cls, source: FileSource, file_type: str, filename: str, backend=None,
+                   progress_callback: Optional[ProgressCallback] = None,
+                   table_dir: Optional[str] = None, table_format: str = 'parquet') -> Dict[str, Any]:
+        """Parse file based on its type using the given (or configured) execution backend.
+        
+        `source` is the raw bytes or, preferably, a path to the file so large
+        files are never fully read into memory. When `table_dir` is given,
+        CSV and Excel rows are written there as `table_format` tables instead
+        of being returned in the result.
+        """
+        if backend is None:
+            backend = get_parse_backend()
+        return backend.parse(source, file_type, filename, progress_callback,
+                             table_dir=table_dir, table_format=table_format)
+    
+    @staticmethod
+    def detect_kind(file_type: str, filename: str) -> Optional[str]:
+        """Return 'csv', 'excel' or 'pdf' for a supported file, otherwise None."""
         filename_lower = filename.lower()
         
         if filename_lower.endswith('.csv') or 'csv' in file_type:
-            return cls.parse_csv(file_content)
+            return 'csv'
         elif filename_lower.endswith(('.xlsx', '.xls')) or 'excel' in file_type or 'spreadsheet' in file_type:
-            return cls.parse_excel(file_content)
+            return 'excel'
         elif filename_lower.endswith('.pdf') or 'pdf' in file_type:
-            return cls.parse_pdf(file_content)
+            return 'pdf'
+        return None
+    
+    @classmethod
+    def dispatch(cls, source: FileSource, file_type: str, filename: str,
+                 progress_callback: Optional[ProgressCallback] = None,
+                 table_dir: Optional[str] = None, table_format: str = 'parquet') -> Dict[str, Any]:
+        """Parse file based on its type in the current thread."""
+        kind = cls.detect_kind(file_type, filename)
+        
+        if kind == 'csv':
+            if table_dir:
+                return cls.parse_csv_stream(source, table_path_in(table_dir, 0, table_format), table_format,
+                                            progress_callback=progress_callback)
+            return cls.parse_csv(source, progress_callback)
+        elif kind == 'excel':
+            return cls.parse_excel(source, progress_callback, table_dir, table_format)
+        elif kind == 'pdf':
+            return cls.parse_pdf(source, progress_callback)
         else:
             return {
                 'success': False,
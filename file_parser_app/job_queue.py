@@ -0,0 +1,414 @@
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.db.models import Count, F, Q, Value
+from django.db.models.functions import Least
+from django.utils import timezone
+
+from . import metrics
+from .file_parser import FileParser
+from .models import ParseJob, UploadBatch, UploadedFile
+from .progress_tracker import progress_tracker
+from .scheduling import DEFAULT_PRIORITY, PRIORITIES, Candidate, expected_seconds, get_scheduler
+from .tracing import SpanRecorder, profiled
+from .worker_process import process_worker_main
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+# UploadedFile fields a job's client and expected duration are taken from
+_COST_FIELDS = ('file_size', 'file_type', 'original_filename', 'client')
+
+
+def _expected_seconds(uploaded_file: Dict[str, Any]) -> float:
+    kind = FileParser.detect_kind(uploaded_file['file_type'], uploaded_file['original_filename'])
+    return expected_seconds(uploaded_file['file_size'], kind)
+
+
+class JobQueue:
+    """DB-backed parse job queue with claim/lease semantics."""
+
+    @staticmethod
+    def enqueue(file_id: str, profile: bool = False, delay: Optional[float] = None,
+                priority: int = PRIORITIES[DEFAULT_PRIORITY]) -> ParseJob:
+        """Add a parse job for a file to the queue, claimable after `delay` seconds if given."""
+        job = ParseJob(file_id=file_id, profile=profile, priority=priority)
+        uploaded_file = UploadedFile.objects.filter(id=file_id).values(*_COST_FIELDS).first()
+        if uploaded_file is not None:
+            job.client = uploaded_file['client']
+            job.expected_seconds = _expected_seconds(uploaded_file)
+        if delay:
+            job.available_at = timezone.now() + timedelta(seconds=delay)
+        job.save()
+        return job
+
+    @staticmethod
+    def promote(file_id: str, priority: Optional[int] = None) -> int:
+        """Make a file's queued parse jobs claimable now, optionally raising their priority.
+
+        Returns how many there were. Jobs keep the time they were already
+        waiting, so they do not lose what they gained by aging.
+        """
+        now = timezone.now()
+        changes = {'available_at': Least(F('available_at'), Value(now))}
+        if priority is not None:
+            changes['priority'] = Least(F('priority'), Value(priority))
+        return ParseJob.objects.filter(file_id=file_id, status='queued').update(**changes)
+
+    @staticmethod
+    def enqueue_batch(batch_id: str, priority: int = PRIORITIES['bulk']) -> ParseJob:
+        """Add one parse job covering every file of an upload batch."""
+        files = list(UploadedFile.objects.filter(batch_id=batch_id).order_by('created_at', 'id').values(*_COST_FIELDS))
+        return ParseJob.objects.create(
+            batch_id=batch_id,
+            priority=priority,
+            expected_seconds=sum(_expected_seconds(uploaded_file) for uploaded_file in files),
+            client=files[0]['client'] if files else '',
+        )
+
+    @staticmethod
+    def depth() -> int:
+        """Number of jobs waiting to be claimed or currently leased.
+
+        Jobs deferred to a later time (background parses of previewed files)
+        are not waiting yet, so they never hold back new uploads.
+        """
+        return ParseJob.objects.filter(
+            Q(status='queued', available_at__lte=timezone.now()) | Q(status='leased')
+        ).count()
+
+    @staticmethod
+    def running_by_client(now=None) -> Dict[str, int]:
+        """Number of jobs each client has running (leased and not expired)."""
+        now = now or timezone.now()
+        return dict(
+            ParseJob.objects.filter(status='leased', lease_expires_at__gte=now).order_by()
+            .values('client').annotate(count=Count('id')).values_list('client', 'count')
+        )
+
+    @staticmethod
+    def _waiting(now, window: int) -> List[Dict[str, Any]]:
+        """The claimable jobs one claim ranks, longest-waiting first.
+
+        That is the `window` longest-waiting jobs overall and of each
+        priority class (see `scheduling.claim_window`): with the oldest
+        jobs alone, a backlog longer than the window would hide every job
+        of a higher class queued behind it.
+        """
+        claimable = ParseJob.objects.filter(
+            Q(status='queued', available_at__lte=now) |
+            Q(status='leased', lease_expires_at__lt=now)
+        ).values('id', 'status', 'attempts', 'available_at', 'priority', 'expected_seconds', 'client')
+        waiting = {}
+        for jobs in [claimable] + [claimable.filter(priority=value) for value in sorted(set(PRIORITIES.values()))]:
+            for job in jobs.order_by('available_at', 'created_at')[:window]:
+                waiting.setdefault(job['id'], job)
+        return sorted(waiting.values(), key=lambda job: job['available_at'])
+
+    @staticmethod
+    def claim(worker_id: str, lease_seconds: Optional[int] = None) -> Optional[ParseJob]:
+        """Claim the job the scheduler ranks first, or return None if none may start.
+
+        Queued jobs and leased jobs whose lease has expired are both
+        claimable. Those in the claim window (see `_waiting`) are ranked by
+        the configured scheduler (see `scheduling`), which may also hold
+        back jobs of clients at their concurrency limit. The claim
+        is a conditional UPDATE, so two workers racing for the same row can
+        never both win it.
+        """
+        lease_seconds = lease_seconds or _setting('FILE_PARSER_JOB_LEASE_SECONDS', 300)
+        max_attempts = _setting('FILE_PARSER_JOB_MAX_ATTEMPTS', 3)
+        window = _setting('FILE_PARSER_SCHEDULER_WINDOW', 200)
+        scheduler = get_scheduler()
+
+        while True:
+            now = timezone.now()
+            waiting = JobQueue._waiting(now, window)
+            if not waiting:
+                return None
+
+            exhausted = [job for job in waiting if job['attempts'] >= max_attempts]
+            for job in exhausted:
+                # Lease ran out on the final attempt: the job keeps killing
+                # its worker, so stop retrying it.
+                ParseJob.objects.filter(
+                    id=job['id'],
+                    status=job['status'],
+                    attempts=job['attempts'],
+                ).update(
+                    status='failed',
+                    leased_by=None,
+                    lease_expires_at=None,
+                    last_error='Exceeded maximum attempts',
+                )
+                JobQueue._mark_file_failed(job['id'], 'Processing error: exceeded maximum attempts')
+            if exhausted:
+                continue
+
+            picked = scheduler.pick(
+                (
+                    Candidate(job['id'], job['priority'], job['expected_seconds'], job['client'],
+                              job['available_at'].timestamp())
+                    for job in waiting
+                ),
+                JobQueue.running_by_client(now),
+                now.timestamp(),
+            )
+            if picked is None:
+                # Every client with waiting jobs is at its limit
+                return None
+
+            candidate = next(job for job in waiting if job['id'] == picked.id)
+            claimed = ParseJob.objects.filter(
+                id=candidate['id'],
+                status=candidate['status'],
+                attempts=candidate['attempts'],
+            ).update(
+                status='leased',
+                leased_by=worker_id,
+                lease_expires_at=now + timedelta(seconds=lease_seconds),
+                attempts=F('attempts') + 1,
+            )
+            if claimed:
+                return ParseJob.objects.get(id=candidate['id'])
+
+    @staticmethod
+    def heartbeat(job: ParseJob, worker_id: str, lease_seconds: Optional[int] = None) -> bool:
+        """Extend the lease on a job still owned by this worker."""
+        lease_seconds = lease_seconds or _setting('FILE_PARSER_JOB_LEASE_SECONDS', 300)
+        return bool(ParseJob.objects.filter(id=job.id, status='leased', leased_by=worker_id).update(
+            lease_expires_at=timezone.now() + timedelta(seconds=lease_seconds)
+        ))
+
+    @staticmethod
+    def complete(job: ParseJob, worker_id: str):
+        """Mark a leased job as finished."""
+        ParseJob.objects.filter(id=job.id, leased_by=worker_id).update(
+            status='done',
+            lease_expires_at=None,
+        )
+
+    @staticmethod
+    def fail(job: ParseJob, worker_id: str, error: str):
+        """Record a failed attempt, re-queueing the job if it has attempts left.
+
+        The job's files are marked failed once it has none left.
+        """
+        max_attempts = _setting('FILE_PARSER_JOB_MAX_ATTEMPTS', 3)
+        if job.attempts < max_attempts:
+            ParseJob.objects.filter(id=job.id, leased_by=worker_id).update(
+                status='queued',
+                leased_by=None,
+                lease_expires_at=None,
+                available_at=timezone.now() + timedelta(seconds=2 ** job.attempts),
+                last_error=error,
+            )
+        else:
+            failed = ParseJob.objects.filter(id=job.id, leased_by=worker_id).update(
+                status='failed',
+                lease_expires_at=None,
+                last_error=error,
+            )
+            if failed:
+                JobQueue._mark_file_failed(job.id, f"Processing error: {error}")
+
+    @staticmethod
+    def release_all_leases() -> int:
+        """Return every leased job to the queue immediately.
+
+        Only safe when no other worker is running, e.g. on a single-host
+        deployment right after a restart.
+        """
+        return ParseJob.objects.filter(status='leased').update(
+            status='queued',
+            leased_by=None,
+            lease_expires_at=None,
+            available_at=timezone.now(),
+        )
+
+    @staticmethod
+    def _mark_file_failed(job_id: int, error: str):
+        job = ParseJob.objects.filter(id=job_id).values('file_id', 'batch_id').first()
+        if job is None:
+            return
+        if job['batch_id'] is not None:
+            files = UploadedFile.objects.filter(batch_id=job['batch_id']).exclude(status__in=['ready', 'failed'])
+            UploadBatch.objects.filter(id=job['batch_id']).update(status='done', updated_at=timezone.now())
+        else:
+            files = UploadedFile.objects.filter(id=job['file_id'])
+        file_ids = list(files.values_list('id', flat=True))
+        UploadedFile.objects.filter(id__in=file_ids).update(status='failed', error_message=error, updated_at=timezone.now())
+        for file_id in file_ids:
+            progress_tracker.set_status(file_id, 'failed')
+
+
+def _run_job(job: ParseJob, worker_id: str):
+    """Process one claimed job, keeping its lease alive while it runs."""
+    from .async_processor import AsyncFileProcessor
+
+    started = time.perf_counter()
+    spans = SpanRecorder()
+    if job.file_id:
+        # From when the job could first run (or was retried) until it was claimed
+        queued_at = job.available_at
+        spans.add('queue_wait', queued_at, (timezone.now() - queued_at).total_seconds())
+
+    lease_seconds = _setting('FILE_PARSER_JOB_LEASE_SECONDS', 300)
+    done = threading.Event()
+
+    def keep_alive():
+        while not done.wait(max(1, lease_seconds // 3)):
+            try:
+                JobQueue.heartbeat(job, worker_id, lease_seconds)
+            except Exception as e:
+                logger.warning(f"Heartbeat failed for job {job.id}: {str(e)}")
+            finally:
+                connections.close_all()
+
+    heartbeat_thread = threading.Thread(target=keep_alive, daemon=True)
+    heartbeat_thread.start()
+    try:
+        if job.batch_id:
+            AsyncFileProcessor.process_batch(str(job.batch_id))
+        else:
+            with profiled(job.file_id, forced=job.profile):
+                AsyncFileProcessor._process_file_worker(
+                    str(job.file_id), spans, use_cache=not job.profile, raise_errors=True
+                )
+        JobQueue.complete(job, worker_id)
+    except Exception as e:
+        logger.error(f"Job {job.id} failed on worker {worker_id}: {str(e)}")
+        JobQueue.fail(job, worker_id, str(e))
+    finally:
+        done.set()
+        heartbeat_thread.join()
+        metrics.increment(metrics.WORKER_BUSY_MICROSECONDS, int((time.perf_counter() - started) * 1_000_000))
+
+
+def worker_loop(worker_id: str, stop_event, wake_event=None, drain: bool = False):
+    """Claim and run jobs until stopped (or until the queue is empty if draining)."""
+    poll_interval = _setting('FILE_PARSER_WORKER_POLL_SECONDS', 1.0)
+    logger.info(f"Parser worker {worker_id} started")
+
+    while not stop_event.is_set():
+        close_old_connections()
+        try:
+            job = JobQueue.claim(worker_id)
+        except Exception as e:
+            logger.error(f"Worker {worker_id} could not claim a job: {str(e)}")
+            job = None
+
+        if job is None:
+            if drain:
+                break
+            if wake_event is not None:
+                wake_event.wait(poll_interval)
+                wake_event.clear()
+            else:
+                stop_event.wait(poll_interval)
+            continue
+
+        _run_job(job, worker_id)
+
+    connections.close_all()
+    logger.info(f"Parser worker {worker_id} stopped")
+
+
+class WorkerPool:
+    """Fixed-size pool of thread or process workers pulling from the job queue."""
+
+    MODES = ('thread', 'process')
+
+    def __init__(self, size: Optional[int] = None, mode: Optional[str] = None, name: Optional[str] = None):
+        self.size = max(1, size or _setting('FILE_PARSER_WORKERS', 2))
+        self.mode = mode or _setting('FILE_PARSER_WORKER_MODE', 'thread')
+        if self.mode not in self.MODES:
+            raise ValueError(f"Unknown worker mode: {self.mode}. Expected one of {', '.join(self.MODES)}")
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._workers = []
+
+        if self.mode == 'process':
+            ctx = multiprocessing.get_context('spawn')
+            self._stop_event = ctx.Event()
+            self._wake_event = None
+        else:
+            self._stop_event = threading.Event()
+            self._wake_event = threading.Event()
+
+    def start(self, drain: bool = False):
+        """Start all workers."""
+        if self.mode == 'process':
+            # Connections must not be shared with child interpreters.
+            connections.close_all()
+            ctx = multiprocessing.get_context('spawn')
+            for i in range(self.size):
+                worker = ctx.Process(
+                    target=process_worker_main,
+                    args=(f"{self.name}:{i}", self._stop_event, drain),
+                    daemon=not drain,
+                )
+                worker.start()
+                self._workers.append(worker)
+        else:
+            for i in range(self.size):
+                worker = threading.Thread(
+                    target=worker_loop,
+                    args=(f"{self.name}:{i}", self._stop_event, self._wake_event, drain),
+                    name=f"parser-worker-{i}",
+                    daemon=True,
+                )
+                worker.start()
+                self._workers.append(worker)
+
+    def wake(self):
+        """Nudge idle thread workers to poll the queue right away."""
+        if self._wake_event is not None:
+            self._wake_event.set()
+
+    def request_stop(self):
+        """Signal all workers to stop after their current job."""
+        self._stop_event.set()
+        self.wake()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop all workers and wait for them to exit."""
+        self.request_stop()
+        self.join(timeout)
+
+    def join(self, timeout: Optional[float] = None):
+        for worker in self._workers:
+            worker.join(timeout)
+
+    def is_alive(self) -> bool:
+        return any(worker.is_alive() for worker in self._workers)
+
+
+_embedded_pool: Optional[WorkerPool] = None
+_embedded_lock = threading.Lock()
+
+
+def get_embedded_pool() -> Optional[WorkerPool]:
+    """Lazily start the in-process worker pool used when no dedicated workers run."""
+    global _embedded_pool
+
+    if not _setting('FILE_PARSER_EMBEDDED_WORKERS', True):
+        return None
+
+    with _embedded_lock:
+        if _embedded_pool is None or not _embedded_pool.is_alive():
+            _embedded_pool = WorkerPool(mode='thread')
+            _embedded_pool.start()
+        return _embedded_pool
@@ -0,0 +1,87 @@
+import json
+from typing import Dict, List, Optional
+
+from django.core.management.base import BaseCommand, CommandError
+
+# (metric, unit scale, unit, smallest change worth flagging): below these,
+# differences are timer and allocator noise on small inputs
+METRICS = (
+    ('seconds', 1, 's', 0.005),
+    ('peak_rss_kb', 1 / 1024, 'MB', 2 * 1024),
+    ('output_bytes', 1 / (1024 * 1024), 'MB', 1024),
+)
+
+
+def _change(old: float, new: float) -> Optional[float]:
+    if not old:
+        return None
+    return (new - old) * 100 / old
+
+
+def compare_results(baseline: dict, current: dict, threshold: float) -> List[Dict]:
+    """Pair the cases of two result files and flag metrics that grew beyond `threshold` percent."""
+    previous = {(entry['case'], entry['method']): entry for entry in baseline['results']}
+    rows = []
+    for entry in current['results']:
+        old = previous.pop((entry['case'], entry['method']), None)
+        row = {'case': entry['case'], 'method': entry['method'], 'status': 'new', 'metrics': {}}
+        if old is not None:
+            row['status'] = 'ok'
+            for metric, _, _, floor in METRICS:
+                change = _change(old[metric], entry[metric])
+                regressed = change is not None and change > threshold and entry[metric] - old[metric] > floor
+                row['metrics'][metric] = {'old': old[metric], 'new': entry[metric], 'change': change,
+                                          'regressed': regressed}
+                if regressed:
+                    row['status'] = 'REGRESSION'
+        rows.append(row)
+    for case, method in previous:
+        rows.append({'case': case, 'method': method, 'status': 'missing', 'metrics': {}})
+    return rows
+
+
+def write_comparison(out, rows: List[Dict]) -> int:
+    """Print a comparison table and return the number of regressed cases."""
+    out.write(f"{'case':>28} {'method':>17} " + ' '.join(f"{metric:>24}" for metric, _, _, _ in METRICS) + '  status')
+    for row in rows:
+        cells = []
+        for metric, scale, unit, _ in METRICS:
+            values = row['metrics'].get(metric)
+            if values is None:
+                cells.append(f"{'-':>24}")
+                continue
+            change = '   n/a' if values['change'] is None else f"{values['change']:+6.1f}%"
+            cells.append(f"{values['old'] * scale:>7.3g}->{values['new'] * scale:<7.3g}{unit:<2} {change}")
+        out.write(f"{row['case']:>28} {row['method']:>17} " + ' '.join(cells) + f"  {row['status']}")
+    return sum(1 for row in rows if row['status'] == 'REGRESSION')
+
+
+class Command(BaseCommand):
+    help = 'Compare two benchmark_suite result files and fail if any case regressed beyond the threshold.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('baseline', help='Results file to compare against.')
+        parser.add_argument('current', help='Results file of the run being checked.')
+        parser.add_argument('--threshold', type=float, default=10.0,
+                            help='Percent slowdown (and RSS or size growth) counted as a regression.')
+
+    def handle(self, *args, **options):
+        reports = []
+        for path in (options['baseline'], options['current']):
+            try:
+                with open(path) as f:
+                    reports.append(json.load(f))
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Cannot read {path}: {str(e)}')
+        baseline, current = reports
+
+        if baseline.get('environment') != current.get('environment'):
+            self.stdout.write('Warning: the runs were made in different environments; timings may not compare.')
+        if baseline.get('suite') != current.get('suite'):
+            self.stdout.write(f"Warning: comparing suite {baseline.get('suite')} with {current.get('suite')}.")
+
+        rows = compare_results(baseline, current, options['threshold'])
+        regressions = write_comparison(self.stdout, rows)
+        if regressions:
+            raise CommandError(f'{regressions} regression(s) beyond {options["threshold"]:g}%')
+        self.stdout.write(f'No regressions beyond {options["threshold"]:g}%')
@@ -0,0 +1,77 @@
+import multiprocessing
+import os
+import resource
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from .benchmark_parse_backends import build_csv
+
+
+def peak_rss_kb() -> int:
+    """Peak resident set size of the current process in KB.
+
+    Prefers VmHWM from /proc, which starts fresh in each exec'd process;
+    ru_maxrss is inherited across exec on Linux and would report the
+    parent's peak instead.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _measure(mode: str, csv_path: str, table_path: str) -> dict:
+    """Parse one file in a fresh process and report that process's peak RSS."""
+    from file_parser_app.file_parser import FileParser
+
+    baseline_kb = peak_rss_kb()
+    if mode == 'full':
+        with open(csv_path, 'rb') as f:
+            result = FileParser.parse_csv(f.read())
+    else:
+        result = FileParser.parse_csv_stream(csv_path, table_path)
+    peak_kb = peak_rss_kb()
+    if not result['success']:
+        raise CommandError(f"{mode} parse failed: {result.get('error')}")
+    return {'rows': result['data']['total_rows'], 'baseline_kb': baseline_kb, 'peak_kb': peak_kb}
+
+
+class Command(BaseCommand):
+    help = 'Record peak RSS of full and streaming CSV parsing against file size.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='1,5,10,25,50',
+            help='Comma-separated file sizes in MB.',
+        )
+        parser.add_argument('--columns', type=int, default=10, help='Columns per synthetic CSV.')
+
+    def handle(self, *args, **options):
+        sizes_mb = [float(size) for size in options['sizes'].split(',')]
+        ctx = multiprocessing.get_context('spawn')
+
+        self.stdout.write(f"{'size':>8} {'rows':>10} {'mode':>7} {'peak RSS':>10} {'over baseline':>14}")
+        with tempfile.TemporaryDirectory(prefix='csv-memory-') as tmp:
+            for size_mb in sizes_mb:
+                # build_csv averages a little over 8 bytes per cell
+                rows = max(1, int(size_mb * 1024 * 1024 / (8.2 * options['columns'])))
+                csv_path = os.path.join(tmp, 'bench.csv')
+                with open(csv_path, 'wb') as f:
+                    f.write(build_csv(rows, options['columns']))
+                actual_mb = os.path.getsize(csv_path) / (1024 * 1024)
+
+                for mode in ('full', 'stream'):
+                    table_path = os.path.join(tmp, 'bench.parquet')
+                    # One process per measurement so peaks do not carry over
+                    with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                        stats = pool.submit(_measure, mode, csv_path, table_path).result()
+                    self.stdout.write(
+                        f"{actual_mb:>6.1f}MB {stats['rows']:>10,} {mode:>7} "
+                        f"{stats['peak_kb'] / 1024:>8.0f}MB {(stats['peak_kb'] - stats['baseline_kb']) / 1024:>12.0f}MB"
+                    )
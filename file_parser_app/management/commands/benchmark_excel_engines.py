@@ -0,0 +1,99 @@
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from .benchmark_csv_memory import peak_rss_kb
+
+
+def build_xlsx(path: str, rows: int, columns: int, seed: int = 0, sheets: int = 1):
+    """Write a synthetic workbook of mixed numeric and text columns, `rows` per sheet."""
+    from openpyxl import Workbook
+
+    rng = random.Random(seed)
+    workbook = Workbook(write_only=True)
+    for index in range(sheets):
+        sheet = workbook.create_sheet('data' if index == 0 else f'data_{index + 1}')
+        sheet.append([f'col_{i}' for i in range(columns)])
+        for _ in range(rows):
+            sheet.append([
+                rng.randint(0, 100000) if i % 3 == 0 else
+                round(rng.random() * 1000, 3) if i % 3 == 1 else
+                f'item-{rng.randint(0, 5000)}'
+                for i in range(columns)
+            ])
+    workbook.save(path)
+
+
+def _measure(engine: str, path: str, table_dir: str) -> dict:
+    """Parse one workbook in a fresh process and report its time and peak RSS."""
+    from file_parser_app.file_parser import FileParser
+
+    baseline_kb = peak_rss_kb()
+    started = time.perf_counter()
+    if engine == 'openpyxl-full':
+        # The pre-streaming path: full cell model, then every row copied to lists
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(path)
+        rows = sum(len([list(row) for row in workbook[name].iter_rows(values_only=True)]) - 1
+                   for name in workbook.sheetnames)
+    else:
+        result = FileParser.parse_excel(path, table_dir=table_dir, engine=engine)
+        if not result['success']:
+            raise CommandError(f"{engine} failed to parse the workbook: {result.get('error')}")
+        rows = result['data']['total_rows']
+    elapsed = time.perf_counter() - started
+    return {'rows': rows, 'seconds': elapsed, 'baseline_kb': baseline_kb, 'peak_kb': peak_rss_kb()}
+
+
+class Command(BaseCommand):
+    help = 'Compare parse time and peak RSS of the available Excel engines.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=50000, help='Rows in the synthetic workbook.')
+        parser.add_argument('--columns', type=int, default=10, help='Columns in the synthetic workbook.')
+        parser.add_argument('--file', help='Benchmark this workbook (.xlsx or .xls) instead of a synthetic one.')
+        parser.add_argument(
+            '--engines',
+            help='Comma-separated engines to run (default: every installed engine for the format, '
+                 'plus openpyxl-full for .xlsx).',
+        )
+
+    def handle(self, *args, **options):
+        from file_parser_app.excel_engines import ENGINES, workbook_format
+
+        ctx = multiprocessing.get_context('spawn')
+        with tempfile.TemporaryDirectory(prefix='excel-engines-') as tmp:
+            path = options['file']
+            if path is None:
+                path = os.path.join(tmp, 'bench.xlsx')
+                build_xlsx(path, options['rows'], options['columns'])
+            file_format = workbook_format(path)
+
+            if options['engines']:
+                engines = [name.strip() for name in options['engines'].split(',') if name.strip()]
+            else:
+                engines = [name for name, cls in ENGINES.items() if file_format in cls.formats and cls.is_available()]
+                if file_format == 'xlsx':
+                    engines.insert(0, 'openpyxl-full')
+            if not engines:
+                raise CommandError(f'No Excel engine installed for .{file_format} files')
+
+            size_mb = os.path.getsize(path) / (1024 * 1024)
+            self.stdout.write(f"{os.path.basename(path)}: {size_mb:.1f}MB ({file_format})")
+            self.stdout.write(f"{'engine':>14} {'rows':>10} {'seconds':>8} {'rows/s':>10} {'peak RSS':>10} {'over baseline':>14}")
+            for engine in engines:
+                table_dir = tempfile.mkdtemp(dir=tmp)
+                # One process per measurement so peaks do not carry over
+                with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                    stats = pool.submit(_measure, engine, path, table_dir).result()
+                self.stdout.write(
+                    f"{engine:>14} {stats['rows']:>10,} {stats['seconds']:>8.2f} "
+                    f"{stats['rows'] / stats['seconds']:>10,.0f} {stats['peak_kb'] / 1024:>8.0f}MB "
+                    f"{(stats['peak_kb'] - stats['baseline_kb']) / 1024:>12.0f}MB"
+                )
@@ -0,0 +1,86 @@
+import io
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from file_parser_app.execution import InlineBackend, ProcessPoolBackend
+from file_parser_app.file_parser import FileParser
+from file_parser_app.management.commands.benchmark_pdf_pages import build_pdf
+
+
+def build_csv(rows: int, columns: int, seed: int = 0) -> bytes:
+    """Build a deterministic CSV with alternating numeric and text columns."""
+    rng = random.Random(seed)
+    out = io.StringIO()
+    out.write(','.join(f'col_{c}' for c in range(columns)) + '\n')
+    for _ in range(rows):
+        out.write(','.join(
+            str(rng.randint(0, 1_000_000)) if c % 2 == 0 else f'text_{rng.randint(0, 9999)}'
+            for c in range(columns)
+        ) + '\n')
+    return out.getvalue().encode()
+
+
+class Command(BaseCommand):
+    help = 'Compare inline (thread) and process-pool parse backends on N concurrent uploads.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--uploads', type=int, default=8, help='Number of concurrent uploads.')
+        parser.add_argument('--rows', type=int, default=50_000, help='Rows per synthetic CSV.')
+        parser.add_argument('--columns', type=int, default=10, help='Columns per synthetic CSV.')
+        parser.add_argument('--processes', type=int, default=None, help='Process pool size (defaults to CPU count).')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per backend; the best is reported.')
+        parser.add_argument('--pdf-pages', type=int, default=12,
+                            help='Also parse a PDF of this many pages on each backend (0 skips it).')
+
+    def _run(self, backend, payloads):
+        def parse(content):
+            result = FileParser.parse_file(content, 'text/csv', 'bench.csv', backend=backend)
+            if not result['success']:
+                raise CommandError(f"Failed to parse the CSV: {result.get('error')}")
+            return result['data']['total_rows']
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(payloads)) as pool:
+            rows = sum(pool.map(parse, payloads))
+        return time.perf_counter() - start, rows
+
+    def handle(self, *args, **options):
+        payloads = [
+            build_csv(options['rows'], options['columns'], seed=i)
+            for i in range(options['uploads'])
+        ]
+        total_mb = sum(len(p) for p in payloads) / (1024 * 1024)
+        self.stdout.write(
+            f"{options['uploads']} concurrent uploads, {options['rows']} rows x "
+            f"{options['columns']} columns each ({total_mb:.1f}MB total)"
+        )
+
+        process_backend = ProcessPoolBackend(max_workers=options['processes'])
+        # Warm up the pool so process start-up is not counted against parsing.
+        self._run(process_backend, payloads[:1] * process_backend.max_workers)
+
+        try:
+            for label, backend in (('thread', InlineBackend()), ('process', process_backend)):
+                best, rows = min(self._run(backend, payloads) for _ in range(options['repeat']))
+                self.stdout.write(
+                    f"{label:>8}: {best:.3f}s  {rows / best:,.0f} rows/s  {total_mb / best:.1f}MB/s"
+                )
+
+            if options['pdf_pages']:
+                # Parse-pool processes extract PDF pages themselves; a page
+                # pool started inside one would keep it from ever exiting
+                pdf = build_pdf(options['pdf_pages'])
+                for label, backend in (('thread', InlineBackend()), ('process', process_backend)):
+                    start = time.perf_counter()
+                    result = FileParser.parse_file(pdf, 'application/pdf', 'bench.pdf', backend=backend)
+                    if not result['success']:
+                        raise CommandError(f"{label} backend failed to parse the PDF: {result.get('error')}")
+                    self.stdout.write(
+                        f"{label:>8}: {time.perf_counter() - start:.3f}s  "
+                        f"{options['pdf_pages']}-page PDF ({len(result['data']['pages'])} pages)"
+                    )
+        finally:
+            process_backend.shutdown()
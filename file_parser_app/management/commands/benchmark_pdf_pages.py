@@ -0,0 +1,98 @@
+import os
+import random
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+
+def build_pdf(pages: int, lines_per_page: int = 40, empty_every: int = 0, seed: int = 0) -> bytes:
+    """Build a text PDF with Helvetica lines; every `empty_every`-th page is blank."""
+    rng = random.Random(seed)
+    words = ['invoice', 'total', 'amount', 'customer', 'order', 'report', 'quarter', 'region', 'net', 'tax']
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        None,  # page tree, filled in once the page object numbers are known
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>',
+    ]
+    page_ids = []
+    for page in range(1, pages + 1):
+        lines = []
+        if not (empty_every and page % empty_every == 0):
+            lines.append(b'BT /F1 10 Tf 50 800 Td 12 TL')
+            for _ in range(lines_per_page):
+                text = ' '.join(rng.choice(words) for _ in range(10)) + f' {rng.randint(0, 99999)}'
+                lines.append(f'({text}) Tj T*'.encode())
+            lines.append(b'ET')
+        stream = b'\n'.join(lines)
+        objects.append(b'<< /Length %d >>\nstream\n%s\nendstream' % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] '
+            b'/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>' % content_id
+        )
+        page_ids.append(len(objects))
+    kids = b' '.join(b'%d 0 R' % page_id for page_id in page_ids)
+    objects[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, pages)
+
+    out = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n%s\nendobj\n' % (number, body)
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    for offset in offsets:
+        out += b'%010d 00000 n \n' % offset
+    out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+class Command(BaseCommand):
+    help = 'Measure PDF text extraction throughput (pages/second) against worker process count.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=200, help='Pages in the synthetic PDF.')
+        parser.add_argument('--empty-every', type=int, default=10,
+                            help='Make every Nth page blank to exercise the per-page fallback (0: none).')
+        parser.add_argument('--workers', help='Comma-separated process counts (default: 1, 2, 4, ... up to CPU count).')
+        parser.add_argument('--file', help='Benchmark this PDF instead of a synthetic one.')
+
+    def handle(self, *args, **options):
+        from file_parser_app.pdf_extraction import PdfPagePool, extract_page_range, page_count
+
+        cpus = os.cpu_count() or 1
+        if options['workers']:
+            counts = [int(count) for count in options['workers'].split(',')]
+        else:
+            counts = sorted({1, cpus} | {2 ** i for i in range(1, cpus.bit_length()) if 2 ** i < cpus})
+
+        with tempfile.TemporaryDirectory(prefix='pdf-pages-') as tmp:
+            path = options['file']
+            if path is None:
+                path = os.path.join(tmp, 'bench.pdf')
+                with open(path, 'wb') as f:
+                    f.write(build_pdf(options['pages'], empty_every=options['empty_every']))
+            total = page_count(path)
+
+            self.stdout.write(f"{os.path.basename(path)}: {total} pages, {cpus} CPUs")
+            self.stdout.write(f"{'workers':>8} {'seconds':>8} {'pages/s':>9} {'speedup':>8} {'fallback':>9}")
+            baseline = None
+            for count in counts:
+                if count == 1:
+                    started = time.perf_counter()
+                    pages = extract_page_range(path, 0, total)
+                    elapsed = time.perf_counter() - started
+                else:
+                    pool = PdfPagePool(count)
+                    # Start the workers (and their imports) before timing
+                    pool.extract(path, min(total, count))
+                    started = time.perf_counter()
+                    pages = pool.extract(path, total)
+                    elapsed = time.perf_counter() - started
+                    pool.shutdown()
+                baseline = baseline or elapsed
+                fallback = sum(1 for page in pages if page['engine'] == 'pypdf2')
+                self.stdout.write(
+                    f"{count:>8} {elapsed:>8.2f} {total / elapsed:>9.1f} {baseline / elapsed:>7.2f}x {fallback:>9}"
+                )
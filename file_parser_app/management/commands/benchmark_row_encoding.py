@@ -0,0 +1,80 @@
+import io
+import json
+import random
+import time
+
+import pandas as pd
+from django.core.management.base import BaseCommand
+
+from file_parser_app.columnar import arrow_stream_bytes, encode_columns, encode_records
+from file_parser_app.table_store import _to_arrow
+
+
+def build_numeric_csv(rows: int, columns: int, null_every: int = 0, seed: int = 0) -> bytes:
+    """Build a deterministic CSV of integer and float columns, optionally with gaps."""
+    rng = random.Random(seed)
+    out = io.StringIO()
+    out.write(','.join(f'col_{c}' for c in range(columns)) + '\n')
+    for row in range(rows):
+        cells = []
+        for c in range(columns):
+            if null_every and (row + c) % null_every == 0:
+                cells.append('')
+            elif c % 2 == 0:
+                cells.append(str(rng.randint(0, 1_000_000)))
+            else:
+                cells.append(f'{rng.random() * 1000:.3f}')
+        out.write(','.join(cells) + '\n')
+    return out.getvalue().encode()
+
+
+def _best_of(repeat: int, encode):
+    best = None
+    payload = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        payload = encode()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(payload)
+
+
+class Command(BaseCommand):
+    help = 'Compare encode time and size of parsed CSV rows as records, columns and Arrow IPC.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20_000, help='Rows per synthetic CSV.')
+        parser.add_argument('--columns', type=int, default=100, help='Columns per synthetic CSV.')
+        parser.add_argument('--null-every', type=int, default=0,
+                            help='Leave every Nth cell empty (0 for no nulls).')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per encoding; the best is reported.')
+
+    def handle(self, *args, **options):
+        content = build_numeric_csv(options['rows'], options['columns'], options['null_every'])
+        df = pd.read_csv(io.BytesIO(content))
+        repeat = options['repeat']
+
+        def pandas_records():
+            # What parse_csv used to return; NaN has to be allowed through
+            return json.dumps(df.to_dict('records')).encode()
+
+        encodings = [
+            ('to_dict records', pandas_records),
+            ('records', lambda: json.dumps(encode_records(df)).encode()),
+            ('columns', lambda: json.dumps(encode_columns(df)).encode()),
+            ('arrow ipc', lambda: arrow_stream_bytes(_to_arrow(df.copy()))),
+        ]
+
+        self.stdout.write(
+            f"{options['rows']:,} rows x {options['columns']} columns, CSV {len(content) / (1024 * 1024):.1f}MB"
+        )
+        self.stdout.write(f"{'encoding':>16} {'time':>10} {'size':>10} {'vs to_dict':>11}")
+        baseline = None
+        for name, encode in encodings:
+            elapsed, size = _best_of(repeat, encode)
+            if baseline is None:
+                baseline = (elapsed, size)
+            self.stdout.write(
+                f"{name:>16} {elapsed * 1000:>8.0f}ms {size / (1024 * 1024):>8.1f}MB "
+                f"{baseline[0] / elapsed:>5.1f}x/{baseline[1] / size:.1f}x"
+            )
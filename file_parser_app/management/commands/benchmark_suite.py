@@ -0,0 +1,327 @@
+import json
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Tuple
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from .benchmark_compare import compare_results, write_comparison
+from .benchmark_csv_memory import peak_rss_kb
+from .benchmark_excel_engines import build_xlsx
+from .benchmark_pdf_pages import build_pdf
+
+RESULTS_VERSION = 1
+# The inline CSV parser holds every row in memory; skip it on larger inputs
+INLINE_CSV_MAX_ROWS = 1_000_000
+UPLOAD_TIMEOUT_SECONDS = 600
+
+CSV_SHAPES = {'narrow': 5, 'wide': 100}
+TEXT_WORDS = ['alpha', 'bravo', 'charlie', 'delta', 'echo', 'foxtrot', 'golf', 'hotel', 'india', 'juliet']
+
+
+class Case(NamedTuple):
+    name: str
+    kind: str
+    params: Dict
+    methods: Tuple[str, ...]
+
+
+def _count_label(count: int) -> str:
+    for size, suffix in ((1_000_000, 'm'), (1_000, 'k')):
+        if count >= size and count % size == 0:
+            return f'{count // size}{suffix}'
+    return str(count)
+
+
+def write_csv(path: str, rows: int, columns: int, values: str, seed: int = 0):
+    """Write a deterministic CSV of numeric or text columns, a block of rows at a time."""
+    rng = random.Random(seed)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write(','.join(f'col_{c}' for c in range(columns)) + '\n')
+        remaining = rows
+        while remaining:
+            block = min(remaining, 10_000)
+            lines = []
+            for _ in range(block):
+                if values == 'numeric':
+                    cells = [
+                        str(rng.randint(0, 1_000_000)) if c % 2 == 0 else f'{rng.random() * 1000:.3f}'
+                        for c in range(columns)
+                    ]
+                else:
+                    cells = [f'{rng.choice(TEXT_WORDS)} {rng.randint(0, 9999)}' for c in range(columns)]
+                lines.append(','.join(cells))
+            f.write('\n'.join(lines) + '\n')
+            remaining -= block
+
+
+SUITES = {
+    'quick': {'csv_rows': [1_000, 10_000], 'xlsx': [(3, 1_000)], 'pdf_pages': [10, 50]},
+    'standard': {'csv_rows': [1_000, 100_000, 1_000_000], 'xlsx': [(3, 10_000)], 'pdf_pages': [10, 100, 500]},
+    'full': {
+        'csv_rows': [1_000, 100_000, 1_000_000, 10_000_000],
+        'xlsx': [(3, 10_000), (5, 100_000)],
+        'pdf_pages': [10, 100, 1_000],
+    },
+}
+
+
+def suite_cases(suite: str) -> List[Case]:
+    """Inputs of a suite and the parser methods measured on each."""
+    spec = SUITES[suite]
+    cases = []
+    for rows in spec['csv_rows']:
+        for shape, columns in CSV_SHAPES.items():
+            # 10M rows of 100 columns is several GB; keep the wide shape to 1M
+            if shape == 'wide' and rows > 1_000_000:
+                continue
+            for values in ('numeric', 'text'):
+                methods = ['parse_csv_stream', 'upload']
+                if rows <= INLINE_CSV_MAX_ROWS:
+                    methods.insert(0, 'parse_csv')
+                cases.append(Case(
+                    f'csv-{shape}-{values}-{_count_label(rows)}', 'csv',
+                    {'rows': rows, 'columns': columns, 'values': values}, tuple(methods),
+                ))
+    for sheets, rows in spec['xlsx']:
+        cases.append(Case(
+            f'xlsx-{sheets}x{_count_label(rows)}', 'xlsx',
+            {'sheets': sheets, 'rows': rows, 'columns': 10}, ('parse_excel', 'upload'),
+        ))
+    for pages in spec['pdf_pages']:
+        cases.append(Case(f'pdf-{pages}p', 'pdf', {'pages': pages}, ('parse_pdf', 'upload')))
+    return cases
+
+
+def build_input(case: Case, directory: str) -> str:
+    """Generate the input file of a case and return its path."""
+    path = os.path.join(directory, f'{case.name}.{case.kind}')
+    if case.kind == 'csv':
+        write_csv(path, case.params['rows'], case.params['columns'], case.params['values'])
+    elif case.kind == 'xlsx':
+        build_xlsx(path, case.params['rows'], case.params['columns'], sheets=case.params['sheets'])
+    else:
+        with open(path, 'wb') as f:
+            f.write(build_pdf(case.params['pages']))
+    return path
+
+
+def _output_bytes(result: dict) -> int:
+    """Size of a parse result as stored: its JSON content plus any table files."""
+    from file_parser_app.renderers import dumps
+
+    return len(dumps(result['data'])) + sum(
+        os.path.getsize(table['path']) for table in result.get('tables', []) if os.path.exists(table['path'])
+    )
+
+
+def _result_rows(result: dict) -> int:
+    data = result['data']
+    return data.get('total_rows', data.get('total_pages', 0))
+
+
+def _use_sandbox(directory: str):
+    """Keep this process's database, stored files, search index and progress in `directory`.
+
+    Upload samples then leave no files, rows, index entries or metric
+    counters behind in the development database and media. The database is
+    a fresh migrated copy, parsed by this process's own embedded workers.
+    """
+    from django.db import connection
+    from django.test import override_settings
+
+    media = os.path.join(directory, 'media')
+    override_settings(
+        MEDIA_ROOT=media,
+        FILE_PARSER_STORAGE_ROOT=os.path.join(media, 'uploads'),
+        FILE_PARSER_LOCAL_S3_ROOT=os.path.join(media, 's3'),
+        FILE_PARSER_TABLE_ROOT=os.path.join(media, 'parsed'),
+        FILE_PARSER_PROFILE_ROOT=os.path.join(media, 'profiles'),
+        FILE_PARSER_SEARCH_INDEX_PATH=os.path.join(directory, 'search.sqlite3'),
+        FILE_PARSER_PROGRESS_SQLITE_PATH=os.path.join(directory, 'progress.sqlite3'),
+        FILE_PARSER_EMBEDDED_WORKERS=True,
+    ).enable()
+    connection.settings_dict['TEST']['NAME'] = os.path.join(directory, 'db.sqlite3')
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+
+
+def _upload_to_ready(path: str, workdir: str) -> dict:
+    """Upload a file through the API, in a sandbox under `workdir`, and wait until it is parsed."""
+    import django
+    django.setup()
+    from django.conf import settings
+    from django.test import Client
+
+    _use_sandbox(tempfile.mkdtemp(dir=workdir))
+    host = next((h for h in settings.ALLOWED_HOSTS if h and h != '*' and not h.startswith('.')), 'localhost')
+    client = Client(SERVER_NAME=host)
+
+    started = time.perf_counter()
+    with open(path, 'rb') as f:
+        response = client.post('/api/files/upload/', {'file': f})
+    if response.status_code != 201:
+        raise RuntimeError(f'Upload failed with {response.status_code}: {response.content[:200]!r}')
+    file_id = response.json()['file_id']
+    try:
+        deadline = started + UPLOAD_TIMEOUT_SECONDS
+        while True:
+            progress = client.get(f'/api/files/{file_id}/progress/').json()
+            if progress['status'] in ('ready', 'failed'):
+                break
+            if time.perf_counter() > deadline:
+                raise RuntimeError(f'File was not parsed within {UPLOAD_TIMEOUT_SECONDS}s')
+            time.sleep(0.01)
+        elapsed = time.perf_counter() - started
+        if progress['status'] != 'ready':
+            raise RuntimeError('Parsing failed')
+
+        content = client.get(f'/api/files/{file_id}/')
+        body = b''.join(content.streaming_content) if content.streaming else content.content
+        parsed = json.loads(body)['parsed_content']
+        return {'seconds': elapsed, 'rows': parsed['row_count'], 'output_bytes': len(body)}
+    finally:
+        # The sandbox goes with the work directory; this also removes the
+        # bytes from storage kept elsewhere (e.g. S3)
+        client.delete(f'/api/files/{file_id}/delete/')
+
+
+def _measure(method: str, path: str, workdir: str) -> dict:
+    """Run one method on one input in a fresh process; report time, peak RSS and output size."""
+    from file_parser_app.file_parser import FileParser
+
+    baseline_kb = peak_rss_kb()
+    if method == 'upload':
+        stats = _upload_to_ready(path, workdir)
+    else:
+        table_dir = tempfile.mkdtemp(dir=workdir)
+        started = time.perf_counter()
+        if method == 'parse_csv':
+            result = FileParser.parse_csv(path)
+        elif method == 'parse_csv_stream':
+            result = FileParser.parse_csv_stream(path, os.path.join(table_dir, '0.parquet'))
+        elif method == 'parse_excel':
+            result = FileParser.parse_excel(path, table_dir=table_dir)
+        elif method == 'parse_pdf':
+            result = FileParser.parse_pdf(path)
+        else:
+            raise ValueError(f'Unknown method: {method}')
+        elapsed = time.perf_counter() - started
+        if not result['success']:
+            raise RuntimeError(result.get('error'))
+        stats = {'seconds': elapsed, 'rows': _result_rows(result), 'output_bytes': _output_bytes(result)}
+    stats['peak_rss_kb'] = max(0, peak_rss_kb() - baseline_kb)
+    return stats
+
+
+def environment() -> dict:
+    """What the numbers depend on besides the code: compare baselines from like machines."""
+    import django
+    import pandas
+    import pyarrow
+    from django.conf import settings
+
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'django': django.get_version(),
+        'pandas': pandas.__version__,
+        'pyarrow': pyarrow.__version__,
+        'parse_backend': getattr(settings, 'FILE_PARSER_PARSE_BACKEND', 'inline'),
+        'table_format': getattr(settings, 'FILE_PARSER_TABLE_FORMAT', 'parquet'),
+        'storage_backend': getattr(settings, 'FILE_PARSER_STORAGE_BACKEND', 'local'),
+    }
+
+
+class Command(BaseCommand):
+    help = ('Measure wall time, peak RSS and output size of each parser method and of upload-to-ready '
+            'on generated CSV, XLSX and PDF inputs; optionally save or compare JSON baselines.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--suite', choices=sorted(SUITES), default='quick', help='Input sizes to run.')
+        parser.add_argument('--only', help='Run only cases whose name or method contains this text.')
+        parser.add_argument('--skip-upload', action='store_true', help='Skip the end-to-end upload cases.')
+        parser.add_argument('--repeat', type=int, default=3,
+                            help='Samples per case; the fastest time and the highest RSS are kept.')
+        parser.add_argument('--output', help='Write results to this JSON file (a baseline for later runs).')
+        parser.add_argument('--baseline', help='Compare against this results file and fail on regressions.')
+        parser.add_argument('--threshold', type=float, default=10.0,
+                            help='Percent slowdown (and RSS or size growth) counted as a regression.')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1')
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+
+        ctx = multiprocessing.get_context('spawn')
+        max_upload_size = getattr(settings, 'FILE_PARSER_MAX_UPLOAD_SIZE', 50 * 1024 * 1024)
+        results = []
+        self.stdout.write(f"{'case':>28} {'method':>17} {'rows':>11} {'seconds':>9} {'peak RSS':>9} {'output':>9}")
+        with tempfile.TemporaryDirectory(prefix='benchmark-suite-') as tmp:
+            for case in suite_cases(options['suite']):
+                methods = [
+                    method for method in case.methods
+                    if not (options['skip_upload'] and method == 'upload')
+                    and (not options['only'] or options['only'] in case.name or options['only'] in method)
+                ]
+                if not methods:
+                    continue
+                path = build_input(case, tmp)
+                input_bytes = os.path.getsize(path)
+                for method in methods:
+                    # The API rejects larger uploads, so those inputs skip the end-to-end case
+                    if method == 'upload' and input_bytes > max_upload_size:
+                        continue
+                    samples = []
+                    for _ in range(options['repeat']):
+                        # One process per sample so peaks and warm caches do not carry over
+                        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                            samples.append(pool.submit(_measure, method, path, tmp).result())
+                    entry = {
+                        'case': case.name,
+                        'method': method,
+                        'params': case.params,
+                        'input_bytes': input_bytes,
+                        'rows': samples[0]['rows'],
+                        'seconds': min(sample['seconds'] for sample in samples),
+                        'seconds_median': statistics.median(sample['seconds'] for sample in samples),
+                        'peak_rss_kb': max(sample['peak_rss_kb'] for sample in samples),
+                        'output_bytes': samples[0]['output_bytes'],
+                    }
+                    results.append(entry)
+                    self.stdout.write(
+                        f"{case.name:>28} {method:>17} {entry['rows']:>11,} {entry['seconds']:>9.3f} "
+                        f"{entry['peak_rss_kb'] / 1024:>7.0f}MB {entry['output_bytes'] / (1024 * 1024):>7.1f}MB"
+                    )
+                os.unlink(path)
+
+        report = {
+            'version': RESULTS_VERSION,
+            'suite': options['suite'],
+            'created_at': timezone.now().isoformat(),
+            'environment': environment(),
+            'repeat': options['repeat'],
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if baseline is not None:
+            rows = compare_results(baseline, report, options['threshold'])
+            regressions = write_comparison(self.stdout, rows)
+            if regressions:
+                raise CommandError(f'{regressions} regression(s) beyond {options["threshold"]:g}%')
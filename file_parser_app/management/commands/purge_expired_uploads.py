@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from file_parser_app.resumable_upload import purge_expired_uploads
+
+
+class Command(BaseCommand):
+    help = 'Delete resumable uploads that expired before completing, with their stored chunks.'
+
+    def handle(self, *args, **options):
+        purged = purge_expired_uploads()
+        self.stdout.write(f'Purged {purged} expired upload(s)')
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from file_parser_app.models import ParsedContent
+from file_parser_app.search_index import get_search_index, index_parsed_content, search_enabled
+
+
+class Command(BaseCommand):
+    help = ('Index parse results for full-text search: those parsed before the index existed, '
+            'or all of them with --all. Entries of deleted parse results are removed.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Re-index every parse result.')
+
+    def handle(self, *args, **options):
+        if not search_enabled():
+            raise CommandError('Search is disabled (FILE_PARSER_SEARCH_ENABLED=False)')
+        index = get_search_index()
+        indexed_ids = set(index.indexed_content_ids())
+        existing_ids = set(ParsedContent.objects.values_list('id', flat=True))
+
+        for content_id in indexed_ids - existing_ids:
+            index.remove(content_id)
+
+        pending = sorted(existing_ids if options['all'] else existing_ids - indexed_ids)
+        entries = 0
+        for start in range(0, len(pending), 100):
+            for parsed_content in ParsedContent.objects.filter(id__in=pending[start:start + 100]):
+                entries += index_parsed_content(parsed_content)
+        self.stdout.write(
+            f'Indexed {len(pending)} parse result(s) ({entries} entries); '
+            f'removed {len(indexed_ids - existing_ids)} stale one(s)'
+        )
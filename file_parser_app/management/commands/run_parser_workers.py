@@ -0,0 +1,53 @@
+import signal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from file_parser_app.job_queue import JobQueue, WorkerPool
+
+
+class Command(BaseCommand):
+    help = 'Run a pool of parser workers that process queued upload jobs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Number of workers (defaults to FILE_PARSER_WORKERS).',
+        )
+        parser.add_argument(
+            '--mode', choices=WorkerPool.MODES, default=None,
+            help='Run workers as threads or processes (defaults to FILE_PARSER_WORKER_MODE).',
+        )
+        parser.add_argument(
+            '--recover', action='store_true',
+            help='Re-queue all leased jobs on startup. Only use when no other workers are running.',
+        )
+        parser.add_argument(
+            '--drain', action='store_true',
+            help='Exit once the queue is empty instead of waiting for new jobs.',
+        )
+
+    def handle(self, *args, **options):
+        if options['recover']:
+            released = JobQueue.release_all_leases()
+            self.stdout.write(f'Re-queued {released} leased job(s)')
+
+        try:
+            pool = WorkerPool(size=options['workers'], mode=options['mode'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        def shutdown(signum, frame):
+            self.stdout.write('Stopping workers after their current jobs...')
+            pool.request_stop()
+
+        signal.signal(signal.SIGINT, shutdown)
+        signal.signal(signal.SIGTERM, shutdown)
+
+        self.stdout.write(f'Starting {pool.size} {pool.mode} worker(s) as {pool.name}')
+        pool.start(drain=options['drain'])
+
+        # Join in short intervals so signal handlers keep running.
+        while pool.is_alive():
+            pool.join(timeout=1)
+
+        self.stdout.write(self.style.SUCCESS('All workers stopped'))
@@ -0,0 +1,157 @@
+import json
+import math
+import random
+from typing import Dict, List, Tuple
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from file_parser_app.scheduling import (
+    PRIORITIES,
+    FairShareScheduler,
+    FifoScheduler,
+    SimulatedJob,
+    expected_seconds,
+    simulate,
+)
+
+MB = 1024 * 1024
+# How far real parse times stray from the estimate: sigma of a log-normal factor
+ESTIMATE_ERROR_SIGMA = 0.5
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile (`q` from 0 to 100) of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def mixed_workload(options: Dict, rng: random.Random) -> Tuple[List[SimulatedJob], Dict[int, str]]:
+    """Small uploads from many clients, into which one client drops a batch of large PDFs.
+
+    With `--backlog`, that many mid-sized CSVs from the same clients are
+    already waiting when the small uploads start, so the queue holds more
+    jobs than a claim reads until the backlog is worked off.
+
+    Returns the jobs and the report group of each. Every job's real
+    duration is its estimate times a random error, so the scheduler ranks
+    jobs on estimates that are often wrong, as it does on real uploads.
+    """
+    jobs: List[SimulatedJob] = []
+    groups: Dict[int, str] = {}
+
+    def add(client: str, kind: str, size: int, priority: str, arrival: float, group: str):
+        estimate = expected_seconds(size, kind)
+        job = SimulatedJob(len(jobs), client, PRIORITIES[priority], estimate,
+                           estimate * rng.lognormvariate(0, ESTIMATE_ERROR_SIGMA), arrival)
+        jobs.append(job)
+        groups[job.id] = group
+
+    for _ in range(options['backlog']):
+        client = f"client-{rng.randrange(options['clients'])}"
+        add(client, 'csv', int(rng.uniform(0.5, 4) * MB), 'normal', 0.0, 'backlog csv')
+
+    arrival = 0.0
+    while True:
+        arrival += rng.expovariate(options['rate'])
+        if arrival >= options['duration']:
+            break
+        client = f"client-{rng.randrange(options['clients'])}"
+        if rng.random() < 0.2:
+            add(client, 'excel', int(rng.uniform(0.05, 2) * MB), 'normal', arrival, 'small xlsx')
+        elif rng.random() < options['interactive_share']:
+            add(client, 'csv', int(rng.uniform(0.01, 1) * MB), 'interactive', arrival, 'interactive csv')
+        else:
+            size = int(min(rng.lognormvariate(math.log(200 * 1024), 1.0), 20 * MB))
+            add(client, 'csv', size, 'normal', arrival, 'small csv')
+
+    for _ in range(options['bulk_files']):
+        size = int(options['bulk_size_mb'] * MB * rng.uniform(0.8, 1.2))
+        add('bulk-client', 'pdf', size, options['bulk_priority'], options['bulk_at'] + rng.uniform(0, 1), 'bulk pdf')
+    return jobs, groups
+
+
+class Command(BaseCommand):
+    help = ('Replay a mixed upload workload through the FIFO and fair-share schedulers on a simulated '
+            'clock and report p50/p99 queue wait and latency per kind of job.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=getattr(settings, 'FILE_PARSER_WORKERS', 2),
+                            help='Parser workers (default FILE_PARSER_WORKERS).')
+        parser.add_argument('--duration', type=float, default=600.0, help='Seconds of small uploads.')
+        parser.add_argument('--rate', type=float, default=2.0, help='Small uploads per second, all clients together.')
+        parser.add_argument('--clients', type=int, default=20, help='Clients sending small uploads.')
+        parser.add_argument('--interactive-share', type=float, default=0.05,
+                            help='Share of small uploads sent with interactive priority.')
+        parser.add_argument('--bulk-files', type=int, default=40, help='PDFs in the bulk client\'s batch.')
+        parser.add_argument('--bulk-size-mb', type=float, default=10.0, help='Size of each bulk PDF.')
+        parser.add_argument('--bulk-at', type=float, default=30.0, help='When the bulk batch arrives (seconds).')
+        parser.add_argument('--bulk-priority', choices=list(PRIORITIES), default='normal',
+                            help='Priority the bulk client uploads with.')
+        parser.add_argument('--backlog', type=int, default=0,
+                            help='CSVs already queued at the start; more than --window tests the claim window.')
+        parser.add_argument('--window', type=int,
+                            default=getattr(settings, 'FILE_PARSER_SCHEDULER_WINDOW', 200),
+                            help='Waiting jobs a claim reads per priority class (default FILE_PARSER_SCHEDULER_WINDOW).')
+        parser.add_argument('--aging', type=float,
+                            default=getattr(settings, 'FILE_PARSER_SCHEDULER_AGING_SECONDS', 60.0),
+                            help='Seconds of waiting that raise a job one priority class.')
+        parser.add_argument('--client-limits', default='0,2',
+                            help='Comma-separated per-client running-job limits to try with the fair scheduler (0 = none).')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', help='Also write the results to this JSON file.')
+
+    def handle(self, *args, **options):
+        try:
+            limits = [int(limit) for limit in options['client_limits'].split(',') if limit.strip()]
+        except ValueError:
+            raise CommandError('--client-limits must be a comma-separated list of integers')
+        if options['workers'] < 1 or options['rate'] <= 0 or options['aging'] <= 0 or options['window'] < 1:
+            raise CommandError('--workers, --rate, --window and --aging must be positive')
+
+        jobs, groups = mixed_workload(options, random.Random(options['seed']))
+        work = sum(job.duration for job in jobs)
+        self.stdout.write(
+            f"{len(jobs)} jobs from {options['clients'] + 1} clients, {work:,.0f}s of parsing "
+            f"on {options['workers']} workers, claim window {options['window']} (seed {options['seed']})"
+        )
+
+        schedulers = [('fifo', FifoScheduler())] + [
+            (f'fair, {limit}/client' if limit else 'fair', FairShareScheduler(options['aging'], limit))
+            for limit in limits
+        ]
+        self.stdout.write(
+            f"{'scheduler':<16} {'jobs':>5} {'group':<16} {'wait p50':>9} {'wait p99':>9} "
+            f"{'latency p50':>12} {'latency p99':>12} {'max':>9}"
+        )
+        results = []
+        for label, scheduler in schedulers:
+            times = simulate(scheduler, jobs, options['workers'], options['window'])
+            for group in sorted(set(groups.values())):
+                members = [job for job in jobs if groups[job.id] == group]
+                waits = [times[job.id][0] - job.arrival for job in members]
+                latencies = [times[job.id][1] - job.arrival for job in members]
+                row = {
+                    'scheduler': label,
+                    'group': group,
+                    'jobs': len(members),
+                    'wait_p50': percentile(waits, 50),
+                    'wait_p99': percentile(waits, 99),
+                    'latency_p50': percentile(latencies, 50),
+                    'latency_p99': percentile(latencies, 99),
+                    'latency_max': max(latencies),
+                }
+                results.append(row)
+                self.stdout.write(
+                    f"{label:<16} {row['jobs']:>5} {group:<16} {row['wait_p50']:>8.2f}s {row['wait_p99']:>8.2f}s "
+                    f"{row['latency_p50']:>11.2f}s {row['latency_p99']:>11.2f}s {row['latency_max']:>8.1f}s"
+                )
+
+        if options['json']:
+            workload = {key: options[key] for key in (
+                'workers', 'duration', 'rate', 'clients', 'interactive_share', 'bulk_files',
+                'bulk_size_mb', 'bulk_at', 'bulk_priority', 'backlog', 'window', 'aging', 'seed'
+            )}
+            with open(options['json'], 'w') as f:
+                json.dump({'workload': workload, 'results': results}, f, indent=2)
+            self.stdout.write(f"Results written to {options['json']}")
@@ -0,0 +1,174 @@
+import logging
+import threading
+from collections import Counter
+from typing import Dict, Iterable, Mapping, Optional
+
+from django.conf import settings
+from django.db.models import Case, Count, F, IntegerField, Value, When
+
+from .models import MetricCounter, ParseJob, PipelineSpan
+
+logger = logging.getLogger(__name__)
+
+PARSE_CACHE_HITS = 'parse_cache_hits'
+PARSE_CACHE_MISSES = 'parse_cache_misses'
+UPLOAD_DEDUP_HITS = 'upload_dedup_hits'
+UPLOAD_DEDUP_BYTES = 'upload_dedup_bytes'
+WORKER_BUSY_MICROSECONDS = 'worker_busy_us'
+
+# Upper bounds (seconds) of the pipeline stage duration histogram buckets
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+# Counters this process has made sure exist
+_known_counters = set()
+_known_lock = threading.Lock()
+
+
+def increment(name: str, amount: int = 1):
+    """Add to a named counter, creating it on first use."""
+    increment_many({name: amount})
+
+
+def increment_many(amounts: Mapping[str, int]):
+    """Add to several named counters in one UPDATE, creating them on first use.
+
+    Counters are hot rows shared by every process, so callers recording
+    several values for one job or request collect them first and apply
+    them here together.
+    """
+    amounts = {name: amount for name, amount in amounts.items() if amount}
+    if not amounts:
+        return
+    try:
+        with _known_lock:
+            new = [name for name in amounts if name not in _known_counters]
+        if new:
+            # Rows exist before the update, so no increment can race their creation
+            MetricCounter.objects.bulk_create(
+                [MetricCounter(name=name, value=0) for name in new], ignore_conflicts=True
+            )
+            with _known_lock:
+                _known_counters.update(new)
+        updated = MetricCounter.objects.filter(name__in=amounts).update(value=F('value') + Case(
+            *(When(name=name, then=Value(amount)) for name, amount in amounts.items()),
+            default=Value(0),
+            output_field=IntegerField(),
+        ))
+        if updated < len(amounts):
+            # Counters deleted since (e.g. reset in the admin) are created again next time
+            with _known_lock:
+                _known_counters.difference_update(amounts)
+    except Exception as e:
+        # Metrics must never fail the request or job that records them
+        logger.warning(f"Could not update metrics {', '.join(amounts)}: {str(e)}")
+
+
+def get_counters(names: Iterable[str]) -> Dict[str, int]:
+    """Current values of the named counters (zero if never incremented)."""
+    names = list(names)
+    values = dict(MetricCounter.objects.filter(name__in=names).values_list('name', 'value'))
+    return {name: values.get(name, 0) for name in names}
+
+
+def parse_cache_stats() -> Dict[str, float]:
+    """Parse-result cache and upload deduplication counters with the hit ratio."""
+    counters = get_counters([PARSE_CACHE_HITS, PARSE_CACHE_MISSES, UPLOAD_DEDUP_HITS, UPLOAD_DEDUP_BYTES])
+    lookups = counters[PARSE_CACHE_HITS] + counters[PARSE_CACHE_MISSES]
+    return {
+        **counters,
+        'parse_cache_hit_ratio': counters[PARSE_CACHE_HITS] / lookups if lookups else 0.0,
+    }
+
+
+def observe_stage(stage: str, seconds: float, counters: Optional[Counter] = None):
+    """Add one stage duration to its histogram.
+
+    Only the bucket the value falls in is incremented (plus the sum);
+    buckets are made cumulative when exposed. With `counters`, the
+    increments are added to it for the caller to apply with
+    `increment_many`; otherwise they are applied now.
+    """
+    amounts = Counter() if counters is None else counters
+    bound = next((str(b) for b in STAGE_BUCKETS if seconds <= b), '+Inf')
+    amounts[f'stage_bucket:{stage}:{bound}'] += 1
+    amounts[f'stage_sum_us:{stage}'] += int(seconds * 1_000_000)
+    if counters is None:
+        increment_many(amounts)
+
+
+def record_throughput(kind: str, bytes_parsed: int, rows: int, counters: Optional[Counter] = None):
+    """Count one parsed file of a kind with its input bytes and output rows (see `observe_stage`)."""
+    amounts = Counter() if counters is None else counters
+    amounts[f'parsed_files:{kind}'] += 1
+    amounts[f'parsed_bytes:{kind}'] += bytes_parsed
+    amounts[f'parsed_rows:{kind}'] += rows
+    if counters is None:
+        increment_many(amounts)
+
+
+def prometheus_text() -> str:
+    """All metrics in the Prometheus text exposition format.
+
+    Counters and histograms come from the shared MetricCounter rows, so
+    every web and worker process contributes. Queue gauges are read from
+    the job table at scrape time.
+    """
+    counters = dict(MetricCounter.objects.values_list('name', 'value'))
+    lines = []
+
+    def family(name: str, kind: str, help_text: str):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+
+    def labelled(prefix: str):
+        return sorted((name[len(prefix):], value) for name, value in counters.items() if name.startswith(prefix))
+
+    family('file_parser_stage_duration_seconds', 'histogram', 'Time files spend in each pipeline stage.')
+    for stage, _ in PipelineSpan.STAGE_CHOICES:
+        cumulative = 0
+        for bound in [str(b) for b in STAGE_BUCKETS] + ['+Inf']:
+            cumulative += counters.get(f'stage_bucket:{stage}:{bound}', 0)
+            lines.append(f'file_parser_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+        lines.append(f'file_parser_stage_duration_seconds_sum{{stage="{stage}"}} '
+                     f'{counters.get(f"stage_sum_us:{stage}", 0) / 1_000_000}')
+        lines.append(f'file_parser_stage_duration_seconds_count{{stage="{stage}"}} {cumulative}')
+
+    for metric, prefix, help_text in (
+        ('file_parser_parsed_files_total', 'parsed_files:', 'Files parsed, by file type.'),
+        ('file_parser_parsed_bytes_total', 'parsed_bytes:', 'Input bytes parsed, by file type.'),
+        ('file_parser_parsed_rows_total', 'parsed_rows:', 'Rows or pages produced, by file type.'),
+    ):
+        family(metric, 'counter', help_text)
+        for kind, value in labelled(prefix):
+            lines.append(f'{metric}{{file_type="{kind}"}} {value}')
+
+    for metric, name, help_text in (
+        ('file_parser_parse_cache_hits_total', PARSE_CACHE_HITS, 'Parses answered from the parse-result cache.'),
+        ('file_parser_parse_cache_misses_total', PARSE_CACHE_MISSES, 'Parses that ran the parser.'),
+        ('file_parser_upload_dedup_hits_total', UPLOAD_DEDUP_HITS, 'Uploads whose bytes were already stored.'),
+        ('file_parser_upload_dedup_bytes_total', UPLOAD_DEDUP_BYTES, 'Bytes not stored again thanks to dedup.'),
+    ):
+        family(metric, 'counter', help_text)
+        lines.append(f'{metric} {counters.get(name, 0)}')
+
+    family('file_parser_worker_busy_seconds_total', 'counter',
+           'Time parser workers spent running jobs; rate() over the worker count is utilization.')
+    lines.append(f'file_parser_worker_busy_seconds_total {counters.get(WORKER_BUSY_MICROSECONDS, 0) / 1_000_000}')
+
+    jobs = dict(
+        ParseJob.objects.filter(status__in=['queued', 'leased']).order_by()
+        .values('status').annotate(count=Count('id')).values_list('status', 'count')
+    )
+    family('file_parser_queue_jobs', 'gauge', 'Parse jobs waiting (queued) or running (leased).')
+    for job_status in ('queued', 'leased'):
+        lines.append(f'file_parser_queue_jobs{{status="{job_status}"}} {jobs.get(job_status, 0)}')
+
+    workers = getattr(settings, 'FILE_PARSER_WORKERS', 2)
+    family('file_parser_workers', 'gauge', 'Parser workers configured per worker pool.')
+    lines.append(f'file_parser_workers {workers}')
+    family('file_parser_worker_utilization', 'gauge', 'Running jobs over configured workers.')
+    lines.append(f'file_parser_worker_utilization {jobs.get("leased", 0) / workers if workers else 0.0}')
+
+    return '\n'.join(lines) + '\n'
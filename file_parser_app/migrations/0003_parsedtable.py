@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_parser_app', '0002_parsejob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParsedTable',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(blank=True, default='', max_length=255)),
+                ('position', models.IntegerField(default=0)),
+                ('path', models.CharField(max_length=500)),
+                ('format', models.CharField(choices=[('parquet', 'Parquet'), ('arrow', 'Arrow IPC'), ('jsonl', 'JSON Lines')], max_length=20)),
+                ('schema', models.JSONField(default=list)),
+                ('row_count', models.BigIntegerField(default=0)),
+                ('size_bytes', models.BigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('parsed_content', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tables', to='file_parser_app.parsedcontent')),
+            ],
+            options={
+                'ordering': ['parsed_content', 'position'],
+                'unique_together': {('parsed_content', 'name')},
+            },
+        ),
+    ]
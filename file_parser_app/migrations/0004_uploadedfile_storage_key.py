@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_parser_app', '0003_parsedtable'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadedfile',
+            name='storage_key',
+            field=models.CharField(blank=True, max_length=500, null=True),
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 4.2.7 on 2026-10-17 05:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def link_parsed_content(apps, schema_editor):
+    """Point each file at the parse result that used to point at it."""
+    ParsedContent = apps.get_model('file_parser_app', 'ParsedContent')
+    UploadedFile = apps.get_model('file_parser_app', 'UploadedFile')
+    for parsed_content_id, file_id in ParsedContent.objects.values_list('id', 'file_id'):
+        UploadedFile.objects.filter(id=file_id).update(parsed_content_id=parsed_content_id)
+
+
+def unlink_parsed_content(apps, schema_editor):
+    ParsedContent = apps.get_model('file_parser_app', 'ParsedContent')
+    UploadedFile = apps.get_model('file_parser_app', 'UploadedFile')
+    for file_id, parsed_content_id in UploadedFile.objects.exclude(parsed_content=None).values_list('id', 'parsed_content_id'):
+        ParsedContent.objects.filter(id=parsed_content_id).update(file_id=file_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_parser_app', '0004_uploadedfile_storage_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('storage_key', models.CharField(max_length=500)),
+                ('size', models.BigIntegerField(default=0)),
+                ('ref_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MetricCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='uploadedfile',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='files', to='file_parser_app.contentblob'),
+        ),
+        migrations.AddField(
+            model_name='parsedcontent',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='parsed_results', to='file_parser_app.contentblob'),
+        ),
+        # Free the `parsed_content` name for the new forward relation
+        migrations.AlterField(
+            model_name='parsedcontent',
+            name='file',
+            field=models.OneToOneField(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='file_parser_app.uploadedfile'),
+        ),
+        migrations.AddField(
+            model_name='uploadedfile',
+            name='parsed_content',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='files', to='file_parser_app.parsedcontent'),
+        ),
+        migrations.RunPython(link_parsed_content, unlink_parsed_content),
+        migrations.RemoveField(
+            model_name='parsedcontent',
+            name='file',
+        ),
+        migrations.AlterUniqueTogether(
+            name='parsedcontent',
+            unique_together={('blob', 'content_type')},
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-17 05:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_parser_app', '0005_contentblob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParsedPage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.IntegerField()),
+                ('content', models.TextField(blank=True, default='')),
+                ('engine', models.CharField(blank=True, choices=[('pdfplumber', 'pdfplumber'), ('pypdf2', 'PyPDF2')], max_length=20, null=True)),
+                ('parsed_content', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pages', to='file_parser_app.parsedcontent')),
+            ],
+            options={
+                'ordering': ['parsed_content', 'number'],
+                'unique_together': {('parsed_content', 'number')},
+            },
+        ),
+    ]
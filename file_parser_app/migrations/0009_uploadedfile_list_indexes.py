@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_parser_app', '0008_uploadsession'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='uploadedfile',
+            index=models.Index(fields=['created_at', 'id'], name='uploadedfile_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='uploadedfile',
+            index=models.Index(fields=['status', 'created_at', 'id'], name='uploadedfile_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='uploadedfile',
+            index=models.Index(fields=['file_type', 'created_at', 'id'], name='uploadedfile_type_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-17 07:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_parser_app', '0009_uploadedfile_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='parsejob',
+            name='profile',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='PipelineSpan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stage', models.CharField(choices=[('upload_read', 'Upload read'), ('db_write', 'DB write'), ('queue_wait', 'Queue wait'), ('parse', 'Parse'), ('serialize', 'Serialize'), ('persist', 'Persist parsed content')], max_length=20)),
+                ('started_at', models.DateTimeField()),
+                ('duration', models.FloatField()),
+                ('bytes', models.BigIntegerField(blank=True, null=True)),
+                ('rows', models.BigIntegerField(blank=True, null=True)),
+                ('file', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='spans', to='file_parser_app.uploadedfile')),
+            ],
+            options={
+                'ordering': ['started_at'],
+                'indexes': [models.Index(fields=['file', 'started_at'], name='span_file_started_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 07:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_parser_app', '0010_pipelinespan'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='parsedtable',
+            name='parts',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-17 08:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_parser_app', '0011_parsedtable_parts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadedfile',
+            name='preview',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='pipelinespan',
+            name='stage',
+            field=models.CharField(choices=[('upload_read', 'Upload read'), ('db_write', 'DB write'), ('preview', 'Preview'), ('queue_wait', 'Queue wait'), ('parse', 'Parse'), ('serialize', 'Serialize'), ('persist', 'Persist parsed content')], max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='uploadedfile',
+            name='status',
+            field=models.CharField(choices=[('uploading', 'Uploading'), ('previewed', 'Previewed'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], default='uploading', max_length=20),
+        ),
+    ]
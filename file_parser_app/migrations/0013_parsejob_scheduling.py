@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-17 08:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_parser_app', '0012_uploadedfile_preview'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='parsejob',
+            name='client',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='parsejob',
+            name='expected_seconds',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='parsejob',
+            name='priority',
+            field=models.SmallIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='uploadedfile',
+            name='client',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+    ]
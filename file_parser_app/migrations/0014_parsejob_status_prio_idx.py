@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_parser_app', '0013_parsejob_scheduling'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='parsejob',
+            index=models.Index(fields=['status', 'priority', 'available_at'], name='parsejob_status_prio_idx'),
+        ),
+    ]
@@ -6,6 +6,7 @@ from django.utils import timezone
 class UploadedFile(models.Model):
     STATUS_CHOICES = [
         ('uploading', 'Uploading'),
+        ('previewed', 'Previewed'),
         ('processing', 'Processing'),
         ('ready', 'Ready'),
         ('failed', 'Failed'),
@@ -18,24 +19,274 @@ class UploadedFile(models.Model):
     file_type = models.CharField(max_length=50)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploading')
     progress = models.IntegerField(default=0)
+    # Bytes of the upload live in blob storage under this key; `file_content`
+    # is only populated for files uploaded before blob storage existed.
+    storage_key = models.CharField(max_length=500, null=True, blank=True)
     file_content = models.BinaryField(null=True, blank=True)
+    # Uploads with identical bytes share one blob and one parse result
+    blob = models.ForeignKey('ContentBlob', on_delete=models.PROTECT, null=True, blank=True, related_name='files')
+    parsed_content = models.ForeignKey(
+        'ParsedContent', on_delete=models.SET_NULL, null=True, blank=True, related_name='files'
+    )
+    # Set for files uploaded together through the batch endpoint
+    batch = models.ForeignKey('UploadBatch', on_delete=models.SET_NULL, null=True, blank=True, related_name='files')
+    # Who uploaded the file, for fair sharing of parser workers (see scheduling.py)
+    client = models.CharField(max_length=255, blank=True, default='')
+    # Headers, column kinds and first rows of a lazily parsed upload (see preview.py)
+    preview = models.JSONField(null=True, blank=True)
     error_message = models.TextField(null=True, blank=True)
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-created_at']
+        # Keyset pagination of the file list walks (created_at, id), optionally within a status or type
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='uploadedfile_created_idx'),
+            models.Index(fields=['status', 'created_at', 'id'], name='uploadedfile_status_idx'),
+            models.Index(fields=['file_type', 'created_at', 'id'], name='uploadedfile_type_idx'),
+        ]
     
     def __str__(self):
         return f"{self.original_filename} ({self.status})"
 
 
+class ContentBlob(models.Model):
+    """Uploaded bytes stored once per SHA-256 digest.
+    
+    `ref_count` is the number of UploadedFile rows pointing at the blob; the
+    blob, its stored bytes and its parse results are removed when it drops
+    to zero.
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    storage_key = models.CharField(max_length=500)
+    size = models.BigIntegerField(default=0)
+    ref_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.ref_count} refs)"
+
+
 class ParsedContent(models.Model):
-    file = models.OneToOneField(UploadedFile, on_delete=models.CASCADE, related_name='parsed_content')
+    # Null for results parsed from uploads stored before deduplication
+    blob = models.ForeignKey(ContentBlob, on_delete=models.CASCADE, null=True, blank=True, related_name='parsed_results')
     content = models.JSONField()
     content_type = models.CharField(max_length=50)  # csv, excel, pdf, etc.
     row_count = models.IntegerField(default=0)
     created_at = models.DateTimeField(default=timezone.now)
     
+    class Meta:
+        unique_together = [('blob', 'content_type')]
+    
+    def __str__(self):
+        return f"Parsed {self.content_type} content {self.pk}"
+
+
+class ParsedTable(models.Model):
+    """Rows of a CSV file or Excel sheet stored in a columnar table file.
+    
+    `ParsedContent.content` then only holds headers and counts; rows are read
+    from the table by column and row range on demand.
+    """
+    FORMAT_CHOICES = [
+        ('parquet', 'Parquet'),
+        ('arrow', 'Arrow IPC'),
+        ('jsonl', 'JSON Lines'),
+    ]
+    
+    parsed_content = models.ForeignKey(ParsedContent, on_delete=models.CASCADE, related_name='tables')
+    name = models.CharField(max_length=255, blank=True, default='')  # sheet name; empty for CSV
+    position = models.IntegerField(default=0)
+    path = models.CharField(max_length=500)
+    # Files of rows appended after `path`, in order (CSV append mode)
+    parts = models.JSONField(default=list, blank=True)
+    format = models.CharField(max_length=20, choices=FORMAT_CHOICES)
+    schema = models.JSONField(default=list)  # [{'name', 'kind', 'type'}, ...]
+    row_count = models.BigIntegerField(default=0)
+    size_bytes = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['parsed_content', 'position']
+        unique_together = [('parsed_content', 'name')]
+    
+    def __str__(self):
+        return f"{self.name or 'table'} of {self.parsed_content}"
+    
+    @property
+    def columns(self):
+        return [column['name'] for column in self.schema]
+    
+    @property
+    def paths(self):
+        """All files of the table, for the `table_store` readers."""
+        return [self.path, *self.parts]
+
+
+class ParsedPage(models.Model):
+    """Extracted text of one PDF page, so pages can be served individually."""
+    ENGINE_CHOICES = [
+        ('pdfplumber', 'pdfplumber'),
+        ('pypdf2', 'PyPDF2'),
+    ]
+    
+    parsed_content = models.ForeignKey(ParsedContent, on_delete=models.CASCADE, related_name='pages')
+    number = models.IntegerField()  # 1-based
+    content = models.TextField(blank=True, default='')
+    engine = models.CharField(max_length=20, choices=ENGINE_CHOICES, null=True, blank=True)  # None: no text found
+    
+    class Meta:
+        ordering = ['parsed_content', 'number']
+        unique_together = [('parsed_content', 'number')]
+    
+    def __str__(self):
+        return f"Page {self.number} of {self.parsed_content}"
+
+
+class UploadBatch(models.Model):
+    """Files uploaded in one batch request, parsed by a single queued job."""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('processing', 'Processing'),
+        ('done', 'Done'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    total_files = models.IntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Batch of {self.total_files} files ({self.status})"
+
+
+class UploadSession(models.Model):
+    """Resumable upload of one file, received as chunks at byte offsets.
+    
+    Each chunk is stored as a separate part as soon as it arrives. On
+    completion the parts are joined into the file's content blob and the
+    file is queued for parsing.
+    """
+    STATUS_CHOICES = [
+        ('active', 'Active'),
+        ('completing', 'Completing'),
+        ('complete', 'Complete'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    file = models.OneToOneField(UploadedFile, on_delete=models.CASCADE, related_name='upload_session')
+    total_size = models.BigIntegerField()
+    received_bytes = models.BigIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Upload of {self.file_id} ({self.received_bytes}/{self.total_size} bytes)"
+
+
+class UploadChunk(models.Model):
+    """One received chunk of a resumable upload, stored under `storage_key`."""
+    session = models.ForeignKey(UploadSession, on_delete=models.CASCADE, related_name='chunks')
+    offset = models.BigIntegerField()
+    size = models.BigIntegerField()
+    sha256 = models.CharField(max_length=64)
+    storage_key = models.CharField(max_length=500)
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['offset']
+        unique_together = ('session', 'offset')
+    
+    def __str__(self):
+        return f"Chunk {self.offset}+{self.size} of upload {self.session_id}"
+
+
+class ParseJob(models.Model):
+    """Durable queue entry for parsing an uploaded file.
+
+    Workers claim jobs by taking a time-limited lease. A job whose lease
+    expires without being completed (e.g. the worker process died) becomes
+    claimable again, so restarts never silently drop in-flight work.
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('leased', 'Leased'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
+    # A job parses either one file or every unfinished file of a batch
+    file = models.ForeignKey(UploadedFile, on_delete=models.CASCADE, null=True, blank=True, related_name='parse_jobs')
+    batch = models.ForeignKey(UploadBatch, on_delete=models.CASCADE, null=True, blank=True, related_name='parse_jobs')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.IntegerField(default=0)
+    leased_by = models.CharField(max_length=255, null=True, blank=True)
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    available_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(null=True, blank=True)
+    # Run the parse under cProfile and keep the capture (see tracing.py)
+    profile = models.BooleanField(default=False)
+    # What the scheduler ranks jobs by: priority class (lower runs first),
+    # estimated parse time and the uploading client (see scheduling.py)
+    priority = models.SmallIntegerField(default=1)
+    expected_seconds = models.FloatField(default=0.0)
+    client = models.CharField(max_length=255, blank=True, default='')
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='parsejob_status_avail_idx'),
+            models.Index(fields=['status', 'lease_expires_at'], name='parsejob_status_lease_idx'),
+            models.Index(fields=['status', 'priority', 'available_at'], name='parsejob_status_prio_idx'),
+        ]
+    
+    def __str__(self):
+        target = f"batch {self.batch_id}" if self.batch_id else self.file_id
+        return f"Parse job for {target} ({self.status})"
+
+
+class PipelineSpan(models.Model):
+    """Time one file spent in one stage of the upload and parse pipeline."""
+    STAGE_CHOICES = [
+        ('upload_read', 'Upload read'),
+        ('db_write', 'DB write'),
+        ('preview', 'Preview'),
+        ('queue_wait', 'Queue wait'),
+        ('parse', 'Parse'),
+        ('serialize', 'Serialize'),
+        ('persist', 'Persist parsed content'),
+    ]
+    
+    file = models.ForeignKey(UploadedFile, on_delete=models.CASCADE, related_name='spans')
+    stage = models.CharField(max_length=20, choices=STAGE_CHOICES)
+    started_at = models.DateTimeField()
+    duration = models.FloatField()  # seconds
+    bytes = models.BigIntegerField(null=True, blank=True)
+    rows = models.BigIntegerField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['started_at']
+        indexes = [
+            models.Index(fields=['file', 'started_at'], name='span_file_started_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.stage} of {self.file_id}: {self.duration:.3f}s"
+
+
+class MetricCounter(models.Model):
+    """Named counter shared by every web and worker process."""
+    name = models.CharField(max_length=100, unique=True)
+    value = models.BigIntegerField(default=0)
+    
     def __str__(self):
-        return f"Parsed content for {self.file.original_filename}"
\ No newline at end of file
+        return f"{self.name}={self.value}"
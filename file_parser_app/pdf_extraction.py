@@ -0,0 +1,175 @@
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import pdfplumber
+import PyPDF2
+
+logger = logging.getLogger(__name__)
+
+PdfSource = Union[bytes, str, os.PathLike]
+
+# Page ranges per worker process; more ranges than workers evens out pages of
+# very different cost (e.g. dense tables next to blank scans)
+PDF_RANGES_PER_WORKER = 4
+
+
+def page_count(path: str) -> int:
+    with pdfplumber.open(path) as pdf:
+        return len(pdf.pages)
+
+
+def extract_page_range(path: str, start: int, stop: int) -> List[Dict[str, Any]]:
+    """Extract pages [start, stop) of a PDF (0-based), falling back per page.
+
+    pdfplumber is tried first; PyPDF2 only re-reads the pages pdfplumber
+    returned no text for.
+    """
+    pages = []
+    with pdfplumber.open(path) as pdf:
+        for index in range(start, stop):
+            page = pdf.pages[index]
+            text = (page.extract_text() or '').strip()
+            pages.append({'page': index + 1, 'content': text, 'engine': 'pdfplumber' if text else None})
+            # Cached layout objects would otherwise pile up across the range
+            page.flush_cache()
+
+    empty = [page for page in pages if not page['content']]
+    if empty:
+        reader = PyPDF2.PdfReader(path)
+        for page in empty:
+            text = (reader.pages[page['page'] - 1].extract_text() or '').strip()
+            if text:
+                page.update(content=text, engine='pypdf2')
+    return pages
+
+
+def page_ranges(total: int, parts: int) -> List[Tuple[int, int]]:
+    """Split [0, total) into at most `parts` contiguous ranges of near-equal size."""
+    parts = max(1, min(parts, total))
+    size, extra = divmod(total, parts)
+    ranges = []
+    start = 0
+    for index in range(parts):
+        stop = start + size + (1 if index < extra else 0)
+        ranges.append((start, stop))
+        start = stop
+    return [r for r in ranges if r[0] < r[1]]
+
+
+class PdfPagePool:
+    """Process pool that extracts page ranges of one PDF in parallel."""
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                )
+            return self._executor
+
+    def _reset_executor(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def extract(self, path: str, total: int,
+                progress_callback: Optional[Callable[[int, int], None]] = None) -> List[Dict[str, Any]]:
+        executor = self._get_executor()
+        futures = {
+            executor.submit(extract_page_range, path, start, stop): (start, stop)
+            for start, stop in page_ranges(total, self.max_workers * PDF_RANGES_PER_WORKER)
+        }
+        pages = []
+        try:
+            for future in as_completed(futures):
+                pages.extend(future.result())
+                if progress_callback:
+                    progress_callback(len(pages), total)
+        except BrokenProcessPool:
+            self._reset_executor()
+            raise
+        finally:
+            for future in futures:
+                future.cancel()
+        pages.sort(key=lambda page: page['page'])
+        return pages
+
+    def shutdown(self):
+        self._reset_executor()
+
+
+_default_pool = None
+_default_lock = threading.Lock()
+
+
+def get_pdf_pool() -> Optional[PdfPagePool]:
+    """Return the shared page pool, or None when pages are extracted in this process.
+
+    That is when FILE_PARSER_PDF_PROCESSES is 1, and in child processes
+    (parse-pool processes and process-mode workers): those already run one
+    per CPU, and multiprocessing joins a child's non-daemonic pool workers
+    at exit before the pool is told to stop, so the child would never exit.
+    """
+    global _default_pool
+
+    from django.conf import settings
+
+    if multiprocessing.parent_process() is not None:
+        return None
+    processes = getattr(settings, 'FILE_PARSER_PDF_PROCESSES', None) or os.cpu_count() or 1
+    if processes <= 1:
+        return None
+    with _default_lock:
+        if _default_pool is None:
+            _default_pool = PdfPagePool(processes)
+        return _default_pool
+
+
+def extract_pages(source: PdfSource, progress_callback: Optional[Callable[[int, int], None]] = None,
+                  pool: Optional[PdfPagePool] = None) -> List[Dict[str, Any]]:
+    """Extract the text of every page of a PDF, in page order.
+
+    Documents with at least FILE_PARSER_PDF_PARALLEL_MIN_PAGES pages are
+    split into page ranges extracted across `pool` (default: the shared
+    pool); smaller ones, or all of them when no pool is configured, are
+    extracted in the calling process. Every page is returned, with empty
+    content if neither engine found text on it.
+    """
+    from django.conf import settings
+
+    staged_path = None
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        # Workers open the file themselves, so bytes need a path first
+        fd, staged_path = tempfile.mkstemp(prefix='pdf-', suffix='.pdf')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(source)
+    path = staged_path or os.fspath(source)
+
+    try:
+        total = page_count(path)
+        pool = pool or get_pdf_pool()
+        min_pages = getattr(settings, 'FILE_PARSER_PDF_PARALLEL_MIN_PAGES', 8)
+        if pool is None or total < min_pages:
+            pages = []
+            for start, stop in page_ranges(total, max(1, total // 25)):
+                pages.extend(extract_page_range(path, start, stop))
+                if progress_callback:
+                    progress_callback(len(pages), total)
+            return pages
+        return pool.extract(path, total, progress_callback)
+    finally:
+        if staged_path:
+            os.unlink(staged_path)
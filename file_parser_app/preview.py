@@ -0,0 +1,141 @@
+import io
+from itertools import islice
+from typing import Any, Dict, Optional
+
+import pandas as pd
+import pdfplumber
+from django.conf import settings
+
+from .columnar import columns_to_records, encode_columns
+from .excel_engines import OpenpyxlEngine, open_workbook, workbook_format
+from .file_parser import FileParser, FileSource
+from .models import UploadedFile
+from .pdf_extraction import extract_page_range
+from .storage import get_storage
+
+# 'full' parses uploads right away; 'lazy' previews them and parses later
+PARSE_MODES = ('full', 'lazy')
+
+# PDF previews hold the text of this many leading pages
+PREVIEW_PAGES = 1
+
+
+def _encoded_rows(df: pd.DataFrame, max_rows: int) -> Dict[str, Any]:
+    """Column kinds over every sampled row, and the first `max_rows` rows."""
+    encoded = encode_columns(df)
+    headers = [column['name'] for column in encoded['schema']]
+    return {
+        'dtypes': {column['name']: column['kind'] for column in encoded['schema']},
+        'rows': columns_to_records(headers, [values[:max_rows] for values in encoded['column_values']]),
+    }
+
+
+def preview_csv(head: bytes, total_size: int, max_rows: int) -> Dict[str, Any]:
+    """Preview a CSV from its first bytes: header, column kinds, first rows, estimated row count.
+
+    Kinds are inferred over every whole row in `head`, as the full parse
+    would infer them over its first chunk. Unless `head` is the whole file,
+    the row count is extrapolated from the average size of those rows.
+    """
+    complete = len(head) >= total_size
+    # Only whole rows: the last line of a partial read may be cut short
+    sample = head if complete else head[:head.rfind(b'\n') + 1]
+    if not sample:
+        raise ValueError('The first row is longer than the preview read')
+    dialect = FileParser._sniff_csv(sample)
+    df = pd.read_csv(io.BytesIO(sample), **FileParser._csv_read_options(sample, dialect))
+    headers = [str(column) for column in df.columns]
+    df.columns = headers
+
+    header_bytes = sample.find(b'\n') + 1 if dialect['has_header'] else 0
+    if complete or df.empty:
+        estimated_rows = len(df)
+    else:
+        estimated_rows = round(len(df) * (total_size - header_bytes) / (len(sample) - header_bytes))
+    return {
+        'content_type': 'csv',
+        'headers': headers,
+        'delimiter': dialect['delimiter'],
+        'has_header': dialect['has_header'],
+        'columns': len(headers),
+        'estimated_rows': estimated_rows,
+        'rows_exact': complete,
+        **_encoded_rows(df, max_rows),
+    }
+
+
+def preview_excel(source: FileSource, max_rows: int, engine: Optional[str] = None) -> Dict[str, Any]:
+    """Preview a workbook: its sheets, each with headers, column kinds and first rows.
+
+    Row counts come from the dimensions recorded in the workbook (None when
+    it records none), so no sheet is read past its first rows.
+    """
+    if engine is None and workbook_format(source) == 'xlsx' and OpenpyxlEngine.is_available():
+        # Faster engines load a whole sheet up front; openpyxl's read-only
+        # mode parses only the rows read
+        engine = OpenpyxlEngine.name
+    sheets = {}
+    with open_workbook(source, engine) as workbook:
+        for name in workbook.sheet_names:
+            rows = iter(workbook.iter_rows(name))
+            header_row = next(rows, None)
+            if header_row is None:
+                continue
+            headers = FileParser._column_names(list(header_row))
+            width = len(headers)
+            sample = [tuple(row[:width]) + (None,) * (width - len(row)) for row in islice(rows, max_rows)]
+            recorded = workbook.row_count(name)
+            sheets[name] = {
+                'headers': headers,
+                'estimated_rows': max(recorded - 1, len(sample)) if recorded is not None else None,
+                **_encoded_rows(pd.DataFrame(sample, columns=headers), max_rows),
+            }
+    return {
+        'content_type': 'excel',
+        'sheet_names': list(sheets),
+        'sheets': sheets,
+    }
+
+
+def preview_pdf(path: str) -> Dict[str, Any]:
+    """Preview a PDF: its page count and the text of its first pages."""
+    with pdfplumber.open(path) as pdf:
+        page_count = len(pdf.pages)
+    pages = extract_page_range(path, 0, min(PREVIEW_PAGES, page_count))
+    return {
+        'content_type': 'pdf',
+        'page_count': page_count,
+        'pages': [{'page': page['page'], 'content': page['content']} for page in pages],
+    }
+
+
+def preview_upload(uploaded_file: UploadedFile) -> Optional[Dict[str, Any]]:
+    """Preview an upload's bytes, or None if its kind cannot be previewed.
+
+    Only the first FILE_PARSER_PREVIEW_BYTES of a CSV are read from
+    storage. Workbooks and PDFs need random access, so they are opened in
+    place, but only their first rows or pages are read. Raises if the bytes
+    cannot be read as their kind.
+    """
+    kind = FileParser.detect_kind(uploaded_file.file_type, uploaded_file.original_filename)
+    max_rows = getattr(settings, 'FILE_PARSER_PREVIEW_ROWS', 20)
+    storage = get_storage()
+
+    if kind == 'csv':
+        preview_bytes = getattr(settings, 'FILE_PARSER_PREVIEW_BYTES', 64 * 1024)
+        if uploaded_file.storage_key:
+            stream = storage.open(uploaded_file.storage_key)
+            try:
+                head = stream.read(preview_bytes)
+            finally:
+                stream.close()
+        else:
+            head = bytes(uploaded_file.file_content[:preview_bytes])
+        return preview_csv(head, uploaded_file.file_size, max_rows)
+
+    if kind not in ('excel', 'pdf') or not uploaded_file.storage_key:
+        return None
+    with storage.local_path(uploaded_file.storage_key) as path:
+        if kind == 'excel':
+            return preview_excel(path, max_rows)
+        return preview_pdf(path)
@@ -0,0 +1,178 @@
+import asyncio
+import json
+import time
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .models import UploadedFile
+from .progress_tracker import progress_tracker
+
+TERMINAL_STATUSES = ('ready', 'failed')
+
+# SSE comment sent when nothing changed for this long, so proxies keep the connection
+SSE_HEARTBEAT_SECONDS = 15
+
+
+class ProgressFeed:
+    """Change feed of the progress of a set of files.
+
+    Files the in-process tracker knows about are watched without touching
+    the database: `poll` blocks on the tracker until one of them changes.
+    Files it does not know (e.g. parsed by a worker in another process) are
+    read from the database at most every FILE_PARSER_PROGRESS_DB_POLL_SECONDS,
+    with one primary-key query for all of them that skips files already in
+    a final state.
+
+    The feed position is the tracker sequence, handed to clients as an
+    opaque cursor so a stream or long-poll resumes without repeating
+    tracker transitions.
+    """
+
+    def __init__(self, file_ids: Iterable, cursor: Optional[str] = None):
+        self.file_ids: List[str] = list(dict.fromkeys(str(file_id) for file_id in file_ids))
+        self.states: Dict[str, Dict] = {}
+        self.missing: List[str] = []
+        self._sequence = 0
+        self._last_db_poll = None
+        self._started = False
+        if cursor is not None:
+            try:
+                self._sequence = int(cursor)
+            except ValueError:
+                raise ValueError('Invalid cursor')
+            # A cursor from before a restart would skip every change
+            self._started = 0 <= self._sequence <= progress_tracker.sequence
+            if not self._started:
+                self._sequence = 0
+
+    @property
+    def cursor(self) -> str:
+        return str(self._sequence)
+
+    @property
+    def finished(self) -> bool:
+        """Whether every watched file has reached a final state or no longer exists."""
+        return all(
+            file_id in self.missing or self.states.get(file_id, {}).get('status') in TERMINAL_STATUSES
+            for file_id in self.file_ids
+        )
+
+    def _db_poll_interval(self) -> float:
+        return getattr(settings, 'FILE_PARSER_PROGRESS_DB_POLL_SECONDS', 2.0)
+
+    def _untracked_pending(self) -> List[str]:
+        """Files only the database can report on that may still change."""
+        tracked = progress_tracker.tracked(self.file_ids)
+        return [
+            file_id for file_id in self.file_ids
+            if file_id not in tracked and file_id not in self.missing
+            and self.states.get(file_id, {}).get('status') not in TERMINAL_STATUSES
+        ]
+
+    def _collect(self, force_db: bool = False) -> Dict[str, Dict]:
+        entries, self._sequence = progress_tracker.changes_since(self.file_ids, self._sequence)
+        changes = {
+            file_id: {'status': entry.get('status'), 'progress': entry.get('progress')}
+            for file_id, entry in entries.items()
+        }
+
+        pending = self._untracked_pending()
+        now = time.monotonic()
+        due = self._last_db_poll is None or now - self._last_db_poll >= self._db_poll_interval()
+        if pending and (force_db or due):
+            self._last_db_poll = now
+            rows = {
+                str(row['id']): {'status': row['status'], 'progress': row['progress']}
+                for row in UploadedFile.objects.filter(id__in=pending).values('id', 'status', 'progress')
+            }
+            for file_id in pending:
+                state = rows.get(file_id)
+                if state is None:
+                    self.missing.append(file_id)
+                    if file_id in self.states:
+                        changes[file_id] = {'status': 'deleted', 'progress': None}
+                elif self.states.get(file_id) != state:
+                    changes[file_id] = state
+
+        self.states.update(changes)
+        return changes
+
+    def poll(self, timeout: float = 0) -> Dict[str, Dict]:
+        """Return changes since the cursor, waiting up to `timeout` seconds for one.
+
+        The first poll of a feed without a cursor returns the current state
+        of every watched file right away.
+        """
+        if not self._started:
+            self._started = True
+            return self._collect(force_db=True)
+
+        deadline = time.monotonic() + timeout
+        while True:
+            changes = self._collect()
+            remaining = deadline - time.monotonic()
+            if changes or remaining <= 0 or self.finished:
+                return changes
+            wait = remaining
+            if self._untracked_pending():
+                wait = min(wait, self._db_poll_interval())
+            progress_tracker.wait_for_changes(self.file_ids, self._sequence, wait)
+
+    async def apoll(self, timeout: float = 0) -> Dict[str, Dict]:
+        """`poll` for async views, sleeping on the event loop between checks.
+
+        Waiting on the tracker would block a thread for the whole wait, so
+        changes are checked every FILE_PARSER_PROGRESS_ASYNC_POLL_SECONDS
+        instead. Each check runs in the shared executor, taking a thread only
+        for the check itself.
+        """
+        interval = getattr(settings, 'FILE_PARSER_PROGRESS_ASYNC_POLL_SECONDS', 0.25)
+        deadline = time.monotonic() + timeout
+        while True:
+            changes = await sync_to_async(self.poll, thread_sensitive=False)(0)
+            remaining = deadline - time.monotonic()
+            if changes or remaining <= 0 or self.finished:
+                return changes
+            await asyncio.sleep(min(interval, remaining))
+
+
+def _sse_messages(feed: ProgressFeed, changes: Dict[str, Dict]) -> Iterator[str]:
+    """The events for one poll of a feed: its changes (or a keep-alive), then `done` once finished."""
+    for file_id, state in changes.items():
+        payload = json.dumps({'file_id': file_id, **state})
+        yield f"id: {feed.cursor}\nevent: progress\ndata: {payload}\n\n"
+    if not changes:
+        yield ': keep-alive\n\n'
+    if feed.finished:
+        yield f"id: {feed.cursor}\nevent: done\ndata: {json.dumps({'missing': feed.missing})}\n\n"
+
+
+def sse_events(feed: ProgressFeed, max_seconds: float) -> Iterator[str]:
+    """Server-Sent Events for a feed, ending once every file is final or after `max_seconds`."""
+    yield 'retry: 3000\n\n'
+    deadline = time.monotonic() + max_seconds
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        changes = feed.poll(min(SSE_HEARTBEAT_SECONDS, remaining))
+        yield from _sse_messages(feed, changes)
+        if feed.finished:
+            return
+
+
+async def async_sse_events(feed: ProgressFeed, max_seconds: float) -> AsyncIterator[str]:
+    """`sse_events` for async views (see `ProgressFeed.apoll`)."""
+    yield 'retry: 3000\n\n'
+    deadline = time.monotonic() + max_seconds
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        changes = await feed.apoll(min(SSE_HEARTBEAT_SECONDS, remaining))
+        for message in _sse_messages(feed, changes):
+            yield message
+        if feed.finished:
+            return
@@ -1,42 +1,490 @@
+import json
+import sqlite3
 import threading
-from typing import Dict, Optional
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+try:
+    from redis.exceptions import WatchError
+except ImportError:  # redis-py is only needed for the 'redis' backend
+    class WatchError(Exception):
+        """A watched key changed before the transaction was executed."""
 
 
 class ProgressTracker:
-    """In-memory progress tracker for file uploads and processing."""
+    """In-memory progress tracker for file uploads and processing.
+    
+    File IDs may be given as strings or UUIDs. Every change to a file's
+    progress or status is stamped with a sequence number, and watchers can
+    block in `wait_for_changes` until one of the files they follow moves
+    past the sequence they last saw.
+    
+    This tracker only sees updates made in its own process. Subclasses keep
+    the entries in a store shared between processes by overriding `_store`,
+    `_delete` and `_read`; since other processes cannot wake local waiters,
+    those re-read the store every `poll_interval` seconds.
+    """
+    
+    poll_interval: Optional[float] = None
     
     def __init__(self):
         self._progress_data: Dict[str, Dict] = {}
-        self._lock = threading.Lock()
+        self._sequence = 0
+        # Re-entrant so waiters can read the entries while holding the condition
+        self._lock = threading.RLock()
+        self._changed = threading.Condition(self._lock)
+    
+    def _store(self, file_id: str, values: Dict) -> bool:
+        """Merge values into a file's entry; return whether anything changed."""
+        entry = self._progress_data.setdefault(file_id, {})
+        if all(entry.get(key) == value for key, value in values.items()):
+            return False
+        entry.update(values)
+        self._sequence += 1
+        entry['version'] = self._sequence
+        return True
+    
+    def _delete(self, file_id: str) -> bool:
+        if self._progress_data.pop(file_id, None) is None:
+            return False
+        self._sequence += 1
+        return True
+    
+    def _read(self, file_ids: List[str]) -> Tuple[Dict[str, Dict], int]:
+        """Entries of the given files and the current sequence, read together."""
+        entries = {
+            file_id: dict(self._progress_data[file_id])
+            for file_id in file_ids if file_id in self._progress_data
+        }
+        return entries, self._sequence
+    
+    def _update(self, file_id, **values):
+        with self._changed:
+            if self._store(str(file_id), values):
+                self._changed.notify_all()
     
     def set_progress(self, file_id: str, progress: int, status: str = None):
         """Update progress for a file."""
-        with self._lock:
-            if file_id not in self._progress_data:
-                self._progress_data[file_id] = {}
-            
-            self._progress_data[file_id]['progress'] = max(0, min(100, progress))
-            
-            if status:
-                self._progress_data[file_id]['status'] = status
+        values = {'progress': max(0, min(100, progress))}
+        if status:
+            values['status'] = status
+        self._update(file_id, **values)
     
     def get_progress(self, file_id: str) -> Optional[Dict]:
         """Get progress data for a file."""
         with self._lock:
-            return self._progress_data.get(file_id, None)
+            entries, _ = self._read([str(file_id)])
+        return entries.get(str(file_id))
     
     def remove_progress(self, file_id: str):
         """Remove progress data for a file."""
-        with self._lock:
-            self._progress_data.pop(file_id, None)
+        with self._changed:
+            if self._delete(str(file_id)):
+                self._changed.notify_all()
     
     def set_status(self, file_id: str, status: str):
         """Update status for a file."""
+        self._update(file_id, status=status)
+    
+    @property
+    def sequence(self) -> int:
+        """Sequence number of the latest change."""
+        with self._lock:
+            return self._read([])[1]
+    
+    def changes_since(self, file_ids: Iterable[str], since: int) -> Tuple[Dict[str, Dict], int]:
+        """Entries of the given files changed after `since`, and the current sequence."""
+        file_ids = [str(file_id) for file_id in file_ids]
+        with self._lock:
+            entries, sequence = self._read(file_ids)
+        changes = {
+            file_id: entry for file_id, entry in entries.items()
+            if entry.get('version', 0) > since
+        }
+        return changes, sequence
+    
+    def wait_for_changes(self, file_ids: Iterable[str], since: int,
+                         timeout: Optional[float] = None) -> Tuple[Dict[str, Dict], int]:
+        """Block until one of the files changes after `since` or the timeout passes."""
+        file_ids = [str(file_id) for file_id in file_ids]
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._changed:
+            while True:
+                changes, sequence = self.changes_since(file_ids, since)
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if changes or (remaining is not None and remaining <= 0):
+                    return changes, sequence
+                wait = remaining
+                if self.poll_interval is not None:
+                    wait = self.poll_interval if wait is None else min(wait, self.poll_interval)
+                self._changed.wait(wait)
+    
+    def tracked(self, file_ids: Iterable[str]) -> Set[str]:
+        """The subset of file IDs this tracker holds progress for."""
+        with self._lock:
+            entries, _ = self._read([str(file_id) for file_id in file_ids])
+        return set(entries)
+
+
+class SQLiteProgressTracker(ProgressTracker):
+    """Progress shared by every process on one host through a SQLite file.
+    
+    The database runs in WAL mode, so readers never block the writer. It is
+    separate from the application database, which only receives coalesced
+    progress writes.
+    """
+    
+    def __init__(self, path, poll_interval: float = 0.25):
+        super().__init__()
+        self.path = str(path)
+        self.poll_interval = poll_interval
+        self._local = threading.local()
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        with self._transaction() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS progress ('
+                'file_id TEXT PRIMARY KEY, progress INTEGER, status TEXT, version INTEGER NOT NULL)'
+            )
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS progress_sequence ('
+                'id INTEGER PRIMARY KEY CHECK (id = 0), value INTEGER NOT NULL)'
+            )
+            connection.execute('INSERT OR IGNORE INTO progress_sequence (id, value) VALUES (0, 0)')
+    
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+    
+    @contextmanager
+    def _transaction(self, mode: str = 'IMMEDIATE'):
+        connection = self._connection()
+        connection.execute(f'BEGIN {mode}')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+    
+    @staticmethod
+    def _next_sequence(connection: sqlite3.Connection) -> int:
+        return connection.execute(
+            'UPDATE progress_sequence SET value = value + 1 WHERE id = 0 RETURNING value'
+        ).fetchone()[0]
+    
+    def _store(self, file_id: str, values: Dict) -> bool:
+        with self._transaction() as connection:
+            row = connection.execute(
+                'SELECT progress, status FROM progress WHERE file_id = ?', (file_id,)
+            ).fetchone()
+            entry = dict(zip(('progress', 'status'), row)) if row else {}
+            if row and all(entry.get(key) == value for key, value in values.items()):
+                return False
+            entry.update(values)
+            connection.execute(
+                'INSERT INTO progress (file_id, progress, status, version) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (file_id) DO UPDATE SET '
+                'progress = excluded.progress, status = excluded.status, version = excluded.version',
+                (file_id, entry.get('progress'), entry.get('status'), self._next_sequence(connection))
+            )
+            return True
+    
+    def _delete(self, file_id: str) -> bool:
+        with self._transaction() as connection:
+            if not connection.execute('DELETE FROM progress WHERE file_id = ?', (file_id,)).rowcount:
+                return False
+            self._next_sequence(connection)
+            return True
+    
+    def _read(self, file_ids: List[str]) -> Tuple[Dict[str, Dict], int]:
+        entries = {}
+        with self._transaction('DEFERRED') as connection:
+            sequence = connection.execute('SELECT value FROM progress_sequence WHERE id = 0').fetchone()[0]
+            for start in range(0, len(file_ids), 500):
+                batch = file_ids[start:start + 500]
+                rows = connection.execute(
+                    'SELECT file_id, progress, status, version FROM progress '
+                    f'WHERE file_id IN ({", ".join("?" * len(batch))})',
+                    batch
+                )
+                for file_id, progress, status, version in rows:
+                    entry = {'progress': progress, 'status': status, 'version': version}
+                    entries[file_id] = {key: value for key, value in entry.items() if value is not None}
+        return entries, sequence
+
+
+class RedisProgressTracker(ProgressTracker):
+    """Progress shared through a Redis server, or anything speaking its protocol.
+    
+    Entries are JSON fields of one hash. Every write also bumps a sequence
+    key inside a WATCH/MULTI transaction, so readers see entries and
+    sequence consistently. Only a few redis-py client methods are used, so
+    LocalRedisClient can stand in for it.
+    """
+    
+    def __init__(self, client, prefix: str = 'file_parser:progress', poll_interval: float = 0.25):
+        super().__init__()
+        self.client = client
+        self.poll_interval = poll_interval
+        self._entries_key = f"{prefix}:entries"
+        self._sequence_key = f"{prefix}:sequence"
+    
+    def _store(self, file_id: str, values: Dict) -> bool:
+        with self.client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(self._sequence_key)
+                    raw = pipe.hget(self._entries_key, file_id)
+                    entry = json.loads(raw) if raw else {}
+                    if raw and all(entry.get(key) == value for key, value in values.items()):
+                        return False
+                    entry.update(values)
+                    entry['version'] = int(pipe.get(self._sequence_key) or 0) + 1
+                    pipe.multi()
+                    pipe.set(self._sequence_key, entry['version'])
+                    pipe.hset(self._entries_key, file_id, json.dumps(entry))
+                    pipe.execute()
+                    return True
+                except WatchError:
+                    continue
+    
+    def _delete(self, file_id: str) -> bool:
+        with self.client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(self._sequence_key)
+                    if not pipe.hexists(self._entries_key, file_id):
+                        return False
+                    pipe.multi()
+                    pipe.incr(self._sequence_key)
+                    pipe.hdel(self._entries_key, file_id)
+                    pipe.execute()
+                    return True
+                except WatchError:
+                    continue
+    
+    def _read(self, file_ids: List[str]) -> Tuple[Dict[str, Dict], int]:
+        pipe = self.client.pipeline()
+        pipe.get(self._sequence_key)
+        if file_ids:
+            pipe.hmget(self._entries_key, file_ids)
+        results = pipe.execute()
+        sequence = int(results[0] or 0)
+        raws = results[1] if file_ids else []
+        entries = {file_id: json.loads(raw) for file_id, raw in zip(file_ids, raws) if raw}
+        return entries, sequence
+
+
+class LocalRedisClient:
+    """In-process stand-in for the redis-py client methods RedisProgressTracker uses.
+    
+    Lets the Redis backend run in development and tests without a server.
+    It is not shared between processes.
+    """
+    
+    def __init__(self):
+        self._data: Dict[str, object] = {}
+        # Bumped on every write to a key, for WATCH
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.RLock()
+    
+    def _touch(self, key: str):
+        self._versions[key] = self._versions.get(key, 0) + 1
+    
+    def get(self, key):
         with self._lock:
-            if file_id not in self._progress_data:
-                self._progress_data[file_id] = {}
-            self._progress_data[file_id]['status'] = status
+            value = self._data.get(key)
+            return None if value is None else str(value).encode()
+    
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._touch(key)
+            return True
+    
+    def incr(self, key, amount: int = 1):
+        with self._lock:
+            self._data[key] = int(self._data.get(key) or 0) + amount
+            self._touch(key)
+            return self._data[key]
+    
+    def hget(self, key, field):
+        with self._lock:
+            value = self._data.get(key, {}).get(field)
+            return None if value is None else value.encode()
+    
+    def hmget(self, key, fields):
+        with self._lock:
+            return [self.hget(key, field) for field in fields]
+    
+    def hset(self, key, field, value):
+        with self._lock:
+            self._data.setdefault(key, {})[field] = value
+            self._touch(key)
+            return 1
+    
+    def hexists(self, key, field) -> bool:
+        with self._lock:
+            return field in self._data.get(key, {})
+    
+    def hdel(self, key, *fields):
+        with self._lock:
+            table = self._data.get(key, {})
+            removed = sum(1 for field in fields if table.pop(field, None) is not None)
+            self._touch(key)
+            return removed
+    
+    def pipeline(self, transaction: bool = True):
+        return LocalRedisPipeline(self)
+
+
+class LocalRedisPipeline:
+    """Pipeline of LocalRedisClient with redis-py's WATCH/MULTI/EXEC semantics.
+    
+    Commands are buffered until `execute`, except between `watch` and
+    `multi`, where they run immediately.
+    """
+    
+    def __init__(self, client: LocalRedisClient):
+        self._client = client
+        self.reset()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.reset()
+    
+    def reset(self):
+        self._commands = []
+        self._watched: Dict[str, int] = {}
+        self._immediate = False
+    
+    def watch(self, *keys):
+        with self._client._lock:
+            self._watched.update({key: self._client._versions.get(key, 0) for key in keys})
+        self._immediate = True
+    
+    def multi(self):
+        self._immediate = False
+    
+    def __getattr__(self, name):
+        command = getattr(self._client, name)
+        
+        def call(*args, **kwargs):
+            if self._immediate:
+                return command(*args, **kwargs)
+            self._commands.append((command, args, kwargs))
+            return self
+        return call
+    
+    def execute(self):
+        with self._client._lock:
+            try:
+                if any(self._client._versions.get(key, 0) != version for key, version in self._watched.items()):
+                    raise WatchError('Watched variable changed.')
+                return [command(*args, **kwargs) for command, args, kwargs in self._commands]
+            finally:
+                self.reset()
+
+
+def create_progress_tracker() -> ProgressTracker:
+    """Build the tracker configured by FILE_PARSER_PROGRESS_BACKEND."""
+    backend = getattr(settings, 'FILE_PARSER_PROGRESS_BACKEND', 'memory')
+    poll_interval = getattr(settings, 'FILE_PARSER_PROGRESS_POLL_SECONDS', 0.25)
+    if backend == 'memory':
+        return ProgressTracker()
+    if backend == 'sqlite':
+        path = getattr(settings, 'FILE_PARSER_PROGRESS_SQLITE_PATH', None) or Path(settings.BASE_DIR) / 'progress.sqlite3'
+        return SQLiteProgressTracker(path, poll_interval=poll_interval)
+    if backend in ('redis', 'local-redis'):
+        if backend == 'local-redis':
+            client = LocalRedisClient()
+        else:
+            try:
+                import redis
+            except ImportError:
+                raise ImproperlyConfigured('redis is required for the Redis progress backend')
+            client = redis.Redis.from_url(getattr(settings, 'FILE_PARSER_PROGRESS_REDIS_URL', 'redis://localhost:6379/0'))
+        return RedisProgressTracker(
+            client,
+            prefix=getattr(settings, 'FILE_PARSER_PROGRESS_REDIS_PREFIX', 'file_parser:progress'),
+            poll_interval=poll_interval,
+        )
+    raise ImproperlyConfigured(
+        f"Unknown progress backend: {backend}. Expected 'memory', 'sqlite', 'redis' or 'local-redis'"
+    )
+
+
+class ProgressReporter:
+    """Turn parser progress callbacks into throttled percentage updates.
+    
+    Parsers report (completed, total) in their own units. The reporter maps
+    that onto the [start, end] percentage range and calls `publish` only when
+    the percentage has moved by at least `min_delta` and `min_interval`
+    seconds have passed since the last publish, so fast parses make no
+    intermediate writes at all.
+    """
+    
+    def __init__(self, publish: Callable[[int], None], start: int = 0, end: int = 95,
+                 min_interval: float = 0.5, min_delta: int = 1, clock: Callable[[], float] = time.monotonic):
+        self._publish = publish
+        self._start = start
+        self._end = end
+        self._min_interval = min_interval
+        self._min_delta = min_delta
+        self._clock = clock
+        self._last_percent = start
+        self._last_time = clock()
+    
+    def __call__(self, completed: int, total: int):
+        if total <= 0:
+            return
+        
+        fraction = min(1.0, completed / total)
+        percent = int(self._start + (self._end - self._start) * fraction)
+        if percent - self._last_percent < self._min_delta:
+            return
+        
+        now = self._clock()
+        if now - self._last_time < self._min_interval:
+            return
+        
+        self._last_percent = percent
+        self._last_time = now
+        self._publish(percent)
+
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+
+def get_progress_tracker() -> ProgressTracker:
+    """Return the process-wide tracker, creating it on first use."""
+    global _tracker
+    
+    with _tracker_lock:
+        if _tracker is None:
+            _tracker = create_progress_tracker()
+        return _tracker
+
+
+class _ConfiguredProgressTracker:
+    """Module-level handle that defers choosing the backend until settings are used."""
+    
+    def __getattr__(self, name):
+        return getattr(get_progress_tracker(), name)
 
 
 # Global progress tracker instance
-progress_tracker = ProgressTracker()
\ No newline at end of file
+progress_tracker = _ConfiguredProgressTracker()
\ No newline at end of file
@@ -0,0 +1,135 @@
+import datetime
+import decimal
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+import orjson
+from asgiref.sync import sync_to_async
+from django.utils.functional import Promise
+from rest_framework.renderers import JSONRenderer
+
+from .table_store import TablePaths, iter_row_batches
+
+# numpy arrays and scalars are encoded natively; UTC datetimes end in "Z" like DRF's
+DUMPS_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+# Streamed responses are sent in chunks of at least this many bytes
+STREAM_CHUNK_BYTES = 64 * 1024
+
+
+def _default(obj: Any) -> Any:
+    """Encode what orjson does not handle itself, the way DRF's JSONEncoder would."""
+    if isinstance(obj, Promise):
+        return str(obj)
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        # e.g. pandas Timestamps, which subclass datetime
+        return obj.isoformat()
+    if isinstance(obj, datetime.timedelta):
+        return str(obj.total_seconds())
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, bytes):
+        return obj.decode()
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    if hasattr(obj, '__iter__'):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(value: Any, options: int = 0) -> bytes:
+    """Encode a value as JSON bytes with orjson."""
+    return orjson.dumps(value, default=_default, option=DUMPS_OPTIONS | options)
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSON renderer built on orjson.
+
+    Encodes numpy values, datetimes and UUIDs natively, and NaN and
+    infinite floats as null. Any `indent` asked for in the Accept header is
+    rendered as two spaces, the only indent orjson supports.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        options = 0
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            options |= orjson.OPT_INDENT_2
+        return dumps(data, options)
+
+
+class StreamedRows:
+    """Placeholder for the rows of a stored table, read batch by batch as the response is sent."""
+
+    def __init__(self, path: TablePaths, table_format: str, columns: Optional[List[str]] = None,
+                 offset: int = 0, limit: Optional[int] = None):
+        self.path = path
+        self.table_format = table_format
+        self.columns = columns
+        self.offset = offset
+        self.limit = limit
+
+    def __iter__(self) -> Iterator[List[Dict[str, Any]]]:
+        return iter_row_batches(self.path, self.table_format, self.columns, self.offset, self.limit)
+
+
+def contains_streamed_rows(value: Any) -> bool:
+    """Whether `StreamedRows` appear in `value` or in the dicts nested in it."""
+    if isinstance(value, StreamedRows):
+        return True
+    if isinstance(value, dict):
+        return any(contains_streamed_rows(item) for item in value.values())
+    return False
+
+
+def _iter_json(value: Any) -> Iterator[bytes]:
+    if isinstance(value, StreamedRows):
+        yield b'['
+        first = True
+        for batch in value:
+            if batch:
+                # Splice the batch's items into the open array
+                yield (b'' if first else b',') + dumps(batch)[1:-1]
+                first = False
+        yield b']'
+    elif isinstance(value, dict) and contains_streamed_rows(value):
+        yield b'{'
+        for index, (key, item) in enumerate(value.items()):
+            yield (b',' if index else b'') + dumps(str(key)) + b':'
+            yield from _iter_json(item)
+        yield b'}'
+    else:
+        yield dumps(value)
+
+
+def iter_json(value: Any) -> Iterator[bytes]:
+    """Encode `value` as JSON in chunks, reading `StreamedRows` only as they are reached.
+
+    Memory is bounded by the largest stored batch rather than the whole
+    document, and the first bytes go out once the first batch is encoded.
+    """
+    buffer = []
+    size = 0
+    for piece in _iter_json(value):
+        buffer.append(piece)
+        size += len(piece)
+        if size >= STREAM_CHUNK_BYTES:
+            yield b''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+async def aiter_json(value: Any) -> AsyncIterator[bytes]:
+    """`iter_json` for async views.
+
+    Django would read a synchronous iterator to the end before sending the
+    first byte of an ASGI response. Each chunk is encoded in the shared
+    executor instead, so no thread waits on a slow reader between chunks.
+    """
+    chunks = iter_json(value)
+    while True:
+        chunk = await sync_to_async(next, thread_sensitive=False)(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
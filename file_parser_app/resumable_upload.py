@@ -0,0 +1,242 @@
+import hashlib
+import logging
+import uuid
+from datetime import timedelta
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .dedup import release_blob, stage_upload
+from .models import UploadChunk, UploadedFile, UploadSession
+from .progress_tracker import progress_tracker
+from .storage import COPY_BUFFER_SIZE, get_storage
+
+logger = logging.getLogger(__name__)
+
+
+class ResumableUploadError(ValueError):
+    """A request that does not fit the upload's current state or limits."""
+
+
+class UploadConflict(ResumableUploadError):
+    """The upload is not in a state that allows the request (e.g. overlapping chunks)."""
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+def start_upload(filename: str, size: int, content_type: Optional[str] = None, client: str = '') -> UploadSession:
+    """Create an `uploading` file and the session its chunks are sent to."""
+    max_size = _setting('FILE_PARSER_UPLOAD_MAX_SIZE', 10 * 1024 ** 3)
+    if not filename:
+        raise ResumableUploadError('filename is required')
+    if size <= 0:
+        raise ResumableUploadError('size must be a positive number of bytes')
+    if size > max_size:
+        raise ResumableUploadError(f'File too large. Maximum size is {max_size // (1024 * 1024)}MB')
+
+    with transaction.atomic():
+        uploaded_file = UploadedFile.objects.create(
+            filename=filename,
+            original_filename=filename,
+            file_size=size,
+            file_type=content_type or 'application/octet-stream',
+            status='uploading',
+            progress=0,
+            client=client,
+        )
+        session = UploadSession.objects.create(
+            file=uploaded_file,
+            total_size=size,
+            expires_at=timezone.now() + timedelta(hours=_setting('FILE_PARSER_UPLOAD_SESSION_HOURS', 24)),
+        )
+    progress_tracker.set_progress(str(uploaded_file.id), 0, 'uploading')
+    return session
+
+
+def _check_active(session: UploadSession):
+    if session.status != 'active':
+        raise UploadConflict(f'Upload is {session.status}')
+    if session.expires_at <= timezone.now():
+        raise UploadConflict('Upload session has expired')
+
+
+def _lock_session(session: UploadSession):
+    """Lock the session row until the current transaction ends; it must still be active.
+
+    SQLite has no row locks, so there the session is written instead, which
+    takes the database write lock before anything else is read.
+    """
+    if connection.features.has_select_for_update:
+        locked = UploadSession.objects.select_for_update().filter(id=session.id, status='active').exists()
+    else:
+        locked = UploadSession.objects.filter(id=session.id, status='active').update(updated_at=timezone.now())
+    if not locked:
+        raise UploadConflict('Upload is no longer active')
+
+
+def write_chunk(session: UploadSession, offset: int, stream: BinaryIO,
+                expected_sha256: Optional[str] = None) -> UploadChunk:
+    """Store the bytes of `stream` as the chunk starting at `offset`.
+
+    The chunk goes straight to blob storage while it is hashed, so memory
+    use does not depend on its size. Sending a chunk again at the same
+    offset replaces it, which makes retries safe; chunks overlapping a
+    different one are rejected. If `expected_sha256` is given and does not
+    match, nothing is kept.
+    """
+    _check_active(session)
+    if offset < 0 or offset >= session.total_size:
+        raise ResumableUploadError(f'offset must be between 0 and {session.total_size - 1}')
+
+    max_chunk = min(_setting('FILE_PARSER_UPLOAD_MAX_CHUNK_SIZE', 64 * 1024 * 1024), session.total_size - offset)
+    digest = hashlib.sha256()
+
+    def chunks() -> Iterator[bytes]:
+        size = 0
+        while True:
+            data = stream.read(COPY_BUFFER_SIZE)
+            if not data:
+                return
+            size += len(data)
+            if size > max_chunk:
+                raise ResumableUploadError(f'Chunk at offset {offset} is larger than {max_chunk} bytes')
+            digest.update(data)
+            yield data
+
+    storage = get_storage()
+    storage_key = f"partial/{session.id}/{offset:020d}-{uuid.uuid4().hex[:8]}"
+    size = storage.save(storage_key, chunks())
+    sha256 = digest.hexdigest()
+    try:
+        if size == 0:
+            raise ResumableUploadError('Chunk is empty')
+        if expected_sha256 and expected_sha256.lower() != sha256:
+            raise ResumableUploadError(f'Checksum mismatch for chunk at offset {offset}')
+
+        with transaction.atomic():
+            # Chunks sent at once are checked and stored one at a time
+            _lock_session(session)
+            overlapping = (
+                UploadChunk.objects
+                .filter(session=session, offset__lt=offset + size)
+                .exclude(offset=offset)
+                .annotate(end=F('offset') + F('size'))
+                .filter(end__gt=offset)
+                .exists()
+            )
+            if overlapping:
+                raise UploadConflict(f'Chunk at offset {offset} overlaps a chunk already received')
+            previous = UploadChunk.objects.filter(session=session, offset=offset).first()
+            chunk, _ = UploadChunk.objects.update_or_create(
+                session=session, offset=offset,
+                defaults={'size': size, 'sha256': sha256, 'storage_key': storage_key},
+            )
+            if previous is not None:
+                previous_key = previous.storage_key
+                transaction.on_commit(lambda: storage.delete(previous_key))
+    except BaseException:
+        storage.delete(storage_key)
+        raise
+
+    _record_progress(session)
+    return chunk
+
+
+def _record_progress(session: UploadSession):
+    """Publish the share of bytes received as the file's `uploading` progress."""
+    received = session.chunks.aggregate(total=Sum('size'))['total'] or 0
+    progress = received * 100 // session.total_size
+    UploadSession.objects.filter(id=session.id).update(received_bytes=received, updated_at=timezone.now())
+    UploadedFile.objects.filter(id=session.file_id).update(progress=progress, updated_at=timezone.now())
+    session.received_bytes = received
+    progress_tracker.set_progress(str(session.file_id), progress, 'uploading')
+
+
+def missing_ranges(session: UploadSession) -> List[Tuple[int, int]]:
+    """Byte ranges [start, end) not received yet, in order."""
+    missing = []
+    position = 0
+    for offset, size in session.chunks.order_by('offset').values_list('offset', 'size'):
+        if offset > position:
+            missing.append((position, offset))
+        position = max(position, offset + size)
+    if position < session.total_size:
+        missing.append((position, session.total_size))
+    return missing
+
+
+def complete_upload(session: UploadSession, expected_sha256: Optional[str] = None) -> UploadedFile:
+    """Join the chunks into the file's content blob and hand the file to the parser.
+
+    The parts are streamed from storage in offset order through the same
+    hashing and deduplication path as regular uploads, then deleted.
+    """
+    _check_active(session)
+    if missing_ranges(session):
+        raise UploadConflict('Upload is incomplete')
+    # Only one completion may join the parts
+    if not UploadSession.objects.filter(id=session.id, status='active').update(status='completing'):
+        raise UploadConflict('Upload is already being completed')
+
+    storage = get_storage()
+    uploaded_file = session.file
+
+    def joined() -> Iterator[bytes]:
+        for storage_key in session.chunks.order_by('offset').values_list('storage_key', flat=True):
+            part = storage.open(storage_key)
+            try:
+                while True:
+                    data = part.read(COPY_BUFFER_SIZE)
+                    if not data:
+                        break
+                    yield data
+            finally:
+                part.close()
+
+    try:
+        fields = stage_upload(uploaded_file.original_filename, joined(), uploaded_file.file_type)
+    except BaseException:
+        UploadSession.objects.filter(id=session.id).update(status='active')
+        raise
+
+    blob = fields['blob']
+    error = None
+    if blob.size != session.total_size:
+        error = f'Received {blob.size} bytes, expected {session.total_size}'
+    elif expected_sha256 and expected_sha256.lower() != blob.sha256:
+        error = 'Checksum mismatch for the complete file'
+    if error:
+        release_blob(blob.id)
+        UploadSession.objects.filter(id=session.id).update(status='active')
+        raise ResumableUploadError(error)
+
+    with transaction.atomic():
+        UploadedFile.objects.filter(id=uploaded_file.id).update(
+            blob=blob,
+            storage_key=blob.storage_key,
+            file_size=blob.size,
+            updated_at=timezone.now(),
+        )
+        UploadSession.objects.filter(id=session.id).update(status='complete', updated_at=timezone.now())
+        # Signals delete the stored parts once this commits
+        session.chunks.all().delete()
+
+    uploaded_file.refresh_from_db()
+    session.status = 'complete'
+    logger.info(f"Resumable upload completed: {uploaded_file.original_filename} ({blob.size} bytes)")
+    return uploaded_file
+
+
+def purge_expired_uploads() -> int:
+    """Delete expired, unfinished uploads; signals remove their stored chunks."""
+    expired = UploadSession.objects.filter(status='active', expires_at__lte=timezone.now())
+    file_ids = list(expired.values_list('file_id', flat=True))
+    for file_id in file_ids:
+        progress_tracker.remove_progress(file_id)
+    UploadedFile.objects.filter(id__in=file_ids).delete()
+    return len(file_ids)
@@ -0,0 +1,205 @@
+import heapq
+import math
+from collections import Counter
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+
+# Priority classes, most urgent first; a job's class is its rank before anything else
+PRIORITIES = {'interactive': 0, 'normal': 1, 'bulk': 2}
+DEFAULT_PRIORITY = 'normal'
+
+# Rough parse throughput per file kind, in bytes per second, from which the
+# expected duration of a job is estimated; only their ratios matter for ranking
+PARSE_BYTES_PER_SECOND = {
+    'csv': 20 * 1024 * 1024,
+    'excel': 2 * 1024 * 1024,
+    'pdf': 512 * 1024,
+}
+DEFAULT_BYTES_PER_SECOND = 5 * 1024 * 1024
+# Fixed cost of any job (claiming, status updates, storing the result)
+JOB_OVERHEAD_SECONDS = 0.05
+
+SCHEDULERS = ('fair', 'fifo')
+
+
+def priority_value(name: str) -> int:
+    """The class number of a priority name; raises ValueError for unknown names."""
+    try:
+        return PRIORITIES[name]
+    except KeyError:
+        raise ValueError(f"Unknown priority: {name}. Expected one of {', '.join(PRIORITIES)}")
+
+
+def expected_seconds(file_size: int, kind: Optional[str]) -> float:
+    """Estimated time to parse a file of this size and kind."""
+    return JOB_OVERHEAD_SECONDS + (file_size or 0) / PARSE_BYTES_PER_SECOND.get(kind, DEFAULT_BYTES_PER_SECOND)
+
+
+class Candidate(NamedTuple):
+    """A job that could be started, as the scheduler sees it.
+
+    `waiting_since` and the `now` passed to the scheduler are seconds on the
+    same clock: epoch seconds in the job queue, simulated seconds in
+    `simulate`.
+    """
+    id: Any
+    priority: int
+    expected_seconds: float
+    client: str
+    waiting_since: float
+
+
+class Scheduler:
+    """Pick which waiting job a free worker starts next.
+
+    Schedulers hold no state and never read the time themselves: `pick` is
+    given the candidates, the number of jobs each client has running and the
+    current time, so the same decisions can be replayed on a simulated clock.
+    """
+
+    def admits(self, candidate: Candidate, running: Dict[str, int]) -> bool:
+        return True
+
+    def rank(self, candidate: Candidate, running: Dict[str, int], now: float) -> tuple:
+        raise NotImplementedError
+
+    def pick(self, candidates: Iterable[Candidate], running: Dict[str, int], now: float) -> Optional[Candidate]:
+        """The candidate to start now, or None if none may start."""
+        eligible = [candidate for candidate in candidates if self.admits(candidate, running)]
+        return min(eligible, key=lambda candidate: self.rank(candidate, running, now), default=None)
+
+
+class FifoScheduler(Scheduler):
+    """First come, first served: the order jobs were queued in."""
+
+    def rank(self, candidate: Candidate, running: Dict[str, int], now: float) -> tuple:
+        return (candidate.waiting_since,)
+
+
+class FairShareScheduler(Scheduler):
+    """Priority classes, then fair share between clients, then shortest expected job first.
+
+    A job moves up one class for every `aging_seconds` it waits, without
+    limit, so a job of class c is never overtaken by a job queued more than
+    (c + 1) * aging_seconds after it, however many shorter or more urgent
+    jobs keep arriving. Within a class, jobs of clients with fewer jobs running go
+    first, and then the job expected to finish soonest. With `client_limit`,
+    a client never has more than that many jobs running; jobs without a
+    client are not limited.
+    """
+
+    def __init__(self, aging_seconds: float = 60.0, client_limit: int = 0):
+        self.aging_seconds = aging_seconds
+        self.client_limit = client_limit
+
+    def effective_class(self, candidate: Candidate, now: float) -> int:
+        waited = max(0.0, now - candidate.waiting_since)
+        return math.floor(candidate.priority - waited / self.aging_seconds)
+
+    def admits(self, candidate: Candidate, running: Dict[str, int]) -> bool:
+        return not self.client_limit or not candidate.client or running.get(candidate.client, 0) < self.client_limit
+
+    def rank(self, candidate: Candidate, running: Dict[str, int], now: float) -> tuple:
+        return (
+            self.effective_class(candidate, now),
+            running.get(candidate.client, 0),
+            candidate.expected_seconds,
+            candidate.waiting_since,
+        )
+
+
+def get_scheduler(name: Optional[str] = None) -> Scheduler:
+    """The scheduler named by `name` (default FILE_PARSER_SCHEDULER) with its settings."""
+    name = name or getattr(settings, 'FILE_PARSER_SCHEDULER', 'fair')
+    if name == 'fifo':
+        return FifoScheduler()
+    if name == 'fair':
+        aging_seconds = getattr(settings, 'FILE_PARSER_SCHEDULER_AGING_SECONDS', 60.0)
+        if aging_seconds <= 0:
+            raise ValueError(f"FILE_PARSER_SCHEDULER_AGING_SECONDS must be positive, got {aging_seconds}")
+        return FairShareScheduler(
+            aging_seconds=aging_seconds,
+            client_limit=getattr(settings, 'FILE_PARSER_CLIENT_MAX_RUNNING', 0),
+        )
+    raise ValueError(f"Unknown scheduler: {name}. Expected one of {', '.join(SCHEDULERS)}")
+
+
+def claim_window(candidates: Iterable[Candidate], window: int) -> List[Candidate]:
+    """The candidates a claim ranks: the `window` longest-waiting overall and of each class.
+
+    This is how `JobQueue.claim` reads waiting jobs. The longest-waiting
+    jobs of a class have aged furthest, so however long the queue, the
+    candidates include the oldest job and the jobs of the best effective
+    class; the scheduler's finer ranking then applies to those read.
+    """
+    candidates = list(candidates)
+    groups = [candidates] + [
+        [candidate for candidate in candidates if candidate.priority == value]
+        for value in sorted({candidate.priority for candidate in candidates})
+    ]
+    picked: Dict[Any, Candidate] = {}
+    for group in groups:
+        for candidate in heapq.nsmallest(window, group, key=lambda candidate: candidate.waiting_since):
+            picked.setdefault(candidate.id, candidate)
+    return list(picked.values())
+
+
+class SimulatedJob(NamedTuple):
+    """A job of a simulated workload: when it arrives and how long it really runs."""
+    id: int
+    client: str
+    priority: int
+    expected_seconds: float
+    duration: float
+    arrival: float
+
+
+def simulate(scheduler: Scheduler, jobs: Iterable[SimulatedJob], workers: int,
+             window: Optional[int] = None) -> Dict[int, Tuple[float, float]]:
+    """Run a workload through a scheduler on a simulated clock.
+
+    Like the job queue, a free worker asks the scheduler for a job whenever
+    one arrives or finishes; jobs run to completion. With `window`, the
+    scheduler ranks only the `claim_window` of the waiting jobs, as a claim
+    does. Returns the start and finish time of every job by id.
+    """
+    arrivals = sorted(jobs, key=lambda job: job.arrival)
+    waiting: Dict[int, SimulatedJob] = {}
+    running: Counter = Counter()
+    finishing: List[Tuple[float, int, str]] = []
+    times: Dict[int, Tuple[float, float]] = {}
+    free = workers
+    next_arrival = 0
+    now = 0.0
+
+    while True:
+        while next_arrival < len(arrivals) and arrivals[next_arrival].arrival <= now:
+            job = arrivals[next_arrival]
+            waiting[job.id] = job
+            next_arrival += 1
+        while finishing and finishing[0][0] <= now:
+            _, _, client = heapq.heappop(finishing)
+            running[client] -= 1
+            free += 1
+
+        while free and waiting:
+            candidates = [Candidate(job.id, job.priority, job.expected_seconds, job.client, job.arrival)
+                          for job in waiting.values()]
+            if window:
+                candidates = claim_window(candidates, window)
+            picked = scheduler.pick(candidates, running, now)
+            if picked is None:
+                break
+            job = waiting.pop(picked.id)
+            times[job.id] = (now, now + job.duration)
+            heapq.heappush(finishing, (now + job.duration, job.id, job.client))
+            running[job.client] += 1
+            free -= 1
+
+        upcoming = [arrivals[next_arrival].arrival] if next_arrival < len(arrivals) else []
+        if finishing:
+            upcoming.append(finishing[0][0])
+        if not upcoming:
+            return times
+        now = min(upcoming)
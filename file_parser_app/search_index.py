@@ -0,0 +1,283 @@
+import logging
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+
+from .models import ParsedContent
+from .table_store import iter_row_batches
+
+logger = logging.getLogger(__name__)
+
+# Markers around matched terms in result snippets
+SNIPPET_START = '<mark>'
+SNIPPET_END = '</mark>'
+SNIPPET_TOKENS = 16
+
+# (text, page, sheet, row): page is set for PDFs, sheet and row for tables
+Entry = Tuple[str, Optional[int], Optional[str], Optional[int]]
+
+
+class SearchQueryError(ValueError):
+    """The search text has no terms to look for."""
+
+
+def match_expression(text: str) -> str:
+    """Turn free text into an FTS5 query: every word must occur, `word*` matches a prefix.
+
+    Words are quoted, so FTS5 operators and punctuation typed by users are
+    searched for as text rather than parsed as query syntax.
+    """
+    terms = []
+    for word in text.split():
+        prefix = word.endswith('*')
+        word = word.rstrip('*')
+        if not re.search(r'\w', word):
+            continue
+        terms.append('"' + word.replace('"', '""') + '"' + ('*' if prefix else ''))
+    if not terms:
+        raise SearchQueryError('Search text must contain at least one word')
+    return ' '.join(terms)
+
+
+def _row_text(values: Iterable[Any]) -> str:
+    return ' '.join(str(value) for value in values if value is not None and value != '')
+
+
+def content_entries(parsed_content: ParsedContent, max_rows: Optional[int] = None) -> Iterator[Entry]:
+    """Text to index for one parse result: a PDF page or a table row per entry.
+
+    Rows are read from the stored tables a batch at a time, or from the
+    content JSON when the file was parsed without tables. At most `max_rows`
+    rows of each table or sheet are indexed.
+    """
+    content = parsed_content.content
+    if parsed_content.content_type == 'pdf':
+        if 'pages' in content:
+            # Parsed before pages were stored as rows
+            pages = ((page['page'], page['content']) for page in content['pages'])
+        else:
+            pages = parsed_content.pages.exclude(content='').values_list('number', 'content').iterator()
+        for number, text in pages:
+            if text:
+                yield text, number, None, None
+        return
+
+    def sheet_entries(sheet: Optional[str], rows: Iterable[Iterable[Any]]) -> Iterator[Entry]:
+        for row, values in enumerate(islice(rows, max_rows)):
+            text = _row_text(values)
+            if text:
+                yield text, None, sheet, row
+
+    tables = list(parsed_content.tables.all())
+    if tables:
+        for table in tables:
+            batches = iter_row_batches(table.paths, table.format, limit=max_rows)
+            rows = (row.values() for batch in batches for row in batch)
+            yield from sheet_entries(table.name or None, rows)
+        return
+
+    if 'sheets' in content:
+        for name, sheet in content['sheets'].items():
+            yield from sheet_entries(name, (row.values() for row in sheet.get('rows', [])))
+    elif content.get('encoding') == 'columns':
+        yield from sheet_entries(None, zip(*content.get('column_values', [])))
+    elif 'rows' in content:
+        yield from sheet_entries(None, (row.values() for row in content['rows']))
+
+
+class SearchIndex:
+    """Full-text index of parsed content in an SQLite FTS5 database.
+
+    Entries are keyed by ParsedContent, which files with identical bytes
+    share, so a file reusing a cached parse result is searchable without
+    being indexed again. The FTS table holds only the text; where each entry
+    came from is kept in `search_entries` under the same rowid, indexed by
+    parse result so one can be removed without scanning the whole index.
+
+    Like the SQLite progress store, the index lives in its own WAL-mode
+    database: long indexing runs never hold the application database's
+    write lock, and readers never wait for them.
+    """
+
+    def __init__(self, path, batch_size: int = 2000):
+        self.path = str(path)
+        self.batch_size = batch_size
+        self._local = threading.local()
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        with self._transaction() as connection:
+            connection.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS search_text USING fts5(text, tokenize = 'unicode61 remove_diacritics 2')"
+            )
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS search_entries ('
+                'id INTEGER PRIMARY KEY, content_id INTEGER NOT NULL, page INTEGER, sheet TEXT, row INTEGER)'
+            )
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS search_entries_content_idx ON search_entries (content_id)'
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    @contextmanager
+    def _transaction(self, mode: str = 'IMMEDIATE'):
+        connection = self._connection()
+        connection.execute(f'BEGIN {mode}')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def add(self, content_id: int, entries: Iterable[Entry], replace: bool = True) -> int:
+        """Replace (or with `replace=False`, extend) the entries of a parse result.
+
+        Entries are inserted `batch_size` at a time, one transaction per
+        batch, so other workers can index between batches. Returns how many
+        were indexed.
+        """
+        if replace:
+            self.remove(content_id)
+        entries = iter(entries)
+        indexed = 0
+        while True:
+            batch = list(islice(entries, self.batch_size))
+            if not batch:
+                return indexed
+            with self._transaction() as connection:
+                first_id = connection.execute('SELECT COALESCE(MAX(id), 0) + 1 FROM search_entries').fetchone()[0]
+                ids = range(first_id, first_id + len(batch))
+                connection.executemany(
+                    'INSERT INTO search_entries (id, content_id, page, sheet, row) VALUES (?, ?, ?, ?, ?)',
+                    ((entry_id, content_id, page, sheet, row) for entry_id, (_, page, sheet, row) in zip(ids, batch))
+                )
+                connection.executemany(
+                    'INSERT INTO search_text (rowid, text) VALUES (?, ?)',
+                    ((entry_id, text) for entry_id, (text, _, _, _) in zip(ids, batch))
+                )
+            indexed += len(batch)
+
+    def remove(self, content_id: int):
+        with self._transaction() as connection:
+            connection.execute(
+                'DELETE FROM search_text WHERE rowid IN (SELECT id FROM search_entries WHERE content_id = ?)',
+                (content_id,)
+            )
+            connection.execute('DELETE FROM search_entries WHERE content_id = ?', (content_id,))
+
+    def search(self, text: str, content_ids: Optional[List[int]] = None,
+               offset: int = 0, limit: int = 20) -> List[Dict[str, Any]]:
+        """Best matches first (BM25), each with a snippet of the matching text."""
+        sql = (
+            'SELECT e.content_id, e.page, e.sheet, e.row, bm25(search_text), '
+            f"snippet(search_text, 0, ?, ?, '…', {SNIPPET_TOKENS}) "
+            'FROM search_text JOIN search_entries e ON e.id = search_text.rowid WHERE search_text MATCH ?'
+        )
+        params: List[Any] = [SNIPPET_START, SNIPPET_END, match_expression(text)]
+        if content_ids is not None:
+            if not content_ids:
+                return []
+            sql += f' AND e.content_id IN ({", ".join("?" * len(content_ids))})'
+            params.extend(content_ids)
+        sql += ' ORDER BY bm25(search_text) LIMIT ? OFFSET ?'
+        params.extend([limit, offset])
+        with self._transaction('DEFERRED') as connection:
+            rows = connection.execute(sql, params).fetchall()
+        return [
+            # bm25() is lower for better matches; report higher-is-better scores
+            {'content_id': content_id, 'page': page, 'sheet': sheet, 'row': row,
+             'score': round(-score, 4), 'snippet': snippet}
+            for content_id, page, sheet, row, score, snippet in rows
+        ]
+
+    def indexed_content_ids(self) -> List[int]:
+        with self._transaction('DEFERRED') as connection:
+            return [row[0] for row in connection.execute('SELECT DISTINCT content_id FROM search_entries')]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def search_enabled() -> bool:
+    return getattr(settings, 'FILE_PARSER_SEARCH_ENABLED', True)
+
+
+def get_search_index() -> SearchIndex:
+    """Return the process-wide search index, creating its database on first use."""
+    global _index
+
+    with _index_lock:
+        if _index is None:
+            path = getattr(settings, 'FILE_PARSER_SEARCH_INDEX_PATH', None) or Path(settings.BASE_DIR) / 'search.sqlite3'
+            _index = SearchIndex(path, batch_size=getattr(settings, 'FILE_PARSER_SEARCH_BATCH_SIZE', 2000))
+        return _index
+
+
+def _discard_if_deleted(content_id: int):
+    """Remove the entries of a parse result deleted while they were being added.
+
+    Deleting a parse result unindexes it once the delete commits, which
+    only removes the batches inserted by then.
+    """
+    try:
+        if not ParsedContent.objects.filter(id=content_id).exists():
+            get_search_index().remove(content_id)
+    except Exception as e:
+        logger.error(f"Error removing parsed content {content_id} from the search index: {str(e)}")
+
+
+def index_parsed_content(parsed_content: ParsedContent) -> int:
+    """Index a parse result. Never raises: a file stays usable if indexing fails."""
+    if not search_enabled():
+        return 0
+    try:
+        max_rows = getattr(settings, 'FILE_PARSER_SEARCH_MAX_ROWS', 1_000_000) or None
+        indexed = get_search_index().add(parsed_content.id, content_entries(parsed_content, max_rows))
+    except Exception as e:
+        logger.error(f"Error indexing parsed content {parsed_content.id}: {str(e)}")
+        indexed = 0
+    _discard_if_deleted(parsed_content.id)
+    return indexed
+
+
+def unindex_parsed_content(content_id: int):
+    if not search_enabled():
+        return
+    try:
+        get_search_index().remove(content_id)
+    except Exception as e:
+        logger.error(f"Error removing parsed content {content_id} from the search index: {str(e)}")
+
+
+def index_appended_rows(content_id: int, part_path: str, table_format: str, first_row: int):
+    """Index rows appended to a parse result's table as the part `part_path`. Never raises."""
+    if not search_enabled():
+        return
+    try:
+        max_rows = getattr(settings, 'FILE_PARSER_SEARCH_MAX_ROWS', 1_000_000) or None
+        if max_rows is not None and first_row >= max_rows:
+            return
+        limit = None if max_rows is None else max_rows - first_row
+        rows = (row.values() for batch in iter_row_batches(part_path, table_format, limit=limit) for row in batch)
+        entries = (
+            (text, None, None, first_row + number)
+            for number, text in enumerate(map(_row_text, rows)) if text
+        )
+        get_search_index().add(content_id, entries, replace=False)
+    except Exception as e:
+        logger.error(f"Error indexing rows appended to parsed content {content_id}: {str(e)}")
+    _discard_if_deleted(content_id)
@@ -1,5 +1,9 @@
 from rest_framework import serializers
 from .models import UploadedFile, ParsedContent
+from .renderers import StreamedRows
+from .table_store import read_rows
+from .dedup import release_blob, stage_upload
+from .tracing import SpanRecorder
 
 
 class UploadedFileSerializer(serializers.ModelSerializer):
@@ -19,15 +23,23 @@ class UploadedFileSerializer(serializers.ModelSerializer):
         ]
     
     def create(self, validated_data):
+        spans = SpanRecorder()
         file_obj = validated_data.pop('file', None)
         if file_obj:
-            validated_data['original_filename'] = file_obj.name
-            validated_data['filename'] = file_obj.name
-            validated_data['file_size'] = file_obj.size
-            validated_data['file_type'] = file_obj.content_type or 'application/octet-stream'
-            validated_data['file_content'] = file_obj.read()
+            # Stream the upload to blob storage chunk by chunk, hashing it on
+            # the way; identical uploads share one stored copy
+            with spans.span('upload_read', bytes=file_obj.size):
+                validated_data.update(stage_upload(file_obj.name, file_obj.chunks(), file_obj.content_type))
         
-        return super().create(validated_data)
+        try:
+            with spans.span('db_write'):
+                instance = super().create(validated_data)
+        except Exception:
+            if validated_data.get('blob'):
+                release_blob(validated_data['blob'].id)
+            raise
+        spans.save(instance.id)
+        return instance
 
 
 
@@ -44,6 +56,67 @@ class FileProgressSerializer(serializers.ModelSerializer):
 
 
 class ParsedContentSerializer(serializers.ModelSerializer):
+    content = serializers.SerializerMethodField()
+    
     class Meta:
         model = ParsedContent
-        fields = ['content', 'content_type', 'row_count', 'created_at']
\ No newline at end of file
+        fields = ['content', 'content_type', 'row_count', 'created_at']
+    
+    def get_content(self, obj):
+        """Return the parsed content, filling in rows from columnar tables.
+        
+        Pass `columns`, `offset` and `limit` in the serializer context to read
+        only part of each table. With `stream_rows` in the context, table rows
+        are left as `StreamedRows` for `renderers.iter_json` to read while the
+        response is sent.
+        """
+        if obj.content_type == 'pdf':
+            return self._pdf_content(obj)
+        
+        tables = list(obj.tables.all())
+        if not tables:
+            return obj.content
+        
+        columns = self.context.get('columns')
+        offset = self.context.get('offset', 0)
+        limit = self.context.get('limit')
+        
+        def rows_of(table):
+            selected = None if columns is None else [c for c in columns if c in table.columns]
+            if self.context.get('stream_rows'):
+                return StreamedRows(table.paths, table.format, selected, offset, limit)
+            return read_rows(table.paths, table.format, selected, offset, limit)
+        
+        content = dict(obj.content)
+        if 'sheets' in content:
+            sheets = {}
+            for table in tables:
+                sheet = dict(content['sheets'].get(table.name, {}))
+                sheet['rows'] = rows_of(table)
+                sheets[table.name] = sheet
+            content['sheets'] = {**content['sheets'], **sheets}
+        else:
+            content['rows'] = rows_of(tables[0])
+        return content
+    
+    def _pdf_content(self, obj):
+        """Rebuild `pages` and `full_text` from ParsedPage rows.
+        
+        `offset` and `limit` in the context select a range of the pages with
+        text; `full_text` then covers only that range.
+        """
+        content = obj.content
+        if 'pages' in content:
+            # Parsed before pages were stored as rows
+            return content
+        
+        offset = self.context.get('offset', 0)
+        limit = self.context.get('limit')
+        pages = obj.pages.exclude(content='').values_list('number', 'content')
+        pages = pages[offset:] if limit is None else pages[offset:offset + limit]
+        text_content = [{'page': number, 'content': text} for number, text in pages]
+        return {
+            **content,
+            'pages': text_content,
+            'full_text': '\n\n'.join([page['content'] for page in text_content])
+        }
\ No newline at end of file
@@ -0,0 +1,70 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, pre_delete
+from django.dispatch import receiver
+
+from .dedup import release_blob
+from .models import ContentBlob, ParsedContent, ParsedTable, UploadChunk, UploadedFile
+from .search_index import unindex_parsed_content
+from .storage import get_storage
+from .table_query import invalidate_query_cache
+from .table_store import delete_table
+from .tracing import delete_profile
+
+
+@receiver(post_delete, sender=ParsedTable)
+def delete_parsed_table(sender, instance, **kwargs):
+    """Remove the on-disk table files once their record's deletion commits."""
+    paths = list(instance.paths)
+
+    def delete_files():
+        for path in paths:
+            delete_table(path)
+
+    transaction.on_commit(delete_files)
+
+
+@receiver(pre_delete, sender=ParsedContent)
+def invalidate_parsed_queries(sender, instance, **kwargs):
+    """Drop cached query results of every file sharing a parse result that is being deleted."""
+    for file_id in instance.files.values_list('id', flat=True):
+        invalidate_query_cache(file_id)
+
+
+@receiver(post_delete, sender=ParsedContent)
+def unindex_parsed_content_entries(sender, instance, **kwargs):
+    """Remove a deleted parse result from the search index once its deletion commits."""
+    content_id = instance.id
+    transaction.on_commit(lambda: unindex_parsed_content(content_id))
+
+
+@receiver(post_delete, sender=ContentBlob)
+def delete_content_blob(sender, instance, **kwargs):
+    """Remove a content blob's bytes from storage once its deletion commits."""
+    storage_key = instance.storage_key
+    transaction.on_commit(lambda: get_storage().delete(storage_key))
+
+
+@receiver(post_delete, sender=UploadChunk)
+def delete_upload_chunk(sender, instance, **kwargs):
+    """Remove a resumable upload's stored part once its deletion commits."""
+    storage_key = instance.storage_key
+    transaction.on_commit(lambda: get_storage().delete(storage_key))
+
+
+@receiver(post_delete, sender=UploadedFile)
+def delete_uploaded_blob(sender, instance, **kwargs):
+    """Release the upload's content blob, or remove unshared bytes of older uploads."""
+    invalidate_query_cache(instance.id)
+    if instance.blob_id:
+        release_blob(instance.blob_id)
+        return
+    if instance.parsed_content_id:
+        ParsedContent.objects.filter(id=instance.parsed_content_id, blob__isnull=True).delete()
+    if instance.storage_key:
+        get_storage().delete(instance.storage_key)
+
+
+@receiver(post_delete, sender=UploadedFile)
+def delete_parse_profile(sender, instance, **kwargs):
+    """Remove the cProfile capture of a deleted file."""
+    delete_profile(instance.id)
@@ -0,0 +1,281 @@
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator, Optional
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+logger = logging.getLogger(__name__)
+
+# S3 multipart uploads require every part but the last to be at least 5MB
+S3_MIN_PART_SIZE = 5 * 1024 * 1024
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+class BlobStorage:
+    """Interface for storing uploaded file bytes outside the database."""
+
+    def save(self, key: str, chunks: Iterable[bytes]) -> int:
+        """Write the chunks to `key` and return the number of bytes stored."""
+        raise NotImplementedError
+
+    def open(self, key: str) -> BinaryIO:
+        """Open a stored blob for binary reading."""
+        raise NotImplementedError
+
+    @contextmanager
+    def local_path(self, key: str) -> Iterator[str]:
+        """Yield a filesystem path holding the blob for the duration of the block."""
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def size(self, key: str) -> int:
+        raise NotImplementedError
+
+
+class LocalFileSystemStorage(BlobStorage):
+    """Store blobs as files under a root directory."""
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def _path(self, key: str) -> Path:
+        path = (self.root / key).resolve()
+        if self.root.resolve() not in path.parents:
+            raise ValueError(f"Invalid storage key: {key}")
+        return path
+
+    def save(self, key: str, chunks: Iterable[bytes]) -> int:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temp file and rename so readers never see a partial blob
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix='.upload-')
+        size = 0
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    size += len(chunk)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return size
+
+    def open(self, key: str) -> BinaryIO:
+        return open(self._path(key), 'rb')
+
+    @contextmanager
+    def local_path(self, key: str) -> Iterator[str]:
+        yield str(self._path(key))
+
+    def delete(self, key: str):
+        path = self._path(key)
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        # Prune directories the key left empty
+        root = self.root.resolve()
+        for parent in path.parents:
+            if parent == root:
+                break
+            try:
+                parent.rmdir()
+            except OSError:
+                break
+
+    def exists(self, key: str) -> bool:
+        return self._path(key).exists()
+
+    def size(self, key: str) -> int:
+        return self._path(key).stat().st_size
+
+
+class S3Storage(BlobStorage):
+    """Store blobs in an S3-compatible bucket.
+
+    Only a small subset of the boto3 S3 client API is used, so any object
+    with the same methods (for example LocalS3Client) can stand in for it.
+    """
+
+    def __init__(self, bucket: str, client=None, prefix: str = '', endpoint_url: Optional[str] = None):
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+        if client is None:
+            try:
+                import boto3
+            except ImportError:
+                raise ImproperlyConfigured('boto3 is required for the S3 storage backend')
+            client = boto3.client('s3', endpoint_url=endpoint_url)
+        self.client = client
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def save(self, key: str, chunks: Iterable[bytes]) -> int:
+        object_key = self._key(key)
+        upload = self.client.create_multipart_upload(Bucket=self.bucket, Key=object_key)
+        upload_id = upload['UploadId']
+        parts = []
+        buffer = bytearray()
+        size = 0
+
+        def flush():
+            part_number = len(parts) + 1
+            response = self.client.upload_part(
+                Bucket=self.bucket, Key=object_key, UploadId=upload_id,
+                PartNumber=part_number, Body=bytes(buffer),
+            )
+            parts.append({'PartNumber': part_number, 'ETag': response['ETag']})
+            buffer.clear()
+
+        try:
+            for chunk in chunks:
+                buffer.extend(chunk)
+                size += len(chunk)
+                if len(buffer) >= S3_MIN_PART_SIZE:
+                    flush()
+            if buffer or not parts:
+                flush()
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket, Key=object_key, UploadId=upload_id,
+                MultipartUpload={'Parts': parts},
+            )
+        except BaseException:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=object_key, UploadId=upload_id)
+            raise
+        return size
+
+    def open(self, key: str) -> BinaryIO:
+        return self.client.get_object(Bucket=self.bucket, Key=self._key(key))['Body']
+
+    @contextmanager
+    def local_path(self, key: str) -> Iterator[str]:
+        # Parsers need random access, so spool the object to a temp file
+        suffix = Path(key).suffix
+        fd, path = tempfile.mkstemp(prefix='blob-', suffix=suffix)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                body = self.open(key)
+                try:
+                    shutil.copyfileobj(body, f, COPY_BUFFER_SIZE)
+                finally:
+                    body.close()
+            yield path
+        finally:
+            os.unlink(path)
+
+    def delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+            return True
+        except Exception:
+            return False
+
+    def size(self, key: str) -> int:
+        return self.client.head_object(Bucket=self.bucket, Key=self._key(key))['ContentLength']
+
+
+class LocalS3Client:
+    """Directory-backed stand-in for the boto3 S3 client methods S3Storage uses.
+
+    Lets the S3 backend run in development and tests without network access.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self._uploads = {}
+        self._lock = threading.Lock()
+
+    def _object_path(self, bucket: str, key: str) -> Path:
+        return self.root / bucket / key
+
+    def create_multipart_upload(self, Bucket, Key):
+        upload_dir = Path(tempfile.mkdtemp(prefix='multipart-'))
+        with self._lock:
+            upload_id = upload_dir.name
+            self._uploads[upload_id] = upload_dir
+        return {'UploadId': upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        (self._uploads[UploadId] / f"{PartNumber:05d}").write_bytes(Body)
+        return {'ETag': f'"{UploadId}-{PartNumber}"'}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        upload_dir = self._uploads.pop(UploadId)
+        path = self._object_path(Bucket, Key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'wb') as out:
+            for part in MultipartUpload['Parts']:
+                with open(upload_dir / f"{part['PartNumber']:05d}", 'rb') as f:
+                    shutil.copyfileobj(f, out, COPY_BUFFER_SIZE)
+        shutil.rmtree(upload_dir)
+        return {}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        upload_dir = self._uploads.pop(UploadId, None)
+        if upload_dir is not None:
+            shutil.rmtree(upload_dir, ignore_errors=True)
+        return {}
+
+    def get_object(self, Bucket, Key):
+        path = self._object_path(Bucket, Key)
+        if not path.exists():
+            raise FileNotFoundError(f"No such key: {Key}")
+        return {'Body': open(path, 'rb'), 'ContentLength': path.stat().st_size}
+
+    def head_object(self, Bucket, Key):
+        path = self._object_path(Bucket, Key)
+        if not path.exists():
+            raise FileNotFoundError(f"No such key: {Key}")
+        return {'ContentLength': path.stat().st_size}
+
+    def delete_object(self, Bucket, Key):
+        try:
+            self._object_path(Bucket, Key).unlink()
+        except FileNotFoundError:
+            pass
+        return {}
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage() -> BlobStorage:
+    """Return the blob storage configured by FILE_PARSER_STORAGE_BACKEND."""
+    global _storage
+
+    with _storage_lock:
+        if _storage is None:
+            backend = getattr(settings, 'FILE_PARSER_STORAGE_BACKEND', 'local')
+            if backend == 'local':
+                root = getattr(settings, 'FILE_PARSER_STORAGE_ROOT', None) or Path(settings.MEDIA_ROOT) / 'uploads'
+                _storage = LocalFileSystemStorage(root)
+            elif backend in ('s3', 'local-s3'):
+                client = None
+                if backend == 'local-s3':
+                    client = LocalS3Client(getattr(settings, 'FILE_PARSER_LOCAL_S3_ROOT', Path(settings.MEDIA_ROOT) / 's3'))
+                _storage = S3Storage(
+                    bucket=getattr(settings, 'FILE_PARSER_S3_BUCKET', 'file-parser'),
+                    client=client,
+                    prefix=getattr(settings, 'FILE_PARSER_S3_PREFIX', ''),
+                    endpoint_url=getattr(settings, 'FILE_PARSER_S3_ENDPOINT_URL', None),
+                )
+            else:
+                raise ImproperlyConfigured(f"Unknown storage backend: {backend}. Expected 'local', 's3' or 'local-s3'")
+        return _storage
@@ -0,0 +1,297 @@
+import hashlib
+import json
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+from django.conf import settings
+from django.core.cache import cache
+
+from .table_store import TablePaths, _to_arrow, read_table, table_files
+
+FILTER_OPERATORS = ('eq', 'ne', 'lt', 'lte', 'gt', 'gte', 'in', 'not_in', 'contains', 'is_null', 'not_null')
+AGGREGATES = ('count', 'sum', 'min', 'max', 'mean')
+SORT_DIRECTIONS = ('asc', 'desc')
+DATASET_FORMATS = {'parquet': 'parquet', 'arrow': 'ipc'}
+
+QueryLoader = Callable[[Optional[List[str]], Optional[ds.Expression]], pa.Table]
+
+
+class QueryError(ValueError):
+    """Raised when a query is malformed or does not fit the table it runs on."""
+
+
+def _max_rows() -> int:
+    return getattr(settings, 'FILE_PARSER_QUERY_MAX_ROWS', 1000)
+
+
+def normalize_query(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate a query request body and return it in canonical form.
+
+    The body looks like::
+
+        {"sheet": "Sheet1",
+         "filters": [{"column": "age", "op": "gte", "value": 18}],
+         "group_by": ["city"],
+         "aggregates": [{"func": "mean", "column": "age"}, {"func": "count"}],
+         "sort": [{"column": "age_mean", "direction": "desc"}],
+         "columns": ["name", "age"], "offset": 0, "limit": 100}
+
+    Every key is optional. `columns` only applies when nothing is
+    aggregated; aggregate output columns are named `<column>_<func>`, or
+    `count` for a row count, unless an `as` alias is given.
+    """
+    if not isinstance(spec, dict):
+        raise QueryError('query must be a JSON object')
+
+    def string_list(key):
+        value = spec.get(key) or []
+        if not isinstance(value, list) or not all(isinstance(v, str) and v for v in value):
+            raise QueryError(f'{key} must be a list of column names')
+        return value
+
+    filters = []
+    for item in spec.get('filters') or []:
+        if not isinstance(item, dict) or not isinstance(item.get('column'), str):
+            raise QueryError('each filter needs a column')
+        op = item.get('op', 'eq')
+        if op not in FILTER_OPERATORS:
+            raise QueryError(f"unknown filter op: {op}. Expected one of {', '.join(FILTER_OPERATORS)}")
+        value = item.get('value')
+        if op in ('in', 'not_in') and not isinstance(value, list):
+            raise QueryError(f'{op} filter needs a list value')
+        if op == 'contains' and not isinstance(value, str):
+            raise QueryError('contains filter needs a string value')
+        filters.append({'column': item['column'], 'op': op, 'value': None if op in ('is_null', 'not_null') else value})
+
+    aggregates = []
+    for item in spec.get('aggregates') or []:
+        if not isinstance(item, dict):
+            raise QueryError('each aggregate must be an object')
+        func = item.get('func')
+        if func not in AGGREGATES:
+            raise QueryError(f"unknown aggregate: {func}. Expected one of {', '.join(AGGREGATES)}")
+        column = item.get('column')
+        if column is None and func != 'count':
+            raise QueryError(f'{func} aggregate needs a column')
+        name = item.get('as') or (f'{column}_{func}' if column else 'count')
+        aggregates.append({'func': func, 'column': column, 'as': name})
+
+    sort = []
+    for item in spec.get('sort') or []:
+        if isinstance(item, str):
+            item = {'column': item}
+        direction = item.get('direction', 'asc') if isinstance(item, dict) else None
+        if direction not in SORT_DIRECTIONS or not isinstance(item.get('column'), str):
+            raise QueryError("each sort needs a column and a direction of 'asc' or 'desc'")
+        sort.append({'column': item['column'], 'direction': direction})
+
+    try:
+        offset = int(spec.get('offset', 0))
+        limit = min(int(spec.get('limit', _max_rows())), _max_rows())
+    except (TypeError, ValueError):
+        raise QueryError('offset and limit must be integers')
+    if offset < 0 or limit < 0:
+        raise QueryError('offset and limit must not be negative')
+
+    group_by = string_list('group_by')
+    if group_by and not aggregates:
+        aggregates.append({'func': 'count', 'column': None, 'as': 'count'})
+
+    sheet = spec.get('sheet')
+    if sheet is not None and not isinstance(sheet, str):
+        raise QueryError('sheet must be a string')
+
+    return {
+        'sheet': sheet,
+        'filters': filters,
+        'group_by': group_by,
+        'aggregates': aggregates,
+        'sort': sort,
+        'columns': string_list('columns') or None,
+        'offset': offset,
+        'limit': limit,
+    }
+
+
+def _filter_expression(filters: List[Dict[str, Any]], schema: pa.Schema) -> Optional[ds.Expression]:
+    expression = None
+    for item in filters:
+        field = ds.field(item['column'])
+        column_type = schema.field(item['column']).type
+        op, value = item['op'], item['value']
+
+        def typed(v):
+            # Compare in the column's type so "5" matches an integer column
+            try:
+                return pc.cast(pa.scalar(v), column_type)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError):
+                raise QueryError(f"value {v!r} does not fit column {item['column']} ({column_type})")
+
+        if op == 'is_null':
+            condition = field.is_null()
+        elif op == 'not_null':
+            condition = field.is_valid()
+        elif op in ('in', 'not_in'):
+            values = pa.array([typed(v).as_py() for v in value], type=column_type)
+            condition = field.isin(values)
+            if op == 'not_in':
+                condition = ~condition
+        elif op == 'contains':
+            if not (pa.types.is_string(column_type) or pa.types.is_large_string(column_type)):
+                raise QueryError(f"contains filter needs a text column, {item['column']} is {column_type}")
+            condition = pc.match_substring(field, value)
+        else:
+            scalar = typed(value)
+            condition = {
+                'eq': field == scalar,
+                'ne': field != scalar,
+                'lt': field < scalar,
+                'lte': field <= scalar,
+                'gt': field > scalar,
+                'gte': field >= scalar,
+            }[op]
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def _aggregate(table: pa.Table, query: Dict[str, Any]) -> pa.Table:
+    if query['group_by']:
+        specs = [
+            ([], 'count_all') if agg['column'] is None else (agg['column'], agg['func'])
+            for agg in query['aggregates']
+        ]
+        result = table.group_by(query['group_by']).aggregate(specs)
+        # pyarrow names outputs "<column>_<func>"; apply the requested names
+        names = [('count_all' if agg['column'] is None else f"{agg['column']}_{agg['func']}")
+                 for agg in query['aggregates']]
+        aliases = dict(zip(names, (agg['as'] for agg in query['aggregates'])))
+        result = result.rename_columns([aliases.get(name, name) for name in result.column_names])
+        return result.select(query['group_by'] + [agg['as'] for agg in query['aggregates']])
+
+    values = {}
+    for agg in query['aggregates']:
+        if agg['column'] is None:
+            value = pa.scalar(table.num_rows, pa.int64())
+        else:
+            column = table.column(agg['column'])
+            value = pc.count(column) if agg['func'] == 'count' else getattr(pc, agg['func'])(column)
+            if agg['func'] in ('min', 'max') and isinstance(value, pa.StructScalar):
+                value = value[agg['func']]
+        values[agg['as']] = pa.array([value.as_py()], type=value.type)
+    return pa.table(values)
+
+
+def _execute(load: QueryLoader, schema: pa.Schema, query: Dict[str, Any]) -> Dict[str, Any]:
+    known = set(schema.names)
+    referenced = (
+        [f['column'] for f in query['filters']] + query['group_by'] +
+        [a['column'] for a in query['aggregates'] if a['column']] +
+        (query['columns'] or [])
+    )
+    unknown = sorted({c for c in referenced if c not in known})
+    if unknown:
+        raise QueryError(f"unknown columns: {', '.join(unknown)}")
+
+    if query['aggregates']:
+        needed = list(dict.fromkeys(query['group_by'] + [a['column'] for a in query['aggregates'] if a['column']]))
+        output = query['group_by'] + [a['as'] for a in query['aggregates']]
+    else:
+        needed = query['columns'] or list(schema.names)
+        output = needed
+    sortable = set(output) if query['aggregates'] else known
+    bad_sort = [s['column'] for s in query['sort'] if s['column'] not in sortable]
+    if bad_sort:
+        raise QueryError(f"cannot sort by: {', '.join(bad_sort)}")
+    if not query['aggregates']:
+        # Sort keys need not be in the projection; load them and drop afterwards
+        needed = list(dict.fromkeys(needed + [s['column'] for s in query['sort']]))
+
+    try:
+        table = load(needed, _filter_expression(query['filters'], schema))
+        if query['aggregates']:
+            table = _aggregate(table, query)
+        if query['sort']:
+            table = table.sort_by([
+                (s['column'], 'ascending' if s['direction'] == 'asc' else 'descending') for s in query['sort']
+            ])
+        total = table.num_rows
+        page = table.select(output).slice(query['offset'], query['limit'])
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError) as e:
+        raise QueryError(str(e))
+
+    return {
+        'columns': output,
+        'rows': page.to_pylist(),
+        'total_rows': total,
+        'offset': query['offset'],
+        'limit': query['limit'],
+    }
+
+
+def query_table(path: TablePaths, table_format: str, query: Dict[str, Any]) -> Dict[str, Any]:
+    """Run a normalized query over a stored table.
+
+    Parquet and Arrow tables are scanned as a dataset, so only the needed
+    columns are read and the filter is pushed down to skip row groups whose
+    statistics rule them out.
+    """
+    if table_format in DATASET_FORMATS:
+        dataset = ds.dataset(table_files(path), format=DATASET_FORMATS[table_format])
+
+        def load(columns, expression):
+            return dataset.to_table(columns=columns, filter=expression)
+
+        return _execute(load, dataset.schema, query)
+
+    table = read_table(path, table_format)
+    return query_arrow(table, query)
+
+
+def query_rows(rows: List[Dict[str, Any]], query: Dict[str, Any]) -> Dict[str, Any]:
+    """Run a normalized query over rows kept inline in the parsed JSON content."""
+    return query_arrow(_to_arrow(pd.DataFrame(rows)), query)
+
+
+def query_arrow(table: pa.Table, query: Dict[str, Any]) -> Dict[str, Any]:
+    """Run a normalized query over an in-memory Arrow table."""
+    def load(columns, expression):
+        selected = table if expression is None else table.filter(expression)
+        return selected.select(columns)
+
+    return _execute(load, table.schema, query)
+
+
+def _version_key(file_id) -> str:
+    return f'file_parser:query_version:{file_id}'
+
+
+def cached_query(file_id, source: str, query: Dict[str, Any], run: Callable[[], Dict[str, Any]]):
+    """Return `(result, hit)` for a query on a file, running it on a cache miss.
+
+    Entries are keyed by the file, `source` (what identifies the rows
+    queried: the stored table and its row count, or the parse result they
+    are inline in) and a hash of the normalized query. A re-parse or append
+    therefore misses even in a process whose cache was never told about it,
+    as with the default per-process cache. A per-file version token also
+    lets invalidate_query_cache drop a file's entries at once where the
+    cache is shared.
+    """
+    version = cache.get_or_set(_version_key(file_id), lambda: uuid.uuid4().hex, None)
+    digest = hashlib.sha256(json.dumps(query, sort_keys=True, default=str).encode()).hexdigest()
+    key = f'file_parser:query:{file_id}:{source}:{version}:{digest}'
+
+    result = cache.get(key)
+    if result is not None:
+        return result, True
+    result = run()
+    cache.set(key, result, getattr(settings, 'FILE_PARSER_QUERY_CACHE_SECONDS', 300))
+    return result, False
+
+
+def invalidate_query_cache(file_id):
+    """Forget all cached query results for a file."""
+    cache.delete(_version_key(file_id))
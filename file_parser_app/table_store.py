@@ -0,0 +1,495 @@
+import json
+import logging
+import os
+import uuid
+from contextlib import ExitStack
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+from django.conf import settings
+
+from .columnar import finite_floats
+
+logger = logging.getLogger(__name__)
+
+TABLE_FORMATS = ('parquet', 'arrow', 'jsonl')
+# Rows per Parquet row group / Arrow record batch: the unit a page read loads
+TABLE_BATCH_ROWS = 10_000
+TABLE_SUFFIXES = {'parquet': '.parquet', 'arrow': '.arrow', 'jsonl': '.jsonl'}
+
+# A stored table is one file, or its first file followed by parts appended
+# later (see `write_table_part`); readers take either form.
+TablePaths = Union[str, Sequence[str]]
+
+
+def table_files(path: TablePaths) -> List[str]:
+    return [path] if isinstance(path, str) else list(path)
+
+
+def table_root() -> Path:
+    """Directory holding parsed row tables."""
+    root = getattr(settings, 'FILE_PARSER_TABLE_ROOT', None) or Path(settings.MEDIA_ROOT) / 'parsed'
+    return Path(root)
+
+
+def default_table_format() -> Optional[str]:
+    """Configured format for parsed tables, or None to keep rows inline in the JSON content."""
+    table_format = getattr(settings, 'FILE_PARSER_TABLE_FORMAT', 'parquet')
+    if table_format == 'inline':
+        return None
+    if table_format not in TABLE_FORMATS:
+        raise ValueError(f"Unknown table format: {table_format}. Expected 'inline' or one of {', '.join(TABLE_FORMATS)}")
+    return table_format
+
+
+def new_table_dir() -> str:
+    """Allocate a fresh directory for the tables of one parsed file."""
+    path = table_root() / uuid.uuid4().hex
+    path.mkdir(parents=True, exist_ok=True)
+    return str(path)
+
+
+def table_path_in(table_dir: str, index: int, table_format: str) -> str:
+    return os.path.join(table_dir, f"{index}{TABLE_SUFFIXES[table_format]}")
+
+
+def column_kind(series: pd.Series) -> Optional[str]:
+    """Classify a pandas column, or None if it holds only nulls."""
+    if series.isna().all():
+        return None
+    if pd.api.types.is_bool_dtype(series):
+        return 'boolean'
+    if pd.api.types.is_integer_dtype(series):
+        return 'integer'
+    if pd.api.types.is_float_dtype(series):
+        return 'float'
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return 'datetime'
+    return 'string'
+
+
+def merge_kind(current: Optional[str], new: Optional[str]) -> Optional[str]:
+    """Combine the kinds of one column seen in two batches."""
+    if current is None:
+        return new
+    if new is None or current == new:
+        return current
+    if {current, new} == {'integer', 'float'}:
+        return 'float'
+    return 'string'
+
+
+def _promote_type(current: pa.DataType, new: pa.DataType) -> pa.DataType:
+    """Smallest type both column types can be cast to."""
+    if current == new or pa.types.is_null(new):
+        return current
+    if pa.types.is_null(current):
+        return new
+    numeric = (pa.types.is_integer, pa.types.is_floating)
+    if any(check(current) for check in numeric) and any(check(new) for check in numeric):
+        return pa.float64()
+    return pa.string()
+
+
+def _to_arrow(df: pd.DataFrame) -> pa.Table:
+    # Object columns can mix Python types (e.g. numbers and text in one Excel
+    # column); store those as text rather than failing the conversion.
+    for column in df.columns:
+        if df[column].dtype == object:
+            mask = df[column].isna()
+            df[column] = df[column].astype(str).where(~mask, None)
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+class _ArrowTableWriter:
+    """Shared logic for writers with a fixed schema per file.
+
+    The schema comes from the first batch. When a later batch needs a wider
+    type for some column (int -> float, or anything -> string), the rows
+    written so far are rewritten batch by batch with the promoted schema, so
+    memory stays bounded by one batch.
+    """
+
+    format = None
+
+    def __init__(self, path: str):
+        self.path = path
+        self.rows_written = 0
+        self.schema: Optional[pa.Schema] = None
+        self._writer = None
+        self._writing_path = path
+        self._kinds: Dict[str, Optional[str]] = {}
+
+    def _open_writer(self, path: str, schema: pa.Schema):
+        raise NotImplementedError
+
+    def _write(self, table: pa.Table):
+        raise NotImplementedError
+
+    def _iter_written_batches(self, path: str) -> Iterator[pa.Table]:
+        raise NotImplementedError
+
+    def write_batch(self, df: pd.DataFrame):
+        # An empty first batch still fixes the column names, so a table with
+        # headers but no rows is written with its (null-typed) columns.
+        if df.empty and (self.schema is not None or len(df.columns) == 0):
+            return
+        for column in df.columns:
+            self._kinds[str(column)] = merge_kind(self._kinds.get(str(column)), column_kind(df[column]))
+        table = _to_arrow(df).replace_schema_metadata(None)
+
+        if self.schema is None:
+            self.schema = table.schema
+            self._writer = self._open_writer(self._writing_path, self.schema)
+        elif not table.schema.equals(self.schema):
+            promoted = pa.schema([
+                pa.field(field.name, _promote_type(field.type, table.schema.field(field.name).type))
+                for field in self.schema
+            ])
+            if not promoted.equals(self.schema):
+                self._rewrite(promoted)
+            table = table.select(self.schema.names).cast(self.schema)
+
+        self._write(table)
+        self.rows_written += table.num_rows
+
+    def _rewrite(self, schema: pa.Schema):
+        self._writer.close()
+        old_path = self._writing_path
+        self._writing_path = f"{self.path}.{uuid.uuid4().hex[:8]}.tmp"
+        self._writer = self._open_writer(self._writing_path, schema)
+        for batch in self._iter_written_batches(old_path):
+            self._write(batch.cast(schema))
+        os.unlink(old_path)
+        self.schema = schema
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._writing_path != self.path:
+            os.replace(self._writing_path, self.path)
+            self._writing_path = self.path
+
+    def abort(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        delete_table(self._writing_path)
+        delete_table(self.path)
+
+    def describe(self) -> List[Dict[str, str]]:
+        """Schema as stored in the DB: column names with their kinds and Arrow types."""
+        if self.schema is None:
+            return []
+        return [
+            {'name': field.name, 'kind': self._kinds.get(field.name) or 'string', 'type': str(field.type)}
+            for field in self.schema
+        ]
+
+
+class ParquetTableWriter(_ArrowTableWriter):
+    """Write row batches to a Parquet file in row groups of TABLE_BATCH_ROWS."""
+
+    format = 'parquet'
+
+    def _open_writer(self, path: str, schema: pa.Schema):
+        return pq.ParquetWriter(path, schema, compression='zstd')
+
+    def _write(self, table: pa.Table):
+        self._writer.write_table(table, row_group_size=TABLE_BATCH_ROWS)
+
+    def _iter_written_batches(self, path: str) -> Iterator[pa.Table]:
+        parquet_file = pq.ParquetFile(path)
+        for index in range(parquet_file.num_row_groups):
+            yield parquet_file.read_row_group(index)
+
+
+class ArrowTableWriter(_ArrowTableWriter):
+    """Write row batches to an Arrow IPC file in record batches of TABLE_BATCH_ROWS."""
+
+    format = 'arrow'
+
+    def _open_writer(self, path: str, schema: pa.Schema):
+        return ipc.new_file(path, schema)
+
+    def _write(self, table: pa.Table):
+        self._writer.write_table(table, max_chunksize=TABLE_BATCH_ROWS)
+
+    def _iter_written_batches(self, path: str) -> Iterator[pa.Table]:
+        with pa.memory_map(path) as source:
+            reader = ipc.open_file(source)
+            for index in range(reader.num_record_batches):
+                yield pa.Table.from_batches([reader.get_batch(index)])
+
+
+class JsonLinesTableWriter:
+    """Append row batches to a JSON Lines file, one object per row."""
+
+    format = 'jsonl'
+
+    def __init__(self, path: str):
+        self.path = path
+        self.rows_written = 0
+        self._file = open(path, 'w', encoding='utf-8')
+        self._kinds: Dict[str, Optional[str]] = {}
+
+    def write_batch(self, df: pd.DataFrame):
+        if df.empty:
+            return
+        for column in df.columns:
+            self._kinds[str(column)] = merge_kind(self._kinds.get(str(column)), column_kind(df[column]))
+        # to_json is vectorized and writes NaN as null
+        lines = df.to_json(orient='records', lines=True, date_format='iso')
+        self._file.write(lines if lines.endswith('\n') else lines + '\n')
+        self.rows_written += len(df)
+
+    def close(self):
+        self._file.close()
+
+    def abort(self):
+        self._file.close()
+        delete_table(self.path)
+
+    def describe(self) -> List[Dict[str, str]]:
+        return [{'name': name, 'kind': kind or 'string', 'type': kind or 'string'} for name, kind in self._kinds.items()]
+
+
+WRITERS = {
+    'parquet': ParquetTableWriter,
+    'arrow': ArrowTableWriter,
+    'jsonl': JsonLinesTableWriter,
+}
+
+
+def open_table_writer(path: str, table_format: str):
+    return WRITERS[table_format](path)
+
+
+def write_table_part(base_path: str, table_format: str, part_path: str,
+                     frames: Iterable[pd.DataFrame]) -> int:
+    """Write rows appended to a stored table to a new part file; return how many.
+
+    Parquet and Arrow parts are written with the schema of the table's first
+    file, so all parts read as one table. Raises ValueError when rows do not
+    fit that schema (a column needs a wider type, or the columns differ);
+    the table then has to be written again as a whole. No file is left
+    behind when nothing was written.
+    """
+    if table_format == 'jsonl':
+        writer = JsonLinesTableWriter(part_path)
+        try:
+            for frame in frames:
+                writer.write_batch(frame)
+            writer.close()
+        except BaseException:
+            writer.abort()
+            raise
+        if not writer.rows_written:
+            delete_table(part_path)
+        return writer.rows_written
+
+    if table_format == 'parquet':
+        schema = pq.read_schema(base_path).remove_metadata()
+        open_writer = lambda: pq.ParquetWriter(part_path, schema, compression='zstd')
+        write = lambda writer, table: writer.write_table(table, row_group_size=TABLE_BATCH_ROWS)
+    elif table_format == 'arrow':
+        with pa.memory_map(base_path) as source:
+            schema = ipc.open_file(source).schema.remove_metadata()
+        open_writer = lambda: ipc.new_file(part_path, schema)
+        write = lambda writer, table: writer.write_table(table, max_chunksize=TABLE_BATCH_ROWS)
+    else:
+        raise ValueError(f"Unknown table format: {table_format}")
+
+    writer = None
+    rows = 0
+    try:
+        for frame in frames:
+            if list(frame.columns) != schema.names:
+                raise ValueError('Appended rows do not have the columns of the table')
+            try:
+                table = _to_arrow(frame).replace_schema_metadata(None).cast(schema, safe=True)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError) as e:
+                raise ValueError(f'Appended rows do not fit the table schema: {str(e)}')
+            if writer is None:
+                writer = open_writer()
+            write(writer, table)
+            rows += table.num_rows
+        if writer is not None:
+            writer.close()
+    except BaseException:
+        if writer is not None:
+            writer.close()
+        delete_table(part_path)
+        raise
+    return rows
+
+
+def _iter_jsonl(path: TablePaths) -> Iterator[Dict[str, Any]]:
+    for file_path in table_files(path):
+        with open(file_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def _arrow_row_range(batch_sizes: List[int], offset: int, limit: Optional[int]):
+    """Indices of the batches covering [offset, offset + limit) and the offset into the first."""
+    end = None if limit is None else offset + limit
+    selected = []
+    start = 0
+    skip = 0
+    for index, size in enumerate(batch_sizes):
+        if start + size > offset and (end is None or start < end):
+            if not selected:
+                skip = offset - start
+            selected.append(index)
+        start += size
+    return selected, skip
+
+
+def read_table(path: TablePaths, table_format: str, columns: Optional[List[str]] = None,
+               offset: int = 0, limit: Optional[int] = None) -> pa.Table:
+    """Read a slice of a stored table, touching only the batches and columns needed."""
+    if table_format == 'parquet':
+        parquet_files = [pq.ParquetFile(file_path) for file_path in table_files(path)]
+        groups = [(f, i) for f in parquet_files for i in range(f.num_row_groups)]
+        sizes = [f.metadata.row_group(i).num_rows for f, i in groups]
+        selected, skip = _arrow_row_range(sizes, offset, limit)
+        if not selected:
+            schema = parquet_files[0].schema_arrow
+            return schema.empty_table().select(columns or schema.names)
+        table = pa.concat_tables([groups[g][0].read_row_group(groups[g][1], columns=columns) for g in selected])
+    elif table_format == 'arrow':
+        with ExitStack() as stack:
+            readers = [ipc.open_file(stack.enter_context(pa.memory_map(file_path))) for file_path in table_files(path)]
+            batches = [(reader, i) for reader in readers for i in range(reader.num_record_batches)]
+            sizes = [reader.get_batch(i).num_rows for reader, i in batches]
+            indices, skip = _arrow_row_range(sizes, offset, limit)
+            selected = [batches[b][0].get_batch(batches[b][1]) for b in indices]
+            if columns is not None:
+                selected = [batch.select(columns) for batch in selected]
+            schema = readers[0].schema
+            if columns is not None:
+                schema = pa.schema([schema.field(c) for c in columns])
+            table = pa.Table.from_batches(selected, schema=schema)
+    elif table_format == 'jsonl':
+        df = pd.DataFrame(_read_jsonl_rows(path, columns, offset, limit), columns=columns)
+        return _to_arrow(df)
+    else:
+        raise ValueError(f"Unknown table format: {table_format}")
+
+    return table.slice(skip, limit)
+
+
+def _read_jsonl_rows(path: TablePaths, columns: Optional[List[str]], offset: int,
+                     limit: Optional[int]) -> List[Dict[str, Any]]:
+    rows = islice(_iter_jsonl(path), offset, None if limit is None else offset + limit)
+    if columns is None:
+        return list(rows)
+    return [{column: row.get(column) for column in columns} for row in rows]
+
+
+def read_rows(path: TablePaths, table_format: str, columns: Optional[List[str]] = None,
+              offset: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Read a slice of a stored table as a list of row dicts."""
+    if table_format == 'jsonl':
+        # JSON Lines rows may mix value types within a column; skip Arrow
+        return _read_jsonl_rows(path, columns, offset, limit)
+    return finite_floats(read_table(path, table_format, columns, offset, limit)).to_pylist()
+
+
+def rows_table(rows: List[Dict[str, Any]], columns: List[str]) -> Tuple[pa.Table, List[Dict[str, str]]]:
+    """Arrow table of in-memory row dicts, with the kind of each column.
+
+    Returns `(table, schema)` where `schema` lists a name and kind per
+    column, like `ParsedTable.schema`.
+    """
+    df = pd.DataFrame(rows, columns=columns)
+    schema = [{'name': column, 'kind': column_kind(df[column]) or 'string'} for column in columns]
+    return _to_arrow(df), schema
+
+
+def iter_row_batches(path: TablePaths, table_format: str, columns: Optional[List[str]] = None,
+                     offset: int = 0, limit: Optional[int] = None) -> Iterator[List[Dict[str, Any]]]:
+    """Yield a slice of a stored table as lists of row dicts, one stored batch at a time.
+
+    Unlike `read_rows`, only one Parquet row group, Arrow record batch or
+    TABLE_BATCH_ROWS lines of JSON are held in memory at once.
+    """
+    if table_format == 'jsonl':
+        rows = islice(_iter_jsonl(path), offset, None if limit is None else offset + limit)
+        while True:
+            batch = list(islice(rows, TABLE_BATCH_ROWS))
+            if not batch:
+                return
+            if columns is not None:
+                batch = [{column: row.get(column) for column in columns} for row in batch]
+            yield batch
+
+    sources = []
+    if table_format == 'parquet':
+        groups = [(f, i) for f in map(pq.ParquetFile, table_files(path)) for i in range(f.num_row_groups)]
+        sizes = [f.metadata.row_group(i).num_rows for f, i in groups]
+
+        def load(index):
+            parquet_file, group = groups[index]
+            return parquet_file.read_row_group(group, columns=columns)
+    elif table_format == 'arrow':
+        sources = [pa.memory_map(file_path) for file_path in table_files(path)]
+        batches = [(reader, i) for reader in map(ipc.open_file, sources) for i in range(reader.num_record_batches)]
+        sizes = [reader.get_batch(i).num_rows for reader, i in batches]
+
+        def load(index):
+            reader, number = batches[index]
+            batch = reader.get_batch(number)
+            return pa.Table.from_batches([batch if columns is None else batch.select(columns)])
+    else:
+        raise ValueError(f"Unknown table format: {table_format}")
+
+    indices, skip = _arrow_row_range(sizes, offset, limit)
+    remaining = limit
+    try:
+        for index in indices:
+            table = load(index).slice(skip, remaining)
+            skip = 0
+            if remaining is not None:
+                remaining -= table.num_rows
+            yield finite_floats(table).to_pylist()
+    finally:
+        for source in sources:
+            source.close()
+
+
+def table_columns(path: TablePaths, table_format: str) -> List[str]:
+    """Column names of a stored table without reading any rows."""
+    path = table_files(path)[0]
+    if table_format == 'parquet':
+        return pq.ParquetFile(path).schema_arrow.names
+    if table_format == 'arrow':
+        with pa.memory_map(path) as source:
+            return ipc.open_file(source).schema.names
+    first = next(_iter_jsonl(path), {})
+    return list(first.keys())
+
+
+def delete_table(path: Optional[str]):
+    """Remove a table file, and its directory once empty."""
+    if not path:
+        return
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.error(f"Error deleting parsed table {path}: {str(e)}")
+        return
+    try:
+        os.rmdir(os.path.dirname(path))
+    except OSError:
+        pass
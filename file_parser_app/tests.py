@@ -0,0 +1,457 @@
+import tempfile
+import uuid
+from pathlib import Path
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from .dedup import release_blob, store_upload
+from .models import ContentBlob
+from .progress_tracker import (
+    LocalRedisClient,
+    ProgressTracker,
+    RedisProgressTracker,
+    SQLiteProgressTracker,
+    WatchError,
+    create_progress_tracker,
+)
+from .scheduling import (
+    PRIORITIES,
+    Candidate,
+    FairShareScheduler,
+    FifoScheduler,
+    SimulatedJob,
+    claim_window,
+    get_scheduler,
+    simulate,
+)
+from .storage import LocalS3Client, S3Storage
+
+
+def _overlapping(intervals):
+    """Largest number of (start, finish) intervals running at one time."""
+    events = sorted([(start, 1) for start, _ in intervals] + [(finish, -1) for _, finish in intervals])
+    most = current = 0
+    for _, change in events:
+        current += change
+        most = max(most, current)
+    return most
+
+
+class SchedulerTests(SimpleTestCase):
+    """Scheduling decisions, replayed on the simulated clock of `simulate`."""
+
+    def _flood(self, aging_seconds):
+        # One bulk job queued behind a stream of interactive jobs that would
+        # keep a single worker busy for 100 seconds
+        jobs = [SimulatedJob(0, 'bulk', PRIORITIES['bulk'], 1.0, 1.0, 0.0)]
+        jobs += [
+            SimulatedJob(i, 'interactive', PRIORITIES['interactive'], 0.5, 1.0, (i - 1) * 0.5)
+            for i in range(1, 201)
+        ]
+        return simulate(FairShareScheduler(aging_seconds=aging_seconds), jobs, workers=1)
+
+    def test_aging_bounds_starvation(self):
+        aging_seconds = 10.0
+        times = self._flood(aging_seconds)
+        bulk_start = times[0][0]
+        # No job queued more than (c + 1) * aging_seconds after a class c job overtakes it
+        horizon = (PRIORITIES['bulk'] + 1) * aging_seconds
+        later = [job_id for job_id in times if job_id and (job_id - 1) * 0.5 > horizon]
+        self.assertTrue(later)
+        for job_id in later:
+            self.assertGreater(times[job_id][0], bulk_start)
+
+    def test_without_aging_bulk_waits_for_the_flood(self):
+        times = self._flood(aging_seconds=1e9)
+        last_interactive_finish = max(finish for job_id, (_, finish) in times.items() if job_id)
+        self.assertEqual(times[0][0], last_interactive_finish)
+
+    def test_higher_class_runs_first(self):
+        candidates = [
+            Candidate('bulk', PRIORITIES['bulk'], 0.1, 'a', 0.0),
+            Candidate('normal', PRIORITIES['normal'], 5.0, 'a', 1.0),
+        ]
+        self.assertEqual(FairShareScheduler().pick(candidates, {}, now=2.0).id, 'normal')
+        self.assertEqual(FifoScheduler().pick(candidates, {}, now=2.0).id, 'bulk')
+
+    def test_client_limit_in_admits(self):
+        scheduler = FairShareScheduler(client_limit=2)
+        busy = Candidate(1, PRIORITIES['normal'], 1.0, 'busy', 0.0)
+        idle = Candidate(2, PRIORITIES['normal'], 1.0, 'idle', 0.0)
+        anonymous = Candidate(3, PRIORITIES['normal'], 1.0, '', 0.0)
+        running = {'busy': 2, '': 5}
+
+        self.assertFalse(scheduler.admits(busy, running))
+        self.assertTrue(scheduler.admits(idle, running))
+        self.assertTrue(scheduler.admits(anonymous, running))
+        self.assertTrue(scheduler.admits(busy, {'busy': 1}))
+        self.assertTrue(FairShareScheduler().admits(busy, running))
+        self.assertIsNone(scheduler.pick([busy], running, now=0.0))
+
+    def test_client_limit_in_simulation(self):
+        jobs = [SimulatedJob(i, 'a', PRIORITIES['normal'], 1.0, 1.0, 0.0) for i in range(6)]
+        jobs += [SimulatedJob(10 + i, 'b', PRIORITIES['normal'], 1.0, 1.0, 0.0) for i in range(2)]
+        times = simulate(FairShareScheduler(client_limit=1), jobs, workers=4)
+
+        self.assertEqual(len(times), len(jobs))
+        for client, ids in (('a', range(6)), ('b', range(10, 12))):
+            self.assertEqual(_overlapping([times[i] for i in ids]), 1, client)
+
+    def test_claim_window_includes_oldest(self):
+        candidates = [Candidate(i, PRIORITIES['interactive'], 1.0, 'a', 100.0 + i) for i in range(50)]
+        candidates += [Candidate(100 + i, PRIORITIES['bulk'], 1.0, 'b', 10.0 + i) for i in range(50)]
+        candidates.append(Candidate('oldest', PRIORITIES['normal'], 1.0, 'c', 0.0))
+
+        for window in (1, 3, 200):
+            ids = {candidate.id for candidate in claim_window(candidates, window)}
+            self.assertIn('oldest', ids)
+            # ...and the longest-waiting job of every class
+            self.assertTrue({0, 100} <= ids)
+        self.assertEqual(len(claim_window(candidates, 200)), len(candidates))
+
+    def test_claim_window_picks_oldest_when_aged(self):
+        candidates = [Candidate(i, PRIORITIES['interactive'], 0.1, 'a', 1000.0 + i) for i in range(20)]
+        candidates.append(Candidate('aged', PRIORITIES['bulk'], 10.0, 'b', 0.0))
+        window = claim_window(candidates, 5)
+        self.assertEqual(FairShareScheduler(aging_seconds=60.0).pick(window, {}, now=1010.0).id, 'aged')
+
+    def test_get_scheduler(self):
+        with override_settings(FILE_PARSER_SCHEDULER_AGING_SECONDS=30.0, FILE_PARSER_CLIENT_MAX_RUNNING=2):
+            scheduler = get_scheduler('fair')
+        self.assertIsInstance(scheduler, FairShareScheduler)
+        self.assertEqual((scheduler.aging_seconds, scheduler.client_limit), (30.0, 2))
+        self.assertIsInstance(get_scheduler('fifo'), FifoScheduler)
+        with self.assertRaises(ValueError):
+            get_scheduler('lottery')
+
+    def test_get_scheduler_rejects_non_positive_aging(self):
+        for aging_seconds in (0, -5.0):
+            with override_settings(FILE_PARSER_SCHEDULER_AGING_SECONDS=aging_seconds):
+                with self.assertRaises(ValueError):
+                    get_scheduler('fair')
+
+
+class ProgressTrackerTests:
+    """Behaviour every progress backend shares; mixed into one TestCase per backend."""
+
+    # Whether two trackers made by `make_tracker` see each other's entries
+    shared = True
+
+    def make_tracker(self) -> ProgressTracker:
+        raise NotImplementedError
+
+    def setUp(self):
+        self.tracker = self.make_tracker()
+
+    def test_set_progress(self):
+        self.tracker.set_progress('a', 40, 'processing')
+        self.assertEqual(self.tracker.get_progress('a'), {'progress': 40, 'status': 'processing', 'version': 1})
+        self.tracker.set_progress('a', 150)
+        self.assertEqual(self.tracker.get_progress('a')['progress'], 100)
+        self.assertEqual(self.tracker.get_progress('a')['status'], 'processing')
+        self.tracker.set_progress('b', -5)
+        self.assertEqual(self.tracker.get_progress('b')['progress'], 0)
+        self.assertIsNone(self.tracker.get_progress('missing'))
+
+    def test_unchanged_values_keep_the_sequence(self):
+        self.tracker.set_progress('a', 40, 'processing')
+        sequence = self.tracker.sequence
+        self.tracker.set_progress('a', 40, 'processing')
+        self.tracker.set_status('a', 'processing')
+        self.assertEqual(self.tracker.sequence, sequence)
+        self.tracker.set_status('a', 'ready')
+        self.assertEqual(self.tracker.sequence, sequence + 1)
+
+    def test_uuid_and_string_ids_match(self):
+        file_id = uuid.uuid4()
+        self.tracker.set_progress(file_id, 10)
+        self.assertEqual(self.tracker.get_progress(str(file_id))['progress'], 10)
+
+    def test_changes_since(self):
+        self.tracker.set_progress('a', 10)
+        self.tracker.set_progress('b', 10)
+        changes, since = self.tracker.changes_since(['a', 'b', 'c'], 0)
+        self.assertEqual(set(changes), {'a', 'b'})
+        self.assertEqual(since, 2)
+
+        self.tracker.set_progress('b', 20)
+        self.tracker.set_progress('c', 30)
+        changes, sequence = self.tracker.changes_since(['a', 'b'], since)
+        self.assertEqual(list(changes), ['b'])
+        self.assertEqual(changes['b']['progress'], 20)
+        self.assertEqual(sequence, 4)
+        self.assertEqual(self.tracker.changes_since(['a', 'b', 'c'], sequence), ({}, sequence))
+
+    def test_remove_progress(self):
+        self.tracker.set_progress('a', 10)
+        self.tracker.remove_progress('a')
+        self.assertIsNone(self.tracker.get_progress('a'))
+        self.assertEqual(self.tracker.sequence, 2)
+        self.tracker.remove_progress('a')
+        self.assertEqual(self.tracker.sequence, 2)
+
+    def test_tracked(self):
+        self.tracker.set_progress('a', 10)
+        self.tracker.set_status('b', 'queued')
+        self.assertEqual(self.tracker.tracked(['a', 'b', 'c']), {'a', 'b'})
+        self.assertEqual(self.tracker.tracked([]), set())
+
+    def test_wait_for_changes_times_out(self):
+        self.tracker.set_progress('a', 10)
+        self.assertEqual(self.tracker.wait_for_changes(['a'], self.tracker.sequence, timeout=0.01), ({}, 1))
+
+    def test_trackers_share_entries(self):
+        if not self.shared:
+            self.skipTest('entries are local to one tracker')
+        other = self.make_tracker()
+        other.set_progress('a', 60, 'processing')
+        self.assertEqual(self.tracker.get_progress('a')['progress'], 60)
+        changes, sequence = self.tracker.wait_for_changes(['a'], 0, timeout=1)
+        self.assertEqual(set(changes), {'a'})
+        self.tracker.set_progress('a', 70)
+        self.assertEqual(other.changes_since(['a'], sequence)[0]['a']['progress'], 70)
+
+
+class MemoryProgressTrackerTests(ProgressTrackerTests, SimpleTestCase):
+    shared = False
+
+    def make_tracker(self):
+        return ProgressTracker()
+
+
+class SQLiteProgressTrackerTests(ProgressTrackerTests, SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / 'progress.sqlite3'
+        super().setUp()
+
+    def make_tracker(self):
+        return SQLiteProgressTracker(self.path, poll_interval=0.01)
+
+
+class _RacingRedisClient(LocalRedisClient):
+    """LocalRedisClient that runs `race` once, just before a transaction executes."""
+
+    def __init__(self):
+        super().__init__()
+        self.race = None
+        self.conflicts = 0
+
+    def pipeline(self, transaction: bool = True):
+        pipe = super().pipeline(transaction)
+        execute = pipe.execute
+
+        def racing_execute():
+            if self.race is not None and pipe._watched:
+                race, self.race = self.race, None
+                race()
+            try:
+                return execute()
+            except WatchError:
+                self.conflicts += 1
+                raise
+        pipe.execute = racing_execute
+        return pipe
+
+
+class RedisProgressTrackerTests(ProgressTrackerTests, SimpleTestCase):
+
+    def setUp(self):
+        self.client = _RacingRedisClient()
+        super().setUp()
+
+    def make_tracker(self):
+        return RedisProgressTracker(self.client, poll_interval=0.01)
+
+    def test_store_retries_after_a_concurrent_write(self):
+        other = self.make_tracker()
+        self.client.race = lambda: other.set_progress('b', 20)
+        self.tracker.set_progress('a', 10)
+
+        self.assertEqual(self.client.conflicts, 1)
+        self.assertEqual(self.tracker.sequence, 2)
+        self.assertEqual(self.tracker.get_progress('b')['version'], 1)
+        self.assertEqual(self.tracker.get_progress('a'), {'progress': 10, 'version': 2})
+
+    def test_delete_retries_after_a_concurrent_write(self):
+        self.tracker.set_progress('a', 10)
+        other = self.make_tracker()
+        self.client.race = lambda: other.set_progress('b', 20)
+        self.tracker.remove_progress('a')
+
+        self.assertEqual(self.client.conflicts, 1)
+        self.assertEqual(self.tracker.sequence, 3)
+        self.assertEqual(self.tracker.tracked(['a', 'b']), {'b'})
+
+    def test_watch_aborts_the_transaction(self):
+        client = LocalRedisClient()
+        with client.pipeline() as pipe:
+            pipe.watch('sequence')
+            self.assertIsNone(pipe.get('sequence'))
+            client.set('sequence', 5)
+            pipe.multi()
+            pipe.set('sequence', 1)
+            pipe.hset('entries', 'a', '{}')
+            with self.assertRaises(WatchError):
+                pipe.execute()
+        self.assertEqual(client.get('sequence'), b'5')
+        self.assertFalse(client.hexists('entries', 'a'))
+
+        with client.pipeline() as pipe:
+            pipe.watch('sequence')
+            pipe.multi()
+            pipe.incr('sequence')
+            self.assertEqual(pipe.execute(), [6])
+
+
+class CreateProgressTrackerTests(SimpleTestCase):
+
+    def test_backends(self):
+        with override_settings(FILE_PARSER_PROGRESS_BACKEND='memory'):
+            self.assertIs(type(create_progress_tracker()), ProgressTracker)
+        with override_settings(FILE_PARSER_PROGRESS_BACKEND='local-redis'):
+            self.assertIsInstance(create_progress_tracker(), RedisProgressTracker)
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'progress.sqlite3'
+            with override_settings(FILE_PARSER_PROGRESS_BACKEND='sqlite', FILE_PARSER_PROGRESS_SQLITE_PATH=path):
+                self.assertIsInstance(create_progress_tracker(), SQLiteProgressTracker)
+
+
+class _CountingS3Client(LocalS3Client):
+    """LocalS3Client that records the size of every uploaded part and aborted upload."""
+
+    def __init__(self, root):
+        super().__init__(root)
+        self.part_sizes = []
+        self.aborted = 0
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.part_sizes.append(len(Body))
+        return super().upload_part(Bucket, Key, UploadId, PartNumber, Body)
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.aborted += 1
+        return super().abort_multipart_upload(Bucket, Key, UploadId)
+
+
+class S3StorageTests(SimpleTestCase):
+    """S3Storage against the directory-backed LocalS3Client."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+        self.client = _CountingS3Client(self.root)
+        self.storage = S3Storage('bucket', client=self.client, prefix='/uploads/')
+
+    def test_save_uploads_parts_of_the_minimum_size(self):
+        chunks = [b'abc', b'def', b'gh']
+        with mock.patch('file_parser_app.storage.S3_MIN_PART_SIZE', 4):
+            self.assertEqual(self.storage.save('f/data.csv', chunks), 8)
+
+        self.assertEqual(self.client.part_sizes, [6, 2])
+        self.assertEqual((self.root / 'bucket' / 'uploads' / 'f' / 'data.csv').read_bytes(), b'abcdefgh')
+        self.assertEqual(self.client._uploads, {})
+        self.assertTrue(self.storage.exists('f/data.csv'))
+        self.assertEqual(self.storage.size('f/data.csv'), 8)
+
+    def test_save_empty_blob(self):
+        self.assertEqual(self.storage.save('empty', []), 0)
+        self.assertEqual(self.client.part_sizes, [0])
+        self.assertEqual(self.storage.size('empty'), 0)
+
+    def test_failed_save_aborts_the_upload(self):
+        def chunks():
+            yield b'abcd'
+            raise OSError('connection reset')
+
+        with mock.patch('file_parser_app.storage.S3_MIN_PART_SIZE', 4):
+            with self.assertRaises(OSError):
+                self.storage.save('broken', chunks())
+
+        self.assertEqual(self.client.aborted, 1)
+        self.assertEqual(self.client._uploads, {})
+        self.assertFalse(self.storage.exists('broken'))
+
+    def test_open_and_local_path(self):
+        self.storage.save('f/sheet.xlsx', [b'spreadsheet'])
+        body = self.storage.open('f/sheet.xlsx')
+        try:
+            self.assertEqual(body.read(), b'spreadsheet')
+        finally:
+            body.close()
+
+        with self.storage.local_path('f/sheet.xlsx') as path:
+            # Parsers pick the format from the suffix
+            self.assertTrue(path.endswith('.xlsx'))
+            self.assertEqual(Path(path).read_bytes(), b'spreadsheet')
+        self.assertFalse(Path(path).exists())
+
+    def test_delete(self):
+        self.storage.save('f/data.csv', [b'a,b'])
+        self.storage.delete('f/data.csv')
+        self.assertFalse(self.storage.exists('f/data.csv'))
+        with self.assertRaises(FileNotFoundError):
+            self.storage.open('f/data.csv')
+        # Deleting a missing key is not an error, as in S3
+        self.storage.delete('f/data.csv')
+
+
+class DedupTests(TestCase):
+    """Content-addressed uploads and their blob reference counts."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.storage = S3Storage('bucket', client=LocalS3Client(directory.name))
+        patcher = mock.patch('file_parser_app.storage._storage', self.storage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_identical_uploads_share_a_blob(self):
+        first, existed = store_upload('one/data.csv', [b'a,b\n', b'1,2\n'])
+        self.assertFalse(existed)
+        second, existed = store_upload('two/data.csv', [b'a,b\n1,2\n'])
+        self.assertTrue(existed)
+
+        self.assertEqual(second.id, first.id)
+        self.assertEqual(second.storage_key, 'one/data.csv')
+        self.assertEqual(ContentBlob.objects.get(id=first.id).ref_count, 2)
+        self.assertEqual(first.size, 8)
+        # The duplicate copy is deleted once the shared blob is found
+        self.assertFalse(self.storage.exists('two/data.csv'))
+        self.assertTrue(self.storage.exists('one/data.csv'))
+
+    def test_different_uploads_get_their_own_blobs(self):
+        first, _ = store_upload('one/data.csv', [b'a'])
+        second, existed = store_upload('two/data.csv', [b'b'])
+        self.assertFalse(existed)
+        self.assertNotEqual(first.id, second.id)
+        self.assertNotEqual(first.sha256, second.sha256)
+
+    def test_release_blob_deletes_at_zero_references(self):
+        blob, _ = store_upload('one/data.csv', [b'a,b\n'])
+        store_upload('two/data.csv', [b'a,b\n'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            release_blob(blob.id)
+        self.assertEqual(ContentBlob.objects.get(id=blob.id).ref_count, 1)
+        self.assertTrue(self.storage.exists('one/data.csv'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            release_blob(blob.id)
+        self.assertFalse(ContentBlob.objects.filter(id=blob.id).exists())
+        self.assertFalse(self.storage.exists('one/data.csv'))
+
+    def test_upload_after_release_stores_a_new_blob(self):
+        blob, _ = store_upload('one/data.csv', [b'a,b\n'])
+        with self.captureOnCommitCallbacks(execute=True):
+            release_blob(blob.id)
+
+        again, existed = store_upload('two/data.csv', [b'a,b\n'])
+        self.assertFalse(existed)
+        self.assertEqual(ContentBlob.objects.get(id=again.id).ref_count, 1)
+        self.assertTrue(self.storage.exists('two/data.csv'))
@@ -0,0 +1,138 @@
+import cProfile
+import io
+import logging
+import os
+import pstats
+import random
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import metrics
+from .models import PipelineSpan
+
+logger = logging.getLogger(__name__)
+
+# pstats orderings offered for profile summaries
+PROFILE_SORT_KEYS = ('cumulative', 'tottime', 'calls', 'ncalls')
+
+
+class SpanRecorder:
+    """Collect the pipeline spans of one file and store them together.
+
+    Spans are kept in memory while the file moves through a stage and
+    written with one bulk insert by `save`, which also adds them to the
+    shared duration histograms and throughput counters.
+    """
+
+    def __init__(self, kind: Optional[str] = None):
+        # 'csv', 'excel' or 'pdf': the label of the throughput counters
+        self.kind = kind
+        self.spans: List[PipelineSpan] = []
+
+    @contextmanager
+    def span(self, stage: str, bytes: Optional[int] = None, rows: Optional[int] = None) -> Iterator[PipelineSpan]:
+        """Time the block as `stage`; set `bytes`/`rows` on the yielded span once known."""
+        span = PipelineSpan(stage=stage, started_at=timezone.now(), bytes=bytes, rows=rows)
+        started = time.perf_counter()
+        try:
+            yield span
+        finally:
+            span.duration = time.perf_counter() - started
+            self.spans.append(span)
+
+    def add(self, stage: str, started_at: datetime, duration: float,
+            bytes: Optional[int] = None, rows: Optional[int] = None):
+        """Record a span measured elsewhere, e.g. from timestamps in the database."""
+        self.spans.append(PipelineSpan(stage=stage, started_at=started_at, duration=max(0.0, duration),
+                                       bytes=bytes, rows=rows))
+
+    def save(self, file_id):
+        """Store the collected spans against a file. Never raises."""
+        spans, self.spans = self.spans, []
+        if not spans:
+            return
+        try:
+            for span in spans:
+                span.file_id = file_id
+            PipelineSpan.objects.bulk_create(spans)
+            counters = Counter()
+            for span in spans:
+                metrics.observe_stage(span.stage, span.duration, counters)
+                if span.stage == 'parse' and self.kind:
+                    metrics.record_throughput(self.kind, span.bytes or 0, span.rows or 0, counters)
+            metrics.increment_many(counters)
+        except Exception as e:
+            # Timing must never fail the upload or job it describes
+            logger.warning(f"Could not record pipeline spans for file {file_id}: {str(e)}")
+
+
+def profile_root() -> Path:
+    """Directory holding cProfile captures of parse jobs."""
+    root = getattr(settings, 'FILE_PARSER_PROFILE_ROOT', None) or Path(settings.MEDIA_ROOT) / 'profiles'
+    return Path(root)
+
+
+def profile_path(file_id) -> Path:
+    return profile_root() / f"{file_id}.prof"
+
+
+@contextmanager
+def profiled(file_id, forced: bool = False):
+    """Run the block under cProfile if forced or sampled, and keep the capture.
+
+    A FILE_PARSER_PROFILE_SAMPLE_RATE share of jobs is sampled; sampled
+    captures are only kept for jobs slower than
+    FILE_PARSER_PROFILE_MIN_SECONDS, so the ones left are the slow jobs.
+    Forced captures are always kept. Only the calling thread is profiled.
+    """
+    sample_rate = getattr(settings, 'FILE_PARSER_PROFILE_SAMPLE_RATE', 0.0)
+    if not forced and (sample_rate <= 0 or random.random() >= sample_rate):
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        elapsed = time.perf_counter() - started
+        if forced or elapsed >= getattr(settings, 'FILE_PARSER_PROFILE_MIN_SECONDS', 0.0):
+            try:
+                path = profile_path(file_id)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                # Write then rename so readers never see a partial capture
+                partial = path.with_suffix('.prof.partial')
+                profiler.dump_stats(str(partial))
+                os.replace(partial, path)
+                logger.info(f"Saved parse profile for file {file_id} ({elapsed:.2f}s)")
+            except OSError as e:
+                logger.warning(f"Could not save parse profile for file {file_id}: {str(e)}")
+
+
+def profile_summary(file_id, sort: str = 'cumulative', limit: int = 40) -> Optional[str]:
+    """The top `limit` functions of a file's capture as pstats text, or None if there is none."""
+    path = profile_path(file_id)
+    if not path.exists():
+        return None
+    out = io.StringIO()
+    stats = pstats.Stats(str(path), stream=out)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return out.getvalue()
+
+
+def delete_profile(file_id):
+    try:
+        os.unlink(profile_path(file_id))
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.error(f"Error deleting parse profile for file {file_id}: {str(e)}")
@@ -3,9 +3,26 @@ from . import views
 
 urlpatterns = [
     path('files/upload/', views.upload_file, name='upload_file'),
+    path('files/upload/batch/', views.upload_batch, name='upload_batch'),
+    path('batches/<uuid:batch_id>/', views.get_batch, name='get_batch'),
+    path('uploads/', views.start_resumable_upload, name='start_resumable_upload'),
+    path('uploads/<uuid:upload_id>/', views.resumable_upload, name='resumable_upload'),
+    path('uploads/<uuid:upload_id>/complete/', views.complete_resumable_upload, name='complete_resumable_upload'),
     path('files/', views.list_files, name='list_files'),
+    path('files/progress/', views.get_files_progress, name='get_files_progress'),
+    path('files/progress/stream/', views.stream_files_progress, name='stream_files_progress'),
     path('files/<uuid:file_id>/', views.get_file_content, name='get_file_content'),
+    path('files/<uuid:file_id>/preview/', views.get_file_preview, name='get_file_preview'),
+    path('files/<uuid:file_id>/rows/', views.get_file_rows, name='get_file_rows'),
+    path('files/<uuid:file_id>/query/', views.query_file, name='query_file'),
+    path('files/<uuid:file_id>/pages/<int:page_number>/', views.get_file_page, name='get_file_page'),
     path('files/<uuid:file_id>/progress/', views.get_file_progress, name='get_file_progress'),
+    path('files/<uuid:file_id>/progress/stream/', views.stream_file_progress, name='stream_file_progress'),
+    path('files/<uuid:file_id>/content/', views.replace_file_content, name='replace_file_content'),
     path('files/<uuid:file_id>/delete/', views.delete_file, name='delete_file'),
+    path('files/<uuid:file_id>/timings/', views.get_file_timings, name='get_file_timings'),
+    path('files/<uuid:file_id>/profile/', views.file_profile, name='file_profile'),
+    path('search/', views.search_files, name='search_files'),
+    path('metrics/parse-cache/', views.parse_cache_metrics, name='parse_cache_metrics'),
 ]
 
@@ -1,27 +1,140 @@
+import base64
+import binascii
+import json
 import logging
+import uuid
+from typing import Any, Dict, Optional, Tuple
+from django.conf import settings
 from rest_framework import status
 from rest_framework.decorators import api_view, parser_classes
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
-from django.http import JsonResponse
-from .models import UploadedFile, ParsedContent
+from django.http import FileResponse, HttpResponse, JsonResponse, Http404, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from django.db import connection
+from django.db.models import Count, Q, Sum
+from django.utils.dateparse import parse_datetime
+from .models import UploadedFile, UploadBatch, UploadSession, ParsedContent, ParsedTable, ParsedPage, ContentBlob, PipelineSpan
 from .serializers import (
     UploadedFileSerializer, 
     FileListSerializer, 
     FileProgressSerializer,
     ParsedContentSerializer
 )
+from .append_upload import ReplaceConflict, replace_upload
 from .async_processor import AsyncFileProcessor
+from .columnar import ARROW_STREAM_CONTENT_TYPE, ROW_ENCODINGS, arrow_column_values, arrow_stream_bytes, columns_to_records
+from .batch_upload import BatchUploadError, archive_members, create_batch, uploaded_members
+from .resumable_upload import (
+    ResumableUploadError,
+    UploadConflict,
+    complete_upload,
+    missing_ranges,
+    start_upload,
+    write_chunk
+)
 from .progress_tracker import progress_tracker
+from .progress_stream import ProgressFeed, sse_events
+from .renderers import contains_streamed_rows, iter_json
+from .metrics import PROMETHEUS_CONTENT_TYPE, parse_cache_stats, prometheus_text
+from .preview import PARSE_MODES, preview_upload
+from .scheduling import DEFAULT_PRIORITY, priority_value
+from .table_query import QueryError, cached_query, normalize_query, query_rows, query_table
+from .search_index import get_search_index, match_expression, search_enabled
+from .table_store import read_rows, read_table, rows_table
+from .tracing import PROFILE_SORT_KEYS, profile_path, profile_summary
 
 logger = logging.getLogger(__name__)
 
 
+def _client_id(request) -> str:
+    """Who is uploading, for per-client fair sharing of the parser workers.
+    
+    The FILE_PARSER_CLIENT_HEADER header when configured (e.g. a tenant id
+    set by a gateway), else the authenticated user, else the remote address.
+    """
+    header = getattr(settings, 'FILE_PARSER_CLIENT_HEADER', '')
+    if header and request.headers.get(header):
+        return request.headers[header][:255]
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f'user:{user.pk}'
+    return f"addr:{request.META.get('REMOTE_ADDR', '')}"
+
+
+def _requested_priority(params, default: str) -> str:
+    """The `priority` query parameter (see scheduling.PRIORITIES); raises ValueError if unknown."""
+    priority = params.get('priority') or default
+    priority_value(priority)
+    return priority
+
+
+# Sent with 503 responses when the parse queue is full
+QUEUE_FULL_ERROR = 'Too many files are waiting to be processed. Please retry shortly.'
+QUEUE_FULL_RETRY_AFTER = '30'
+
+
+def _queue_full_response() -> JsonResponse:
+    # Plain JSON rather than a DRF Response so the async views can return it too
+    response = JsonResponse({'error': QUEUE_FULL_ERROR}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    response['Retry-After'] = QUEUE_FULL_RETRY_AFTER
+    return response
+
+
+def _upload_options(params) -> Dict[str, Any]:
+    """Read the `parse`, `priority` and `profile` query parameters of an upload; raises ValueError."""
+    # `?parse=lazy` only previews the file now (see FILE_PARSER_PARSE_MODE)
+    parse_mode = params.get('parse') or getattr(settings, 'FILE_PARSER_PARSE_MODE', 'full')
+    if parse_mode not in PARSE_MODES:
+        raise ValueError(f"Unknown parse mode: {parse_mode}. Expected one of {', '.join(PARSE_MODES)}")
+    return {
+        'parse_mode': parse_mode,
+        'priority': _requested_priority(params, DEFAULT_PRIORITY),
+        # `?profile=1` captures a cProfile of the parse
+        'profile': params.get('profile', '').lower() in ('1', 'true'),
+    }
+
+
+def _accept_upload(file_obj, client: str, parse_mode: str, priority: str, profile: bool) -> Tuple[Dict, int]:
+    """Store an uploaded file and preview or queue it; returns the response data and status."""
+    serializer = UploadedFileSerializer(data={'file': file_obj})
+    if not serializer.is_valid():
+        return serializer.errors, status.HTTP_400_BAD_REQUEST
+    uploaded_file = serializer.save(client=client)
+    
+    # Initialize progress tracking
+    progress_tracker.set_progress(str(uploaded_file.id), 0, 'uploading')
+    
+    if parse_mode == 'lazy' and not profile and AsyncFileProcessor.preview_file(uploaded_file):
+        logger.info(f"File uploaded and previewed: {uploaded_file.original_filename}")
+        return {
+            'file_id': uploaded_file.id,
+            'filename': uploaded_file.original_filename,
+            'status': uploaded_file.status,
+            'preview': uploaded_file.preview,
+            'message': 'File uploaded successfully; rows are parsed when first requested'
+        }, status.HTTP_201_CREATED
+    AsyncFileProcessor.process_file_async(str(uploaded_file.id), profile=profile, priority=priority)
+    
+    logger.info(f"File uploaded successfully: {uploaded_file.original_filename}")
+    
+    return {
+        'file_id': uploaded_file.id,
+        'filename': uploaded_file.original_filename,
+        'status': uploaded_file.status,
+        'message': 'File uploaded successfully and processing started'
+    }, status.HTTP_201_CREATED
+
+
 @api_view(['POST'])
 @parser_classes([MultiPartParser, FormParser])
 def upload_file(request):
-    """Upload a file and start processing."""
+    """Upload a file and start processing.
+    
+    `?priority=interactive|normal|bulk` sets the priority class of the parse
+    job (default `normal`).
+    """
     try:
         if 'file' not in request.FILES:
             return Response(
@@ -31,35 +144,24 @@ def upload_file(request):
         
         file_obj = request.FILES['file']
         
-        # Validate file size (50MB limit)
-        max_size = 50 * 1024 * 1024  # 50MB
+        max_size = getattr(settings, 'FILE_PARSER_MAX_UPLOAD_SIZE', 50 * 1024 * 1024)
         if file_obj.size > max_size:
             return Response(
                 {'error': f'File too large. Maximum size is {max_size // (1024*1024)}MB'}, 
                 status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
             )
         
-        # Create file record
-        serializer = UploadedFileSerializer(data={'file': file_obj})
-        if serializer.is_valid():
-            uploaded_file = serializer.save()
-            
-            # Initialize progress tracking
-            progress_tracker.set_progress(str(uploaded_file.id), 0, 'uploading')
-            
-            # Start async processing
-            AsyncFileProcessor.process_file_async(str(uploaded_file.id))
-            
-            logger.info(f"File uploaded successfully: {uploaded_file.original_filename}")
-            
-            return Response({
-                'file_id': uploaded_file.id,
-                'filename': uploaded_file.original_filename,
-                'status': uploaded_file.status,
-                'message': 'File uploaded successfully and processing started'
-            }, status=status.HTTP_201_CREATED)
+        try:
+            options = _upload_options(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Apply backpressure before accepting more work than the workers can drain
+        if AsyncFileProcessor.queue_is_full():
+            return _queue_full_response()
         
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        data, code = _accept_upload(file_obj, _client_id(request), **options)
+        return Response(data, status=code)
     
     except Exception as e:
         logger.error(f"Error uploading file: {str(e)}")
@@ -69,32 +171,294 @@ def upload_file(request):
         )
 
 
+@api_view(['POST'])
+@parser_classes([MultiPartParser, FormParser])
+def upload_batch(request):
+    """Upload many files, or one zip archive of them, as a single batch.
+    
+    Send the files as repeated `files` parts and/or a zip archive as
+    `archive`. All files are parsed by one queued batch job, of `bulk`
+    priority unless `?priority=` says otherwise.
+    """
+    try:
+        files = request.FILES.getlist('files')
+        archive = request.FILES.get('archive')
+        if not files and archive is None:
+            return Response(
+                {'error': 'No files provided'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            priority = _requested_priority(request.query_params, 'bulk')
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if AsyncFileProcessor.queue_is_full():
+            return _queue_full_response()
+        
+        def members():
+            yield from uploaded_members(files)
+            if archive is not None:
+                yield from archive_members(archive)
+        
+        try:
+            batch = create_batch(members(), client=_client_id(request))
+        except BatchUploadError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        AsyncFileProcessor.process_batch_async(str(batch.id), priority=priority)
+        
+        batch_files = list(batch.files.order_by('created_at', 'id').values('id', 'original_filename'))
+        logger.info(f"Batch uploaded successfully: {batch.id} ({batch.total_files} files)")
+        
+        return Response({
+            'batch_id': batch.id,
+            'status': batch.status,
+            'total_files': batch.total_files,
+            'files': [{'file_id': f['id'], 'filename': f['original_filename']} for f in batch_files],
+            'message': 'Files uploaded successfully and processing started'
+        }, status=status.HTTP_201_CREATED)
+    
+    except Exception as e:
+        logger.error(f"Error uploading batch: {str(e)}")
+        return Response(
+            {'error': 'Internal server error during file upload'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+def _upload_session_payload(session):
+    return {
+        'upload_id': session.id,
+        'file_id': session.file_id,
+        'status': session.status,
+        'size': session.total_size,
+        'received_bytes': session.received_bytes,
+        'progress': session.received_bytes * 100 // session.total_size,
+        'missing': missing_ranges(session),
+        'expires_at': session.expires_at
+    }
+
+
+def _chunk_offset(request):
+    """Chunk offset from a `Content-Range: bytes start-end/total` header or the `offset` parameter."""
+    content_range = request.headers.get('Content-Range')
+    if content_range:
+        unit, _, spec = content_range.partition(' ')
+        if unit != 'bytes' or '-' not in spec:
+            raise ValueError('Content-Range must look like "bytes start-end/total"')
+        return int(spec.split('-', 1)[0])
+    if 'offset' not in request.query_params:
+        raise ValueError('Provide the chunk offset as Content-Range or ?offset=')
+    return int(request.query_params['offset'])
+
+
+@api_view(['POST'])
+def start_resumable_upload(request):
+    """Start a resumable upload of `size` bytes; chunks are then PUT to the returned upload."""
+    try:
+        try:
+            session = start_upload(
+                request.data.get('filename', ''),
+                int(request.data.get('size', 0)),
+                request.data.get('content_type'),
+                client=_client_id(request)
+            )
+        except (TypeError, ValueError) as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response({
+            **_upload_session_payload(session),
+            'chunk_size': getattr(settings, 'FILE_PARSER_UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024)
+        }, status=status.HTTP_201_CREATED)
+    
+    except Exception as e:
+        logger.error(f"Error starting resumable upload: {str(e)}")
+        return Response(
+            {'error': 'Internal server error during file upload'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET', 'PUT', 'DELETE'])
+def resumable_upload(request, upload_id):
+    """Report (GET), send a chunk to (PUT) or abort (DELETE) a resumable upload.
+    
+    A PUT body holds the raw bytes of one chunk, placed at the offset given
+    by `Content-Range` or `?offset=`. An optional `X-Chunk-SHA256` header is
+    checked against the bytes received.
+    """
+    try:
+        session = get_object_or_404(UploadSession.objects.select_related('file'), id=upload_id)
+        
+        if request.method == 'DELETE':
+            if session.status != 'active':
+                return Response(
+                    {'error': f'Upload is {session.status}'},
+                    status=status.HTTP_409_CONFLICT
+                )
+            # Cascades to the session and its chunks; signals remove the parts
+            progress_tracker.remove_progress(session.file_id)
+            session.file.delete()
+            return Response({'message': 'Upload aborted'}, status=status.HTTP_200_OK)
+        
+        if request.method == 'PUT':
+            try:
+                write_chunk(
+                    session,
+                    _chunk_offset(request),
+                    request.stream,
+                    request.headers.get('X-Chunk-SHA256')
+                )
+            except UploadConflict as e:
+                return Response(
+                    {'error': str(e)},
+                    status=status.HTTP_409_CONFLICT
+                )
+            except ValueError as e:
+                return Response(
+                    {'error': str(e)},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        return Response(_upload_session_payload(session))
+    
+    except Http404:
+        return Response(
+            {'error': 'Upload not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    except Exception as e:
+        logger.error(f"Error handling resumable upload {upload_id}: {str(e)}")
+        return Response(
+            {'error': 'Internal server error during file upload'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['POST'])
+def complete_resumable_upload(request, upload_id):
+    """Join a fully received upload and start processing it.
+    
+    An optional `sha256` of the whole file is checked before the file is
+    accepted.
+    """
+    try:
+        session = get_object_or_404(UploadSession.objects.select_related('file'), id=upload_id)
+        
+        if AsyncFileProcessor.queue_is_full():
+            return _queue_full_response()
+        
+        try:
+            uploaded_file = complete_upload(session, request.data.get('sha256'))
+        except UploadConflict as e:
+            return Response(
+                {'error': str(e), 'missing': missing_ranges(session)},
+                status=status.HTTP_409_CONFLICT
+            )
+        except ResumableUploadError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        AsyncFileProcessor.process_file_async(str(uploaded_file.id))
+        
+        return Response({
+            'file_id': uploaded_file.id,
+            'filename': uploaded_file.original_filename,
+            'status': uploaded_file.status,
+            'message': 'File uploaded successfully and processing started'
+        }, status=status.HTTP_201_CREATED)
+    
+    except Http404:
+        return Response(
+            {'error': 'Upload not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    except Exception as e:
+        logger.error(f"Error completing resumable upload {upload_id}: {str(e)}")
+        return Response(
+            {'error': 'Internal server error during file upload'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET'])
+def get_batch(request, batch_id):
+    """Status of an upload batch, with progress aggregated over its files."""
+    try:
+        batch = get_object_or_404(UploadBatch, id=batch_id)
+        batch_files = list(
+            UploadedFile.objects
+            .filter(batch_id=batch.id)
+            .order_by('created_at', 'id')
+            .values('id', 'original_filename', 'status', 'progress')
+        )
+        
+        # Live progress of files being parsed right now
+        live, _ = progress_tracker.changes_since([f['id'] for f in batch_files], 0)
+        counts = {choice: 0 for choice, _ in UploadedFile.STATUS_CHOICES}
+        completed = 0
+        for f in batch_files:
+            entry = live.get(str(f['id']), {})
+            f['status'] = entry.get('status', f['status'])
+            f['progress'] = entry.get('progress', f['progress'])
+            counts[f['status']] = counts.get(f['status'], 0) + 1
+            # Failed files are finished too
+            completed += 100 if f['status'] in ('ready', 'failed') else f['progress']
+        
+        return Response({
+            'batch_id': batch.id,
+            'status': batch.status,
+            'total_files': batch.total_files,
+            'progress': completed // len(batch_files) if batch_files else 100,
+            'counts': counts,
+            'files': [
+                {'file_id': f['id'], 'filename': f['original_filename'], 'status': f['status'], 'progress': f['progress']}
+                for f in batch_files
+            ]
+        })
+    
+    except Http404:
+        return Response(
+            {'error': 'Batch not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    except Exception as e:
+        logger.error(f"Error getting batch {batch_id}: {str(e)}")
+        return Response(
+            {'error': 'Internal server error'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
 @api_view(['GET'])
 def get_file_progress(request, file_id):
     """Get upload/processing progress for a file."""
     try:
-        # Try to get from database first
-        uploaded_file = get_object_or_404(UploadedFile, id=file_id)
-        
-        # Check in-memory progress tracker for real-time updates
+        # The in-memory tracker is more up-to-date and saves a query
         progress_data = progress_tracker.get_progress(file_id)
-        
-        if progress_data:
-            # Use in-memory data if available (more up-to-date)
-            response_data = {
-                'file_id': file_id,
-                'status': progress_data.get('status', uploaded_file.status),
-                'progress': progress_data.get('progress', uploaded_file.progress)
-            }
-        else:
-            # Fall back to database data
-            response_data = {
+        if progress_data and 'status' in progress_data and 'progress' in progress_data:
+            return Response({
                 'file_id': file_id,
-                'status': uploaded_file.status,
-                'progress': uploaded_file.progress
-            }
+                'status': progress_data['status'],
+                'progress': progress_data['progress']
+            })
         
-        return Response(response_data)
+        # Fall back to database data
+        uploaded_file = get_object_or_404(UploadedFile.objects.only('status', 'progress'), id=file_id)
+        return Response({
+            'file_id': file_id,
+            'status': uploaded_file.status,
+            'progress': uploaded_file.progress
+        })
     
     except Exception as e:
         logger.error(f"Error getting progress for file {file_id}: {str(e)}")
@@ -104,34 +468,172 @@ def get_file_progress(request, file_id):
         )
 
 
+def _progress_file_ids(raw_ids):
+    """Parse and validate a list of file IDs for the batch progress endpoints."""
+    file_ids = []
+    for raw_id in raw_ids:
+        try:
+            file_ids.append(str(uuid.UUID(str(raw_id).strip())))
+        except ValueError:
+            raise ValueError(f'Invalid file id: {raw_id}')
+    if not file_ids:
+        raise ValueError('No file ids provided')
+    max_ids = getattr(settings, 'FILE_PARSER_PROGRESS_BATCH_MAX', 500)
+    if len(file_ids) > max_ids:
+        raise ValueError(f'At most {max_ids} file ids per request')
+    return file_ids
+
+
+@api_view(['GET', 'POST'])
+def get_files_progress(request):
+    """Progress of many files at once, optionally long-polling for changes.
+    
+    Without a cursor the current state of every file is returned. With the
+    `cursor` of a previous response, only files that changed since are
+    returned, waiting up to `wait` seconds for the first change.
+    """
+    try:
+        params = request.data if request.method == 'POST' else request.query_params
+        raw_ids = params.get('ids') or []
+        if isinstance(raw_ids, str):
+            raw_ids = [raw_id for raw_id in raw_ids.split(',') if raw_id.strip()]
+        file_ids = _progress_file_ids(raw_ids)
+        cursor = params.get('cursor')
+        wait = min(
+            float(params.get('wait', 0)),
+            getattr(settings, 'FILE_PARSER_PROGRESS_LONG_POLL_SECONDS', 30)
+        )
+        feed = ProgressFeed(file_ids, str(cursor) if cursor is not None else None)
+    except (TypeError, ValueError) as e:
+        return Response(
+            {'error': str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        changes = feed.poll(max(0.0, wait))
+        return Response({
+            'files': changes,
+            'missing': feed.missing,
+            'cursor': feed.cursor
+        })
+    except Exception as e:
+        logger.error(f"Error getting progress for files: {str(e)}")
+        return Response(
+            {'error': 'Internal server error'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+def _progress_stream_response(request, file_ids):
+    # Browsers resend the last event id when an EventSource reconnects
+    cursor = request.headers.get('Last-Event-ID') or request.GET.get('cursor')
+    try:
+        feed = ProgressFeed(file_ids, cursor)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    return _event_stream_response(sse_events(feed, getattr(settings, 'FILE_PARSER_PROGRESS_STREAM_SECONDS', 300)))
+
+
+def _event_stream_response(events):
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Keep nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+# Plain Django views: DRF content negotiation would reject Accept: text/event-stream
+@require_GET
+def stream_file_progress(request, file_id):
+    """Server-Sent Events stream of one file's progress until it is ready or failed."""
+    return _progress_stream_response(request, [file_id])
+
+
+@require_GET
+def stream_files_progress(request):
+    """Server-Sent Events stream of the progress of the files in `ids`."""
+    try:
+        file_ids = _progress_file_ids(request.GET.get('ids', '').split(','))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return _progress_stream_response(request, file_ids)
+
+
+def _not_ready_data(uploaded_file):
+    """Body of the 202 for a file whose content is not parsed yet.
+    
+    Asking for the content of a previewed file starts its full parse; its
+    preview is returned meanwhile.
+    """
+    data = {
+        'message': 'File upload or processing in progress. Please try again later.',
+        'status': uploaded_file.status,
+        'progress': uploaded_file.progress
+    }
+    if uploaded_file.status == 'previewed':
+        AsyncFileProcessor.parse_on_demand(str(uploaded_file.id))
+        data['status'] = 'uploading'
+    if uploaded_file.preview is not None:
+        data['preview'] = uploaded_file.preview
+    return data
+
+
+def _not_ready_response(uploaded_file):
+    return Response(_not_ready_data(uploaded_file), status=status.HTTP_202_ACCEPTED)
+
+
+def _parse_row_window(params):
+    """Read optional `columns`, `offset` and `limit` query parameters."""
+    columns = params.get('columns')
+    window = {
+        'columns': [c.strip() for c in columns.split(',') if c.strip()] if columns else None,
+        'offset': int(params.get('offset', 0)),
+        'limit': int(params['limit']) if 'limit' in params else None,
+    }
+    if window['offset'] < 0 or (window['limit'] is not None and window['limit'] < 0):
+        raise ValueError('offset and limit must not be negative')
+    return window
+
+
 @api_view(['GET'])
 def get_file_content(request, file_id):
-    """Get parsed file content."""
+    """Get parsed file content.
+    
+    Tabular rows can be narrowed with `?columns=a,b&offset=0&limit=100`;
+    only the requested columns and row range are read from storage. Rows
+    stored as tables are streamed, so memory use and time to first byte do
+    not grow with the file.
+    """
     try:
-        uploaded_file = get_object_or_404(UploadedFile, id=file_id)
+        window = _parse_row_window(request.query_params)
+    except ValueError as e:
+        return Response({'error': f'Invalid row window: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        uploaded_file = get_object_or_404(UploadedFile.objects.defer('file_content'), id=file_id)
         
         if uploaded_file.status == 'ready':
-            try:
-                parsed_content = uploaded_file.parsed_content
-                serializer = ParsedContentSerializer(parsed_content)
-                
-                return Response({
-                    'file_id': file_id,
-                    'filename': uploaded_file.original_filename,
-                    'status': uploaded_file.status,
-                    'parsed_content': serializer.data
-                })
-            except ParsedContent.DoesNotExist:
+            parsed_content = uploaded_file.parsed_content
+            if parsed_content is None:
                 return Response(
                     {'error': 'Parsed content not found'}, 
                     status=status.HTTP_404_NOT_FOUND
                 )
-        else:
-            return Response({
-                'message': 'File upload or processing in progress. Please try again later.',
+            serializer = ParsedContentSerializer(parsed_content, context={**window, 'stream_rows': True})
+            data = {
+                'file_id': file_id,
+                'filename': uploaded_file.original_filename,
                 'status': uploaded_file.status,
-                'progress': uploaded_file.progress
-            }, status=status.HTTP_202_ACCEPTED)
+                'parsed_content': serializer.data
+            }
+            if contains_streamed_rows(data):
+                # Table rows are read and sent one stored batch at a time
+                return StreamingHttpResponse(iter_json(data), content_type='application/json')
+            return Response(data)
+        else:
+            return _not_ready_response(uploaded_file)
     
     except Exception as e:
         logger.error(f"Error getting file content for {file_id}: {str(e)}")
@@ -141,16 +643,411 @@ def get_file_content(request, file_id):
         )
 
 
+@api_view(['GET'])
+def get_file_preview(request, file_id):
+    """Get the headers, column kinds and first rows (or first page) of a file.
+    
+    Lazily parsed uploads were previewed on upload; other files are
+    previewed from the start of their bytes on first request. Unlike the
+    content endpoints, this never starts a full parse.
+    """
+    try:
+        uploaded_file = get_object_or_404(UploadedFile.objects.defer('file_content'), id=file_id)
+        
+        preview = uploaded_file.preview
+        if preview is None:
+            try:
+                preview = preview_upload(uploaded_file)
+            except Exception as e:
+                return Response({'error': f'Could not preview file: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
+            if preview is None:
+                return Response({'error': 'File type has no preview'}, status=status.HTTP_400_BAD_REQUEST)
+            UploadedFile.objects.filter(id=file_id).update(preview=preview)
+        
+        return Response({
+            'file_id': file_id,
+            'filename': uploaded_file.original_filename,
+            'status': uploaded_file.status,
+            'preview': preview
+        })
+    
+    except Http404:
+        return Response({'error': 'File not found'}, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        logger.error(f"Error previewing file {file_id}: {str(e)}")
+        return Response(
+            {'error': 'Internal server error'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+def _encode_cursor(table_id: Optional[int], offset: int, sheet: str = '') -> str:
+    # Inline rows have no ParsedTable, so their cursors name the sheet instead
+    position = {'t': table_id} if table_id is not None else {'s': sheet}
+    payload = json.dumps({**position, 'o': offset}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+
+def _decode_cursor(cursor: str):
+    """Return `(table_id, sheet, offset)`; exactly one of the first two is None."""
+    padded = cursor + '=' * (-len(cursor) % 4)
+    payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    if 't' in payload:
+        return int(payload['t']), None, int(payload['o'])
+    return None, str(payload['s']), int(payload['o'])
+
+
+def _inline_rows(parsed_content, sheet=None):
+    """Sheet name, headers and rows of a table kept inline in the JSON content.
+    
+    Rows are stored this way with FILE_PARSER_TABLE_FORMAT=inline and for
+    files parsed before ParsedTable existed. `sheet` defaults to the first
+    Excel sheet. Returns None when the file has no such sheet.
+    """
+    content = parsed_content.content
+    if parsed_content.content_type == 'excel':
+        names = content.get('sheet_names', [])
+        if sheet is None:
+            sheet = names[0] if names else None
+        if sheet not in content.get('sheets', {}):
+            return None
+        sheet_data = content['sheets'][sheet]
+        return sheet, sheet_data.get('headers', []), sheet_data.get('rows', [])
+    if sheet:
+        return None
+    headers = content.get('headers', [])
+    if content.get('encoding') == 'columns':
+        return None, headers, columns_to_records(headers, content.get('column_values', []))
+    return None, headers, content.get('rows', [])
+
+
+@api_view(['GET'])
+def get_file_rows(request, file_id):
+    """Get one page of rows from a parsed CSV file or Excel sheet.
+    
+    Query parameters: `sheet` (Excel sheet name, defaults to the first
+    sheet), `columns` (comma-separated projection), `offset`/`limit`, or an
+    opaque `cursor` returned as `next_cursor`/`previous_cursor` by an earlier
+    page. Only the requested page and columns are read from storage.
+    
+    `encoding` selects the row layout: `records` (default, `rows` as a list
+    of dicts), `columns` (`column_values`, one list per column in `columns`
+    order) or `arrow` (the page as an Arrow IPC stream, with the page
+    details in `X-` headers).
+    """
+    default_limit = getattr(settings, 'FILE_PARSER_ROWS_PAGE_SIZE', 100)
+    max_limit = getattr(settings, 'FILE_PARSER_ROWS_MAX_PAGE_SIZE', 1000)
+    
+    try:
+        window = _parse_row_window(request.query_params)
+        limit = min(window['limit'] if window['limit'] is not None else default_limit, max_limit)
+        if limit < 1:
+            # An empty page would hand back a next_cursor pointing at itself
+            raise ValueError('limit must be at least 1')
+        offset = window['offset']
+        encoding = request.query_params.get('encoding', 'records')
+        if encoding not in ROW_ENCODINGS + ('arrow',):
+            raise ValueError(f"encoding must be one of {', '.join(ROW_ENCODINGS + ('arrow',))}")
+        cursor_table_id = None
+        cursor_sheet = None
+        if 'cursor' in request.query_params:
+            cursor_table_id, cursor_sheet, offset = _decode_cursor(request.query_params['cursor'])
+            if offset < 0:
+                raise ValueError('invalid cursor')
+    except (ValueError, KeyError, TypeError, binascii.Error) as e:
+        return Response({'error': f'Invalid pagination parameters: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        table = None
+        if cursor_sheet is None:
+            tables = ParsedTable.objects.filter(parsed_content__files__id=file_id)
+            if cursor_table_id is not None:
+                tables = tables.filter(id=cursor_table_id)
+            elif 'sheet' in request.query_params:
+                tables = tables.filter(name=request.query_params['sheet'])
+            table = tables.order_by('position').first()
+        
+        if table is not None:
+            sheet = table.name or None
+            columns = table.columns
+            total_rows = table.row_count
+        else:
+            uploaded_file = get_object_or_404(UploadedFile.objects.only('status', 'progress', 'preview'), id=file_id)
+            if uploaded_file.status != 'ready':
+                return _not_ready_response(uploaded_file)
+            if cursor_table_id is not None:
+                return Response({'error': 'Sheet not found'}, status=status.HTTP_404_NOT_FOUND)
+            
+            # Rows kept inline in the JSON content (see `_inline_rows`)
+            parsed_content = get_object_or_404(ParsedContent, files__id=file_id)
+            if parsed_content.tables.exists():
+                return Response({'error': 'Sheet not found'}, status=status.HTTP_404_NOT_FOUND)
+            if parsed_content.content_type not in ('csv', 'excel'):
+                return Response(
+                    {'error': 'File has no tabular rows stored'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            requested = cursor_sheet if cursor_sheet is not None else request.query_params.get('sheet')
+            inline = _inline_rows(parsed_content, requested)
+            if inline is None:
+                return Response({'error': 'Sheet not found'}, status=status.HTTP_404_NOT_FOUND)
+            sheet, columns, inline_rows = inline
+            total_rows = len(inline_rows)
+        
+        if window['columns'] is not None:
+            unknown = [c for c in window['columns'] if c not in columns]
+            if unknown:
+                return Response(
+                    {'error': f'Unknown columns: {", ".join(unknown)}'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            columns = window['columns']
+        
+        if table is None:
+            rows = [{column: row.get(column) for column in columns} for row in inline_rows[offset:offset + limit]]
+            if encoding != 'records':
+                page, schema = rows_table(rows, columns)
+            row_count = len(rows)
+        elif encoding == 'records':
+            rows = read_rows(table.paths, table.format, window['columns'], offset, limit)
+            row_count = len(rows)
+        else:
+            page = read_table(table.paths, table.format, window['columns'], offset, limit)
+            schema = table.schema
+            row_count = page.num_rows
+        table_id = table.id if table is not None else None
+        next_offset = offset + row_count
+        next_cursor = _encode_cursor(table_id, next_offset, sheet or '') if next_offset < total_rows else None
+        previous_cursor = _encode_cursor(table_id, max(0, offset - limit), sheet or '') if offset > 0 else None
+        
+        if encoding == 'arrow':
+            response = HttpResponse(arrow_stream_bytes(page), content_type=ARROW_STREAM_CONTENT_TYPE)
+            response['X-Total-Rows'] = str(total_rows)
+            response['X-Offset'] = str(offset)
+            if next_cursor:
+                response['X-Next-Cursor'] = next_cursor
+            if previous_cursor:
+                response['X-Previous-Cursor'] = previous_cursor
+            return response
+        
+        data = {
+            'file_id': file_id,
+            'sheet': sheet,
+            'columns': columns,
+            'offset': offset,
+            'limit': limit,
+            'total_rows': total_rows,
+        }
+        if encoding == 'columns':
+            kinds = {column['name']: column['kind'] for column in schema}
+            data['encoding'] = 'columns'
+            data['schema'] = [{'name': name, 'kind': kinds.get(name, 'string')} for name in page.column_names]
+            data['column_values'] = arrow_column_values(page)
+        else:
+            data['rows'] = rows
+        data['next_cursor'] = next_cursor
+        data['previous_cursor'] = previous_cursor
+        return Response(data)
+    
+    except Http404:
+        return Response({'error': 'File not found'}, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        logger.error(f"Error getting rows for file {file_id}: {str(e)}")
+        return Response(
+            {'error': 'Internal server error'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['POST'])
+def query_file(request, file_id):
+    """Filter, sort, group and aggregate the rows of a parsed CSV file or Excel sheet.
+    
+    The JSON body is described in `table_query.normalize_query`. Results are
+    cached per file and query until the file is deleted or re-parsed.
+    """
+    try:
+        query = normalize_query(request.data)
+    except QueryError as e:
+        return Response({'error': f'Invalid query: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        tables = ParsedTable.objects.filter(parsed_content__files__id=file_id)
+        if query['sheet'] is not None:
+            tables = tables.filter(name=query['sheet'])
+        table = tables.order_by('position').first()
+        
+        if table is not None:
+            sheet = table.name or None
+            source = f'table:{table.id}:{table.row_count}'
+            run = lambda: query_table(table.paths, table.format, query)
+        else:
+            uploaded_file = get_object_or_404(UploadedFile.objects.only('status', 'progress', 'preview'), id=file_id)
+            if uploaded_file.status != 'ready':
+                return _not_ready_response(uploaded_file)
+            
+            # Rows kept inline in the JSON content (FILE_PARSER_TABLE_FORMAT=inline)
+            parsed_content = get_object_or_404(ParsedContent, files__id=file_id)
+            if parsed_content.tables.exists():
+                return Response({'error': 'Sheet not found'}, status=status.HTTP_404_NOT_FOUND)
+            if parsed_content.content_type not in ('csv', 'excel'):
+                return Response({'error': 'File has no tabular rows to query'}, status=status.HTTP_400_BAD_REQUEST)
+            inline = _inline_rows(parsed_content, query['sheet'])
+            if inline is None:
+                return Response({'error': 'Sheet not found'}, status=status.HTTP_404_NOT_FOUND)
+            sheet, _, rows = inline
+            source = f'content:{parsed_content.id}'
+            run = lambda: query_rows(rows, query)
+        
+        result, cached = cached_query(file_id, source, query, run)
+        return Response({'file_id': file_id, 'sheet': sheet, 'cached': cached, **result})
+    
+    except QueryError as e:
+        return Response({'error': f'Invalid query: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
+    except Http404:
+        return Response({'error': 'File not found'}, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        logger.error(f"Error querying file {file_id}: {str(e)}")
+        return Response(
+            {'error': 'Internal server error'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET'])
+def get_file_page(request, file_id, page_number):
+    """Get the extracted text of one page of a parsed PDF."""
+    try:
+        page = (
+            ParsedPage.objects
+            .filter(parsed_content__files__id=file_id, number=page_number)
+            .values('number', 'content', 'engine')
+            .first()
+        )
+        
+        if page is None:
+            uploaded_file = get_object_or_404(UploadedFile.objects.only('status', 'progress', 'preview', 'parsed_content'), id=file_id)
+            if uploaded_file.status != 'ready':
+                return _not_ready_response(uploaded_file)
+            
+            parsed_content = uploaded_file.parsed_content
+            if parsed_content is None or parsed_content.content_type != 'pdf':
+                return Response({'error': 'File is not a parsed PDF'}, status=status.HTTP_400_BAD_REQUEST)
+            # PDFs parsed before pages were stored as rows keep them in the JSON
+            stored = next((p for p in parsed_content.content.get('pages', []) if p['page'] == page_number), None)
+            if stored is None:
+                return Response({'error': 'Page not found'}, status=status.HTTP_404_NOT_FOUND)
+            page = {'number': page_number, 'content': stored['content'], 'engine': None}
+        
+        return Response({
+            'file_id': file_id,
+            'page': page['number'],
+            'content': page['content'],
+            'engine': page['engine']
+        })
+    
+    except Http404:
+        return Response({'error': 'File not found'}, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        logger.error(f"Error getting page {page_number} of file {file_id}: {str(e)}")
+        return Response(
+            {'error': 'Internal server error'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+def _encode_list_cursor(created_at, file_id) -> str:
+    payload = json.dumps({'c': created_at.isoformat(), 'i': str(file_id)}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+
+def _decode_list_cursor(cursor: str):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    created_at = parse_datetime(payload['c'])
+    if created_at is None:
+        raise ValueError('invalid cursor')
+    return created_at, uuid.UUID(payload['i'])
+
+
+def _estimated_file_count():
+    """Cheap row count of the file table from database statistics, or None if unavailable."""
+    table = UploadedFile._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            # Rowids only grow, so this over-counts by the number of deleted rows
+            cursor.execute(f'SELECT MAX(rowid) FROM "{table}"')
+        elif connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE relname = %s', [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    return max(0, row[0] or 0) if row else None
+
+
 @api_view(['GET'])
 def list_files(request):
-    """List all uploaded files."""
+    """List uploaded files, newest first, one page at a time.
+    
+    Query parameters: `status` and `file_type` (comma-separated filters),
+    `limit`, the opaque `cursor` returned as `next_cursor` by the previous
+    page, and `count` (`estimate`, the default, reads the total of an
+    unfiltered list from database statistics; `exact` counts it). Pages are
+    found by seeking the (created_at, id) indexes, so every page costs the
+    same however deep it is.
+    """
     try:
-        files = UploadedFile.objects.all()
-        serializer = FileListSerializer(files, many=True)
+        default_size = getattr(settings, 'FILE_PARSER_FILES_PAGE_SIZE', 50)
+        max_size = getattr(settings, 'FILE_PARSER_FILES_MAX_PAGE_SIZE', 500)
+        limit = int(request.query_params.get('limit', default_size))
+        if limit <= 0:
+            raise ValueError('limit must be positive')
+        limit = min(limit, max_size)
+        after = None
+        if 'cursor' in request.query_params:
+            after = _decode_list_cursor(request.query_params['cursor'])
+        count_mode = request.query_params.get('count', 'estimate')
+        if count_mode not in ('exact', 'estimate'):
+            raise ValueError("count must be 'exact' or 'estimate'")
+    except (ValueError, KeyError, TypeError, binascii.Error) as e:
+        return Response({'error': f'Invalid pagination parameters: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        files = UploadedFile.objects.only(*FileListSerializer.Meta.fields)
+        filtered = False
+        for param, field in (('status', 'status'), ('file_type', 'file_type')):
+            values = [v.strip() for v in request.query_params.get(param, '').split(',') if v.strip()]
+            if values:
+                files = files.filter(**{f'{field}__in': values})
+                filtered = True
+        
+        total_count = None
+        if count_mode == 'estimate' and not filtered:
+            total_count = _estimated_file_count()
+        if total_count is None:
+            # Filtered lists have no statistics to estimate from
+            count_mode = 'exact'
+            total_count = files.count()
+        
+        if after is not None:
+            created_at, file_id = after
+            # The bare created_at bound lets the index seek instead of scanning the OR
+            files = files.filter(
+                Q(created_at__lte=created_at),
+                Q(created_at__lt=created_at) | Q(id__lt=file_id)
+            )
+        
+        # One extra row tells whether there is a next page without counting
+        page = list(files.order_by('-created_at', '-id')[:limit + 1])
+        has_more = len(page) > limit
+        page = page[:limit]
         
         return Response({
-            'files': serializer.data,
-            'total_count': files.count()
+            'files': FileListSerializer(page, many=True).data,
+            'limit': limit,
+            'next_cursor': _encode_list_cursor(page[-1].created_at, page[-1].id) if has_more else None,
+            'total_count': total_count,
+            'total_count_estimated': count_mode == 'estimate'
         })
     
     except Exception as e:
@@ -161,17 +1058,67 @@ def list_files(request):
         )
 
 
+@api_view(['PUT'])
+@parser_classes([MultiPartParser, FormParser])
+def replace_file_content(request, file_id):
+    """Upload a new version of a file.
+    
+    A CSV that only gained rows at the end has just those rows parsed and
+    appended to its table; any other new version is parsed again in full.
+    """
+    try:
+        if 'file' not in request.FILES:
+            return Response(
+                {'error': 'No file provided'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        file_obj = request.FILES['file']
+        max_size = getattr(settings, 'FILE_PARSER_MAX_UPLOAD_SIZE', 50 * 1024 * 1024)
+        if file_obj.size > max_size:
+            return Response(
+                {'error': f'File too large. Maximum size is {max_size // (1024*1024)}MB'},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+        
+        uploaded_file = get_object_or_404(
+            UploadedFile.objects.defer('file_content').select_related('blob', 'parsed_content'), id=file_id
+        )
+        try:
+            result = replace_upload(uploaded_file, uploaded_file.original_filename, file_obj.chunks(),
+                                    file_obj.content_type)
+        except ReplaceConflict as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+        
+        uploaded_file.refresh_from_db(fields=['status', 'file_size'])
+        return Response({
+            'file_id': uploaded_file.id,
+            'status': uploaded_file.status,
+            'file_size': uploaded_file.file_size,
+            **result
+        }, status=status.HTTP_202_ACCEPTED if result['mode'] == 'reparse' else status.HTTP_200_OK)
+    
+    except Http404:
+        return Response({'error': 'File not found'}, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        logger.error(f"Error replacing content of file {file_id}: {str(e)}")
+        return Response(
+            {'error': 'Internal server error'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
 @api_view(['DELETE'])
 def delete_file(request, file_id):
     """Delete a file and its parsed content."""
     try:
-        uploaded_file = get_object_or_404(UploadedFile, id=file_id)
+        uploaded_file = get_object_or_404(UploadedFile.objects.defer('file_content'), id=file_id)
         filename = uploaded_file.original_filename
         
         # Remove from progress tracker
         progress_tracker.remove_progress(file_id)
         
-        # Delete file and related content (CASCADE will handle ParsedContent)
+        # Delete the file; signals release its shared blob and parse result
         uploaded_file.delete()
         
         logger.info(f"File deleted successfully: {filename}")
@@ -185,4 +1132,173 @@ def delete_file(request, file_id):
         return Response(
             {'error': 'File not found'}, 
             status=status.HTTP_404_NOT_FOUND
+        )
+
+
+@api_view(['GET'])
+def parse_cache_metrics(request):
+    """Parse-result cache hit ratio and upload deduplication counters."""
+    try:
+        blobs = ContentBlob.objects.aggregate(count=Count('id'), stored_bytes=Sum('size'))
+        return Response({
+            **parse_cache_stats(),
+            'content_blobs': blobs['count'],
+            'stored_bytes': blobs['stored_bytes'] or 0
+        })
+    except Exception as e:
+        logger.error(f"Error reading parse cache metrics: {str(e)}")
+        return Response(
+            {'error': 'Internal server error'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET'])
+def get_file_timings(request, file_id):
+    """Time spent by a file in each pipeline stage, with the bytes and rows it processed."""
+    try:
+        get_object_or_404(UploadedFile.objects.only('id'), id=file_id)
+        spans = list(
+            PipelineSpan.objects.filter(file_id=file_id)
+            .values('stage', 'started_at', 'duration', 'bytes', 'rows')
+        )
+        return Response({
+            'file_id': file_id,
+            'spans': spans,
+            'total_seconds': sum(span['duration'] for span in spans),
+            'profile_available': profile_path(file_id).exists()
+        })
+    except Http404:
+        return Response({'error': 'File not found'}, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        logger.error(f"Error getting timings for file {file_id}: {str(e)}")
+        return Response(
+            {'error': 'Internal server error'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET', 'POST'])
+def file_profile(request, file_id):
+    """cProfile capture of a file's parse job.
+    
+    GET returns the top functions as text (`sort` and `limit` choose which),
+    or the raw capture for `pstats`/snakeviz with `?download=1`. POST
+    queues the file to be parsed again under the profiler.
+    """
+    try:
+        uploaded_file = get_object_or_404(UploadedFile.objects.only('id', 'status', 'progress'), id=file_id)
+        
+        if request.method == 'POST':
+            if uploaded_file.status in ('uploading', 'processing'):
+                return Response(
+                    {'error': f'File is {uploaded_file.status}; profile it once it is parsed'},
+                    status=status.HTTP_409_CONFLICT
+                )
+            if AsyncFileProcessor.queue_is_full():
+                return _queue_full_response()
+            AsyncFileProcessor.process_file_async(str(file_id), profile=True)
+            return Response({
+                'file_id': file_id,
+                'message': 'File queued for a profiled parse'
+            }, status=status.HTTP_202_ACCEPTED)
+        
+        path = profile_path(file_id)
+        if request.query_params.get('download', '').lower() in ('1', 'true'):
+            if not path.exists():
+                return Response({'error': 'No profile captured for this file'}, status=status.HTTP_404_NOT_FOUND)
+            return FileResponse(open(path, 'rb'), as_attachment=True, filename=f'{file_id}.prof')
+        
+        sort = request.query_params.get('sort', 'cumulative')
+        if sort not in PROFILE_SORT_KEYS:
+            return Response(
+                {'error': f"sort must be one of {', '.join(PROFILE_SORT_KEYS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        limit = min(int(request.query_params.get('limit', 40)), 500)
+        summary = profile_summary(file_id, sort, limit)
+        if summary is None:
+            return Response({'error': 'No profile captured for this file'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'file_id': file_id, 'sort': sort, 'stats': summary})
+    
+    except Http404:
+        return Response({'error': 'File not found'}, status=status.HTTP_404_NOT_FOUND)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        logger.error(f"Error getting profile for file {file_id}: {str(e)}")
+        return Response(
+            {'error': 'Internal server error'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@require_GET
+def prometheus_metrics(request):
+    """Stage duration histograms, throughput counters and queue gauges for Prometheus."""
+    try:
+        return HttpResponse(prometheus_text(), content_type=PROMETHEUS_CONTENT_TYPE)
+    except Exception as e:
+        logger.error(f"Error rendering Prometheus metrics: {str(e)}")
+        return HttpResponse('Internal server error\n', status=500, content_type='text/plain')
+
+
+@api_view(['GET'])
+def search_files(request):
+    """Find parsed files mentioning some text.
+    
+    Query parameters: `q` (every word must occur; `word*` matches a
+    prefix), optional `file_id` (comma-separated) to search only some files,
+    `offset` and `limit`. Matches are PDF pages and table rows, best first,
+    each with the files sharing that parse result and a snippet with the
+    matched words in <mark> tags.
+    """
+    if not search_enabled():
+        return Response({'error': 'Search is disabled'}, status=status.HTTP_404_NOT_FOUND)
+    
+    try:
+        text = request.query_params.get('q', '')
+        match_expression(text)
+        offset = int(request.query_params.get('offset', 0))
+        limit = int(request.query_params.get('limit', getattr(settings, 'FILE_PARSER_SEARCH_PAGE_SIZE', 20)))
+        if offset < 0 or limit <= 0:
+            raise ValueError('offset must not be negative and limit must be positive')
+        limit = min(limit, getattr(settings, 'FILE_PARSER_SEARCH_MAX_PAGE_SIZE', 200))
+        file_ids = [uuid.UUID(v.strip()) for v in request.query_params.get('file_id', '').split(',') if v.strip()]
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        ready_files = UploadedFile.objects.filter(status='ready', parsed_content__isnull=False)
+        content_ids = None
+        if file_ids:
+            ready_files = ready_files.filter(id__in=file_ids)
+            content_ids = list(set(ready_files.values_list('parsed_content_id', flat=True)))
+        
+        hits = get_search_index().search(text, content_ids, offset, limit)
+        files_by_content = {}
+        for file_id, filename, content_id in ready_files.filter(
+            parsed_content_id__in={hit['content_id'] for hit in hits}
+        ).values_list('id', 'original_filename', 'parsed_content_id'):
+            files_by_content.setdefault(content_id, []).append({'id': file_id, 'filename': filename})
+        
+        results = []
+        for hit in hits:
+            files = files_by_content.get(hit.pop('content_id'))
+            if files:
+                # Results from parse results whose files were all deleted are skipped
+                results.append({'files': files, **hit})
+        
+        return Response({
+            'query': text,
+            'results': results,
+            'offset': offset,
+            'limit': limit,
+            'next_offset': offset + limit if len(hits) == limit else None
+        })
+    except Exception as e:
+        logger.error(f"Error searching files: {str(e)}")
+        return Response(
+            {'error': 'Internal server error'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
\ No newline at end of file
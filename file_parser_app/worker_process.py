@@ -0,0 +1,14 @@
+"""Entry point for process-mode parser workers.
+
+Spawned interpreters import this module before Django is configured, so it
+must not import models (or anything that does) at module level.
+"""
+
+
+def process_worker_main(worker_id: str, stop_event, drain: bool):
+    """Set up Django in the child process and run the worker loop."""
+    import django
+    django.setup()
+
+    from .job_queue import worker_loop
+    worker_loop(worker_id, stop_event, drain=drain)
@@ -0,0 +1,8 @@
+import os
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'file_parser_project.settings')
+# Route upload, progress and content requests to the async views
+os.environ.setdefault('FILE_PARSER_ROOT_URLCONF', 'file_parser_project.asgi_urls')
+
+application = get_asgi_application()
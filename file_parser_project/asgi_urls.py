@@ -0,0 +1,8 @@
+from django.urls import path, include
+
+from .urls import urlpatterns as wsgi_urlpatterns
+
+# The async views take over their paths; every other endpoint is served as under WSGI
+urlpatterns = [
+    path('api/', include('file_parser_app.async_urls')),
+] + wsgi_urlpatterns
@@ -35,7 +35,8 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'file_parser_project.urls'
+# asgi.py serves the async views (file_parser_project.asgi_urls)
+ROOT_URLCONF = os.getenv('FILE_PARSER_ROOT_URLCONF', 'file_parser_project.urls')
 
 TEMPLATES = [
     {
@@ -54,12 +55,17 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'file_parser_project.wsgi.application'
+ASGI_APPLICATION = 'file_parser_project.asgi.application'
 
 # Database
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Parser workers write concurrently; wait for locks instead of failing
+            'timeout': 20,
+        },
     }
 }
 
@@ -108,7 +114,7 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'file_parser_app.renderers.ORJSONRenderer',
     ],
 }
 
@@ -117,8 +123,150 @@ CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
 
 # File upload settings
-FILE_UPLOAD_MAX_MEMORY_SIZE = 50 * 1024 * 1024  # 50MB
+# Multipart uploads larger than this are spooled to a temp file, not kept in RAM
+FILE_UPLOAD_MAX_MEMORY_SIZE = int(os.getenv('FILE_UPLOAD_MAX_MEMORY_SIZE', str(2621440)))  # 2.5MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 50 * 1024 * 1024  # 50MB
+# Largest file accepted by a regular or batch upload; larger files use resumable uploads
+FILE_PARSER_MAX_UPLOAD_SIZE = int(os.getenv('FILE_PARSER_MAX_UPLOAD_SIZE', str(50 * 1024 * 1024)))
+
+# Parser worker pool
+# Uploads are queued in the ParseJob table and processed by a bounded pool of
+# workers. Run `python manage.py run_parser_workers` for dedicated workers and
+# set FILE_PARSER_EMBEDDED_WORKERS=False so web processes only enqueue.
+FILE_PARSER_WORKERS = int(os.getenv('FILE_PARSER_WORKERS', '2'))
+FILE_PARSER_WORKER_MODE = os.getenv('FILE_PARSER_WORKER_MODE', 'thread')  # thread or process
+FILE_PARSER_EMBEDDED_WORKERS = os.getenv('FILE_PARSER_EMBEDDED_WORKERS', 'True').lower() == 'true'
+FILE_PARSER_WORKER_POLL_SECONDS = float(os.getenv('FILE_PARSER_WORKER_POLL_SECONDS', '1.0'))
+FILE_PARSER_JOB_LEASE_SECONDS = int(os.getenv('FILE_PARSER_JOB_LEASE_SECONDS', '300'))
+FILE_PARSER_JOB_MAX_ATTEMPTS = int(os.getenv('FILE_PARSER_JOB_MAX_ATTEMPTS', '3'))
+FILE_PARSER_MAX_QUEUE_DEPTH = int(os.getenv('FILE_PARSER_MAX_QUEUE_DEPTH', '0'))  # 0 = unlimited
+# Job scheduling: 'fair' ranks waiting jobs by priority class (raised one class
+# per FILE_PARSER_SCHEDULER_AGING_SECONDS waited), then by how many jobs the
+# uploading client has running, then by expected parse time; 'fifo' runs them
+# in queue order. Each claim ranks the FILE_PARSER_SCHEDULER_WINDOW
+# longest-waiting jobs overall and of each priority class. A client runs at
+# most FILE_PARSER_CLIENT_MAX_RUNNING jobs at once (0 = unlimited). Clients are
+# told apart by the FILE_PARSER_CLIENT_HEADER request header when set, else by
+# user or address.
+FILE_PARSER_SCHEDULER = os.getenv('FILE_PARSER_SCHEDULER', 'fair')
+FILE_PARSER_SCHEDULER_AGING_SECONDS = float(os.getenv('FILE_PARSER_SCHEDULER_AGING_SECONDS', '60'))
+FILE_PARSER_SCHEDULER_WINDOW = int(os.getenv('FILE_PARSER_SCHEDULER_WINDOW', '200'))
+FILE_PARSER_CLIENT_MAX_RUNNING = int(os.getenv('FILE_PARSER_CLIENT_MAX_RUNNING', '0'))
+FILE_PARSER_CLIENT_HEADER = os.getenv('FILE_PARSER_CLIENT_HEADER', '')
+# Resumable uploads: files up to FILE_PARSER_UPLOAD_MAX_SIZE bytes are sent as
+# chunks of at most FILE_PARSER_UPLOAD_MAX_CHUNK_SIZE bytes (clients are told
+# to use FILE_PARSER_UPLOAD_CHUNK_SIZE); unfinished uploads expire after
+# FILE_PARSER_UPLOAD_SESSION_HOURS.
+FILE_PARSER_UPLOAD_MAX_SIZE = int(os.getenv('FILE_PARSER_UPLOAD_MAX_SIZE', str(10 * 1024 ** 3)))
+FILE_PARSER_UPLOAD_CHUNK_SIZE = int(os.getenv('FILE_PARSER_UPLOAD_CHUNK_SIZE', str(8 * 1024 * 1024)))
+FILE_PARSER_UPLOAD_MAX_CHUNK_SIZE = int(os.getenv('FILE_PARSER_UPLOAD_MAX_CHUNK_SIZE', str(64 * 1024 * 1024)))
+FILE_PARSER_UPLOAD_SESSION_HOURS = int(os.getenv('FILE_PARSER_UPLOAD_SESSION_HOURS', '24'))
+# Batch uploads: at most this many files and bytes (after decompression) per batch
+FILE_PARSER_BATCH_MAX_FILES = int(os.getenv('FILE_PARSER_BATCH_MAX_FILES', '1000'))
+FILE_PARSER_BATCH_MAX_BYTES = int(os.getenv('FILE_PARSER_BATCH_MAX_BYTES', str(1024 * 1024 * 1024)))
+
+# Parse execution backend: 'inline' parses in the worker thread, 'process'
+# sends parses to a process pool so CPU-bound work is not limited by the GIL.
+FILE_PARSER_PARSE_BACKEND = os.getenv('FILE_PARSER_PARSE_BACKEND', 'inline')
+FILE_PARSER_PARSE_PROCESSES = int(os.getenv('FILE_PARSER_PARSE_PROCESSES', '0')) or None  # None = CPU count
+
+# Parse mode for uploads: 'full' parses every upload right away; 'lazy' only
+# previews the first FILE_PARSER_PREVIEW_BYTES of a CSV (the sheet list and
+# first rows of a workbook, the page count and first page of a PDF), keeping
+# FILE_PARSER_PREVIEW_ROWS rows, and parses in full when rows are first
+# requested or, as a background job, FILE_PARSER_LAZY_PARSE_DELAY seconds
+# after upload (-1 = only on request). `?parse=` overrides the mode per upload.
+FILE_PARSER_PARSE_MODE = os.getenv('FILE_PARSER_PARSE_MODE', 'full')
+FILE_PARSER_PREVIEW_BYTES = int(os.getenv('FILE_PARSER_PREVIEW_BYTES', str(64 * 1024)))
+FILE_PARSER_PREVIEW_ROWS = int(os.getenv('FILE_PARSER_PREVIEW_ROWS', '20'))
+FILE_PARSER_LAZY_PARSE_DELAY = int(os.getenv('FILE_PARSER_LAZY_PARSE_DELAY', '600'))
+
+# Parsed PDF pages and table rows are indexed for full-text search in an
+# SQLite FTS5 database at FILE_PARSER_SEARCH_INDEX_PATH, written
+# FILE_PARSER_SEARCH_BATCH_SIZE entries per transaction. At most
+# FILE_PARSER_SEARCH_MAX_ROWS rows of each table are indexed (0 = all).
+FILE_PARSER_SEARCH_ENABLED = os.getenv('FILE_PARSER_SEARCH_ENABLED', 'True').lower() == 'true'
+FILE_PARSER_SEARCH_INDEX_PATH = os.getenv('FILE_PARSER_SEARCH_INDEX_PATH', str(BASE_DIR / 'search.sqlite3'))
+FILE_PARSER_SEARCH_BATCH_SIZE = int(os.getenv('FILE_PARSER_SEARCH_BATCH_SIZE', '2000'))
+FILE_PARSER_SEARCH_MAX_ROWS = int(os.getenv('FILE_PARSER_SEARCH_MAX_ROWS', '1000000'))
+FILE_PARSER_SEARCH_PAGE_SIZE = int(os.getenv('FILE_PARSER_SEARCH_PAGE_SIZE', '20'))
+FILE_PARSER_SEARCH_MAX_PAGE_SIZE = int(os.getenv('FILE_PARSER_SEARCH_MAX_PAGE_SIZE', '200'))
+
+# Parse jobs are profiled with cProfile when requested (`?profile=1` on
+# upload, POST /api/files/<id>/profile/) and, at FILE_PARSER_PROFILE_SAMPLE_RATE
+# (0.0-1.0), at random; sampled captures are kept only for jobs slower than
+# FILE_PARSER_PROFILE_MIN_SECONDS. Captures are stored under
+# FILE_PARSER_PROFILE_ROOT (MEDIA_ROOT/profiles when unset).
+FILE_PARSER_PROFILE_SAMPLE_RATE = float(os.getenv('FILE_PARSER_PROFILE_SAMPLE_RATE', '0.0'))
+FILE_PARSER_PROFILE_MIN_SECONDS = float(os.getenv('FILE_PARSER_PROFILE_MIN_SECONDS', '5.0'))
+FILE_PARSER_PROFILE_ROOT = os.getenv('FILE_PARSER_PROFILE_ROOT', '')
+
+# PDFs of at least FILE_PARSER_PDF_PARALLEL_MIN_PAGES pages are split into page
+# ranges extracted by a pool of FILE_PARSER_PDF_PROCESSES processes (1 disables it).
+# Child processes (parse pool, process-mode workers) never start a pool.
+FILE_PARSER_PDF_PROCESSES = int(os.getenv('FILE_PARSER_PDF_PROCESSES', '0')) or None  # None = CPU count
+FILE_PARSER_PDF_PARALLEL_MIN_PAGES = int(os.getenv('FILE_PARSER_PDF_PARALLEL_MIN_PAGES', '8'))
+
+# Parse progress is published at most every N seconds and only when it has
+# moved by at least this many percentage points.
+FILE_PARSER_PROGRESS_MIN_INTERVAL = float(os.getenv('FILE_PARSER_PROGRESS_MIN_INTERVAL', '0.5'))
+FILE_PARSER_PROGRESS_MIN_DELTA = int(os.getenv('FILE_PARSER_PROGRESS_MIN_DELTA', '1'))
+# The database row is written at most every FILE_PARSER_PROGRESS_DB_INTERVAL seconds.
+FILE_PARSER_PROGRESS_DB_INTERVAL = float(os.getenv('FILE_PARSER_PROGRESS_DB_INTERVAL', '5.0'))
+
+# Where live progress is kept: 'memory' (this process only), 'sqlite' (a WAL
+# database shared by the processes of one host), 'redis' (needs the redis
+# package) or 'local-redis' (the Redis backend on an in-process stand-in
+# client, for development and testing). Shared backends are re-read every
+# FILE_PARSER_PROGRESS_POLL_SECONDS by waiting progress streams.
+FILE_PARSER_PROGRESS_BACKEND = os.getenv('FILE_PARSER_PROGRESS_BACKEND', 'memory')
+FILE_PARSER_PROGRESS_SQLITE_PATH = os.getenv('FILE_PARSER_PROGRESS_SQLITE_PATH', str(BASE_DIR / 'progress.sqlite3'))
+FILE_PARSER_PROGRESS_REDIS_URL = os.getenv('FILE_PARSER_PROGRESS_REDIS_URL', 'redis://localhost:6379/0')
+FILE_PARSER_PROGRESS_REDIS_PREFIX = os.getenv('FILE_PARSER_PROGRESS_REDIS_PREFIX', 'file_parser:progress')
+FILE_PARSER_PROGRESS_POLL_SECONDS = float(os.getenv('FILE_PARSER_PROGRESS_POLL_SECONDS', '0.25'))
+
+# Progress push channels: SSE streams end after FILE_PARSER_PROGRESS_STREAM_SECONDS
+# (clients reconnect with Last-Event-ID), long-polls wait at most
+# FILE_PARSER_PROGRESS_LONG_POLL_SECONDS, and files not tracked in this process
+# are re-read from the database at most every FILE_PARSER_PROGRESS_DB_POLL_SECONDS.
+# Under ASGI, streams and long-polls check for changes every
+# FILE_PARSER_PROGRESS_ASYNC_POLL_SECONDS instead of blocking a thread.
+FILE_PARSER_PROGRESS_STREAM_SECONDS = int(os.getenv('FILE_PARSER_PROGRESS_STREAM_SECONDS', '300'))
+FILE_PARSER_PROGRESS_LONG_POLL_SECONDS = int(os.getenv('FILE_PARSER_PROGRESS_LONG_POLL_SECONDS', '30'))
+FILE_PARSER_PROGRESS_DB_POLL_SECONDS = float(os.getenv('FILE_PARSER_PROGRESS_DB_POLL_SECONDS', '2.0'))
+FILE_PARSER_PROGRESS_BATCH_MAX = int(os.getenv('FILE_PARSER_PROGRESS_BATCH_MAX', '500'))
+FILE_PARSER_PROGRESS_ASYNC_POLL_SECONDS = float(os.getenv('FILE_PARSER_PROGRESS_ASYNC_POLL_SECONDS', '0.25'))
+
+# Rows of CSV and Excel files are stored as columnar tables under
+# FILE_PARSER_TABLE_ROOT ('parquet', 'arrow' or 'jsonl'); ParsedContent keeps
+# only headers, schema and counts. CSVs are parsed in streaming mode so memory
+# stays bounded by one chunk. 'inline' keeps rows in the JSON content instead.
+FILE_PARSER_TABLE_FORMAT = os.getenv('FILE_PARSER_TABLE_FORMAT', 'parquet')
+FILE_PARSER_TABLE_ROOT = os.getenv('FILE_PARSER_TABLE_ROOT', str(MEDIA_ROOT / 'parsed'))
+# With 'inline' tables, CSV rows are returned as 'records' (a dict per row) or
+# 'columns' (a typed schema and one value list per column, much more compact).
+FILE_PARSER_INLINE_ROW_ENCODING = os.getenv('FILE_PARSER_INLINE_ROW_ENCODING', 'records')
+FILE_PARSER_FILES_PAGE_SIZE = int(os.getenv('FILE_PARSER_FILES_PAGE_SIZE', '50'))
+FILE_PARSER_FILES_MAX_PAGE_SIZE = int(os.getenv('FILE_PARSER_FILES_MAX_PAGE_SIZE', '500'))
+FILE_PARSER_ROWS_PAGE_SIZE = int(os.getenv('FILE_PARSER_ROWS_PAGE_SIZE', '100'))
+FILE_PARSER_ROWS_MAX_PAGE_SIZE = int(os.getenv('FILE_PARSER_ROWS_MAX_PAGE_SIZE', '1000'))
+FILE_PARSER_QUERY_MAX_ROWS = int(os.getenv('FILE_PARSER_QUERY_MAX_ROWS', '1000'))
+FILE_PARSER_QUERY_CACHE_SECONDS = int(os.getenv('FILE_PARSER_QUERY_CACHE_SECONDS', '300'))
+
+# Excel reader: 'auto' uses python-calamine when installed, otherwise openpyxl
+# (read-only streaming) for .xlsx and xlrd for .xls. Or name one engine:
+# 'calamine', 'openpyxl' or 'xlrd'.
+FILE_PARSER_EXCEL_ENGINE = os.getenv('FILE_PARSER_EXCEL_ENGINE', 'auto')
+
+# Blob storage for uploaded file bytes: 'local' (files under
+# FILE_PARSER_STORAGE_ROOT), 's3' (any S3-compatible endpoint, needs boto3) or
+# 'local-s3' (the S3 backend against a directory-backed stand-in client).
+FILE_PARSER_STORAGE_BACKEND = os.getenv('FILE_PARSER_STORAGE_BACKEND', 'local')
+FILE_PARSER_STORAGE_ROOT = os.getenv('FILE_PARSER_STORAGE_ROOT', str(MEDIA_ROOT / 'uploads'))
+FILE_PARSER_S3_BUCKET = os.getenv('FILE_PARSER_S3_BUCKET', 'file-parser')
+FILE_PARSER_S3_PREFIX = os.getenv('FILE_PARSER_S3_PREFIX', '')
+FILE_PARSER_S3_ENDPOINT_URL = os.getenv('FILE_PARSER_S3_ENDPOINT_URL') or None
+FILE_PARSER_LOCAL_S3_ROOT = os.getenv('FILE_PARSER_LOCAL_S3_ROOT', str(MEDIA_ROOT / 's3'))
 
 # Logging
 LOGGING = {